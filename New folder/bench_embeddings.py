@@ -0,0 +1,158 @@
+import argparse
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from onnx_embedder import MODEL_ALIASES, OnnxEmbedder, export_model, model_dir_for
+
+logger = logging.getLogger(__name__)
+
+
+def load_texts(questions_path, limit=None):
+    """ The chunks store.py ingests (window chunker, so there are enough of them) plus the eval questions. """
+    import store
+
+    chunks, _ = store.load_chunks("window")
+    with open(questions_path, "r", encoding="utf-8") as f:
+        questions = [item["question"] for item in json.load(f)]
+    texts = chunks + questions
+    return texts[:limit] if limit else texts, chunks, questions
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def ensure_export(model_name):
+    model_dir = model_dir_for(model_name)
+    if not os.path.exists(os.path.join(model_dir, "embedder.json")):
+        export_model(model_name, model_dir)
+    return model_dir
+
+
+def parity(model_name, chunks, questions, min_cosine):
+    """ Cosine between torch and ONNX vectors for the same texts, and whether top-1 retrieval still agrees. """
+    from sentence_transformers import SentenceTransformer
+
+    model_dir = ensure_export(model_name)
+    texts = chunks + questions
+    reference = SentenceTransformer(model_name, device="cpu").encode(texts, normalize_embeddings=True)
+    reference_top1 = np.argmax(reference[len(chunks):] @ reference[:len(chunks)].T, axis=1)
+
+    report = {}
+    for variant, quantized in (("fp32", False), ("int8", True)):
+        vectors = OnnxEmbedder(model_dir, quantized=quantized).encode(texts)
+        vectors = vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        cosines = np.sum(reference * vectors, axis=1)
+        top1 = np.argmax(vectors[len(chunks):] @ vectors[:len(chunks)].T, axis=1)
+        report[variant] = {
+            "texts": len(texts),
+            "mean_cosine": round(float(cosines.mean()), 5),
+            "min_cosine": round(float(cosines.min()), 5),
+            "top1_agreement": round(float(np.mean(top1 == reference_top1)), 3),
+            "passed": bool(cosines.min() >= min_cosine),
+        }
+    return report
+
+
+def run_backend(backend, model_name, texts_path, repeats, batch_size):
+    """ Runs in a fresh interpreter so RSS and `torch in sys.modules` describe this backend alone. """
+    with open(texts_path, "r", encoding="utf-8") as f:
+        texts = json.load(f)
+
+    start = time.perf_counter()
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+        embedder = SentenceTransformer(model_name, device="cpu")
+    else:
+        embedder = OnnxEmbedder(model_dir_for(model_name), quantized=backend == "onnx-int8")
+    load_seconds = time.perf_counter() - start
+
+    embedder.encode(texts[:batch_size], batch_size=batch_size)  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        embedder.encode(texts, batch_size=batch_size)
+    encode_seconds = time.perf_counter() - start
+
+    single = []
+    for text in texts[:50]:
+        start = time.perf_counter()
+        embedder.encode(text)
+        single.append(time.perf_counter() - start)
+
+    return {
+        "backend": backend,
+        "load_s": round(load_seconds, 2),
+        "sentences_per_sec": round(len(texts) * repeats / encode_seconds, 1),
+        "single_query_ms": round(float(np.median(single)) * 1000, 2),
+        "max_rss_mb": peak_rss_mb(),
+        "torch_imported": "torch" in sys.modules,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Torch vs ONNX (fp32 / int8) embedding parity, throughput and memory.")
+    parser.add_argument("--models", nargs="+", default=list(MODEL_ALIASES), choices=list(MODEL_ALIASES))
+    parser.add_argument("--questions", default="rag_eval_questions.json")
+    parser.add_argument("--min-cosine", type=float, default=0.95, help="Parity fails when any text falls below this cosine")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--output", help="Optional path to write the JSON results")
+    parser.add_argument("--child", nargs=3, metavar=("BACKEND", "MODEL", "TEXTS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        backend, model_name, texts_path = args.child
+        print(json.dumps(run_backend(backend, model_name, texts_path, args.repeats, args.batch_size)))
+        sys.exit(0)
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(levelname)s - %(message)s")
+    texts, chunks, questions = load_texts(args.questions)
+
+    results = {}
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False, encoding="utf-8") as f:
+        json.dump(texts, f)
+        texts_path = f.name
+    try:
+        for key in args.models:
+            model_name = MODEL_ALIASES[key]
+            results[key] = {"model": model_name, "parity": parity(model_name, chunks, questions, args.min_cosine), "runs": []}
+            for backend in ("torch", "onnx-fp32", "onnx-int8"):
+                child = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), "--repeats", str(args.repeats), "--batch-size", str(args.batch_size),
+                     "--child", backend, model_name, texts_path],
+                    capture_output=True, text=True,
+                )
+                if child.returncode != 0:
+                    results[key]["runs"].append({"backend": backend, "error": child.stderr.strip().splitlines()[-1:]})
+                    continue
+                results[key]["runs"].append(json.loads(child.stdout.strip().splitlines()[-1]))
+    finally:
+        os.remove(texts_path)
+
+    print(f"\n{'model':<7} {'backend':<10} {'sent/s':>8} {'1-query ms':>11} {'RSS MB':>8} {'torch':>6} {'min cos':>8}")
+    for key, result in results.items():
+        for run in result["runs"]:
+            variant = run["backend"].replace("onnx-", "")
+            min_cosine = result["parity"].get(variant, {}).get("min_cosine", 1.0)
+            if "error" in run:
+                print(f"{key:<7} {run['backend']:<10} error: {run['error']}")
+                continue
+            print(f"{key:<7} {run['backend']:<10} {run['sentences_per_sec']:>8.1f} {run['single_query_ms']:>11.2f} "
+                  f"{run['max_rss_mb']:>8.1f} {str(run['torch_imported']):>6} {min_cosine:>8.4f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    # Non-zero exit when any export drifts from the torch vectors, so this doubles as the parity check
+    sys.exit(0 if all(variant["passed"] for result in results.values() for variant in result["parity"].values()) else 1)
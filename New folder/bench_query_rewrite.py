@@ -0,0 +1,63 @@
+import argparse
+import json
+import logging
+import os
+import time
+
+import chatbotbac
+from latency import percentile
+from query_rewrite import REWRITE_MODES
+
+logger = logging.getLogger(__name__)
+
+
+def load_questions(path):
+    """ Labeled questions: [{"question": ..., "expected": [substring, ...]}, ...] """
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def is_hit(points, expected):
+    """ A retrieval hits when any returned chunk contains any of the expected substrings. """
+    contents = [str(point.payload.get("content", "")).lower() for point in points]
+    return any(needle.lower() in content for content in contents for needle in expected)
+
+
+def run_mode(mode, questions):
+    latencies = []
+    hits = 0
+    for item in questions:
+        start = time.perf_counter()
+        points, _ = chatbotbac.get_query_rewriter().retrieve(item["question"], mode=mode)
+        latencies.append(time.perf_counter() - start)
+        hits += is_hit(points, item["expected"])
+
+    return {
+        "mode": mode,
+        "questions": len(questions),
+        "hit_rate": round(hits / len(questions), 3) if questions else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare chatbotbac query-rewrite modes on retrieval latency and hit rate.")
+    parser.add_argument("--questions", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "rag_eval_questions.json"))
+    parser.add_argument("--modes", nargs="+", default=list(REWRITE_MODES), choices=REWRITE_MODES)
+    parser.add_argument("--output", help="Optional path to write the JSON results")
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions)
+    with chatbotbac.get_query_rewriter():
+        results = [run_mode(mode, questions) for mode in args.modes]
+
+    print(f"\n{'mode':<10} {'hit rate':>9} {'p50 ms':>10} {'p99 ms':>10} {'mean ms':>10}")
+    for row in results:
+        print(f"{row['mode']:<10} {row['hit_rate']:>9.3f} {row['p50_ms']:>10.2f} {row['p99_ms']:>10.2f} {row['mean_ms']:>10.2f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        logger.info(f"📄 Results written to {args.output}")
@@ -0,0 +1,177 @@
+import argparse
+import itertools
+import json
+import logging
+import os
+import tempfile
+import time
+
+import store
+from bm25_index import BM25Index
+from latency import percentile
+from onnx_embedder import EMBEDDING_BACKEND, EMBEDDING_BACKENDS, MODEL_ALIASES, load_embedder
+from query_rewrite import reciprocal_rank_fusion
+from retrieval import SearchClient, SearchParams
+from vector_backend import NumpyVectorStore
+
+from llm_gateway import LLMGateway
+from stub_ollama_server import start_stub_server
+
+logger = logging.getLogger(__name__)
+
+RECALL_AT = (1, 3, 5, 10)
+# Offline index variants: NumPy flat scan, NumPy IVF, and in-process Qdrant (local mode, in memory)
+INDEX_TYPES = ("flat", "ivf", "qdrant")
+
+
+def load_questions(path):
+    """ Labeled questions: [{"question": ..., "expected": [substring, ...]}, ...] """
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def parse_chunker(spec):
+    """ "lines", "lines:300" or "window:500:100" -> (name, options) for `store.load_chunks`. """
+    name, *values = spec.split(":")
+    if name not in store.CHUNKERS:
+        raise argparse.ArgumentTypeError(f"Unknown chunker '{name}', expected one of {', '.join(store.CHUNKERS)}")
+    keys = ("max_chunk_length",) if name == "lines" else ("window", "overlap")
+    return spec, name, {key: int(value) for key, value in zip(keys, values)}
+
+
+def is_relevant(content, expected):
+    content = content.lower()
+    return any(needle.lower() in content for needle in expected)
+
+
+def first_relevant_rank(points, expected):
+    """ 1-based rank of the first chunk containing an expected substring, or None. """
+    for rank, point in enumerate(points, start=1):
+        if is_relevant(str(point.payload.get("content", "")), expected):
+            return rank
+    return None
+
+
+def open_index(index_type, path, nprobe, ivf_min_points):
+    if index_type == "qdrant":
+        from qdrant_client import QdrantClient
+        return QdrantClient(":memory:")
+    return NumpyVectorStore(path, index_type=index_type, nprobe=nprobe, ivf_min_points=ivf_min_points)
+
+
+def summarize_ms(seconds):
+    return {
+        "p50_ms": round(percentile(seconds, 50) * 1000, 2),
+        "p99_ms": round(percentile(seconds, 99) * 1000, 2),
+        "mean_ms": round(sum(seconds) / len(seconds) * 1000, 2) if seconds else 0.0,
+    }
+
+
+def run_config(chunker, model_key, embedder, index_type, questions, gateway, args, workdir):
+    spec, name, options = chunker
+    collection = "bench"
+
+    start = time.perf_counter()
+    chunks, sources = store.load_chunks(name, **options)
+    chunk_seconds = time.perf_counter() - start
+
+    client = open_index(index_type, os.path.join(workdir, f"{name}-{model_key}-{index_type}-{len(chunks)}"), args.nprobe, args.ivf_min_points)
+    start = time.perf_counter()
+    store.ensure_collection(client, collection, embedder.get_sentence_embedding_dimension())
+    points = store.ingest(client, embedder, collection, chunks, sources)
+    bm25 = BM25Index.build([point.id for point in points], [point.payload for point in points]) if args.hybrid else None
+    build_seconds = time.perf_counter() - start
+
+    search_client = SearchClient(client, collection, SearchParams(limit=max(RECALL_AT)))
+    answerable = sum(1 for item in questions if any(is_relevant(chunk, item["expected"]) for chunk in chunks))
+    embed_latencies, search_latencies, generate_latencies = [], [], []
+    hits = {k: 0 for k in RECALL_AT}
+    reciprocal_ranks = 0.0
+
+    for item in questions:
+        start = time.perf_counter()
+        query_vector = embedder.encode(item["question"])
+        embed_latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        results = search_client.search(query_vector)
+        if bm25 is not None:
+            results = reciprocal_rank_fusion([results, bm25.search(item["question"], limit=max(RECALL_AT))], limit=max(RECALL_AT))
+        search_latencies.append(time.perf_counter() - start)
+
+        rank = first_relevant_rank(results, item["expected"])
+        if rank is not None:
+            reciprocal_ranks += 1.0 / rank
+            for k in RECALL_AT:
+                hits[k] += rank <= k
+
+        if gateway is not None:
+            context = "\n".join(str(point.payload.get("content", "")) for point in results[:args.context_limit])
+            prompt = f"Context:\n{context}\n\nQuestion: {item['question']}\nAnswer only from the context."
+            start = time.perf_counter()
+            gateway.chat("rag_answer", [{"role": "user", "content": prompt}])
+            generate_latencies.append(time.perf_counter() - start)
+
+    total = len(questions)
+    return {
+        "chunker": spec,
+        "model": model_key,
+        "embedding_backend": args.embedding_backend,
+        "index": index_type,
+        "hybrid": bool(args.hybrid),
+        "chunks": len(chunks),
+        "answerable": answerable,
+        "chunk_s": round(chunk_seconds, 3),
+        "index_build_s": round(build_seconds, 3),
+        **{f"recall@{k}": round(hits[k] / total, 3) if total else 0.0 for k in RECALL_AT},
+        "mrr": round(reciprocal_ranks / total, 3) if total else 0.0,
+        "embed": summarize_ms(embed_latencies),
+        "search": summarize_ms(search_latencies),
+        "generate": summarize_ms(generate_latencies),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline retrieval quality and latency benchmark for the kongunadu RAG stack.")
+    parser.add_argument("--questions", default="rag_eval_questions.json")
+    parser.add_argument("--chunkers", nargs="+", type=parse_chunker, default=[parse_chunker("lines"), parse_chunker("window:500:100")],
+                        help='Chunker specs: "lines[:max_chunk_length]" or "window[:window[:overlap]]"')
+    parser.add_argument("--models", nargs="+", default=["minilm"], choices=list(MODEL_ALIASES))
+    parser.add_argument("--embedding-backend", default=EMBEDDING_BACKEND, choices=EMBEDDING_BACKENDS)
+    parser.add_argument("--indexes", nargs="+", default=["flat", "ivf"], choices=INDEX_TYPES)
+    parser.add_argument("--nprobe", type=int, default=4, help="IVF clusters probed per query")
+    parser.add_argument("--ivf-min-points", type=int, default=1, help="Build the IVF index even on this small corpus")
+    parser.add_argument("--hybrid", action="store_true", help="Fuse dense hits with BM25 (RRF) like chatbot.py")
+    parser.add_argument("--context-limit", type=int, default=3, help="Chunks sent to the mocked LLM")
+    parser.add_argument("--no-generate", action="store_true", help="Skip the mocked generation step")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="Simulated model prompt-eval time per answer")
+    parser.add_argument("--llm-token-delay-ms", type=float, default=0.0, help="Simulated model time per generated token")
+    parser.add_argument("--output", help="Optional path to write the JSON results")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(levelname)s - %(message)s")
+    questions = load_questions(args.questions)
+
+    gateway = None
+    if not args.no_generate:
+        server = start_stub_server(latency=args.llm_latency_ms / 1000, token_delay=args.llm_token_delay_ms / 1000)
+        gateway = LLMGateway(host=server.url)
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="bench_rag_") as workdir:
+        for model_key in args.models:
+            start = time.perf_counter()
+            embedder = load_embedder(MODEL_ALIASES[model_key], backend=args.embedding_backend)
+            logger.warning(f"Loaded {model_key} in {time.perf_counter() - start:.2f}s")
+            for chunker, index_type in itertools.product(args.chunkers, args.indexes):
+                results.append(run_config(chunker, model_key, embedder, index_type, questions, gateway, args, workdir))
+
+    print(f"\n{'chunker':<16} {'model':<7} {'index':<7} {'chunks':>6} {'R@1':>6} {'R@5':>6} {'MRR':>6} {'build s':>8} {'embed p50':>10} {'search p50':>11} {'gen p50':>8}")
+    for row in results:
+        print(f"{row['chunker']:<16} {row['model']:<7} {row['index']:<7} {row['chunks']:>6} {row['recall@1']:>6.3f} {row['recall@5']:>6.3f} "
+              f"{row['mrr']:>6.3f} {row['index_build_s']:>8.3f} {row['embed']['p50_ms']:>10.2f} {row['search']['p50_ms']:>11.2f} {row['generate']['p50_ms']:>8.2f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        logger.warning(f"📄 Results written to {args.output}")
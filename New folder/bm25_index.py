@@ -0,0 +1,147 @@
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, namedtuple
+
+from semantic_cache import STAMP_CHECK_SECONDS, read_ingest_stamp
+
+logger = logging.getLogger(__name__)
+
+INDEX_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Same attributes the chatbots read from Qdrant's ScoredPoint, so sparse and dense hits can be fused directly
+SparseHit = namedtuple("SparseHit", ["id", "score", "payload"])
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "give", "how", "i", "in", "is", "it",
+    "me", "of", "on", "or", "the", "to", "was", "what", "when", "where", "which", "who", "whom", "with",
+}
+
+TOKEN_PATTERN = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+|\d[\d\s-]{5,}\d|[a-z0-9]+")
+
+
+def bm25_index_path(collection_name):
+    return os.path.join(INDEX_DIR, f"{collection_name}.bm25.json")
+
+
+def tokenize(text):
+    """ Lower-cased terms that keep emails and phone numbers whole, so exact lookups match exactly. """
+    tokens = []
+    for match in TOKEN_PATTERN.findall(text.lower()):
+        if "@" in match:
+            # hodcse@kongunadu.ac.in -> the address itself plus "hodcse" for partial questions
+            tokens.append(match)
+            tokens.append(match.split("@", 1)[0])
+        elif match[0].isdigit() and len(match) > 6:
+            tokens.append(re.sub(r"[\s-]", "", match))
+        elif match not in STOPWORDS:
+            tokens.append(match)
+    return tokens
+
+
+class BM25Index:
+    """ Small in-process Okapi BM25 inverted index over the chunks stored in Qdrant (same point ids). """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_ids = []
+        self.doc_lengths = []
+        self.payloads = []
+        self.postings = {}  # term -> [[doc index, term frequency], ...]
+
+    @classmethod
+    def build(cls, doc_ids, payloads, k1=1.5, b=0.75):
+        index = cls(k1=k1, b=b)
+        for doc_id, payload in zip(doc_ids, payloads):
+            terms = Counter(tokenize(payload.get("content", "")))
+            doc_index = len(index.doc_ids)
+            index.doc_ids.append(doc_id)
+            index.doc_lengths.append(sum(terms.values()))
+            index.payloads.append(payload)
+            for term, frequency in terms.items():
+                index.postings.setdefault(term, []).append([doc_index, frequency])
+        return index
+
+    def search(self, query, limit=10):
+        """ Returns up to `limit` SparseHit results ordered by BM25 score. """
+        if not self.doc_ids:
+            return []
+
+        total_docs = len(self.doc_ids)
+        average_length = sum(self.doc_lengths) / total_docs or 1.0
+        scores = Counter()
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (total_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_index, frequency in postings:
+                length_norm = 1 - self.b + self.b * self.doc_lengths[doc_index] / average_length
+                scores[doc_index] += idf * frequency * (self.k1 + 1) / (frequency + self.k1 * length_norm)
+
+        return [
+            SparseHit(id=self.doc_ids[doc_index], score=score, payload=self.payloads[doc_index])
+            for doc_index, score in scores.most_common(limit)
+        ]
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "k1": self.k1,
+                "b": self.b,
+                "doc_ids": self.doc_ids,
+                "doc_lengths": self.doc_lengths,
+                "payloads": self.payloads,
+                "postings": self.postings,
+            }, f)
+
+    @classmethod
+    def load(cls, path):
+        """ Loads a saved index, or returns None when ingestion has not written one yet. """
+        if not os.path.exists(path):
+            logger.warning(f"⚠️ No BM25 index at {path}; run store.py to build it. Falling back to dense-only search.")
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        index = cls(k1=data["k1"], b=data["b"])
+        index.doc_ids = data["doc_ids"]
+        index.doc_lengths = data["doc_lengths"]
+        index.payloads = data["payloads"]
+        index.postings = data["postings"]
+        return index
+
+
+class BM25IndexLoader:
+    """ Keeps a collection's saved index loaded and reloads it once store.py re-ingests the collection.
+
+    The ingest stamp is checked at most every `check_seconds`, like the semantic answer cache does.
+    """
+
+    def __init__(self, collection_name, check_seconds=STAMP_CHECK_SECONDS):
+        self.collection_name = collection_name
+        self.check_seconds = check_seconds
+        self._index = None
+        self._stamp = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """ The current index, or None when ingestion has not written one yet. """
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.check_seconds:
+            return self._index
+        with self._lock:
+            if self._checked_at is None or now - self._checked_at >= self.check_seconds:
+                stamp = read_ingest_stamp(self.collection_name)
+                if self._checked_at is None or stamp != self._stamp:
+                    if self._checked_at is not None:
+                        logger.info(f"🔄 Collection {self.collection_name} was re-ingested, reloading its BM25 index")
+                    self._index = BM25Index.load(bm25_index_path(self.collection_name))
+                    self._stamp = stamp
+                self._checked_at = now
+            return self._index
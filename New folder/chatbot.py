@@ -1,45 +1,155 @@
-import qdrant_client
-from qdrant_client.http import models
-from sentence_transformers import SentenceTransformer
-import ollama
+import argparse
 import logging
+import os
+import threading
+import time
+
+from bm25_index import BM25IndexLoader
+from latency import generation_stats
+from onnx_embedder import load_embedder
+from query_rewrite import reciprocal_rank_fusion
+from semantic_cache import SemanticCache
+from vector_backend import get_vector_client
+from llm_gateway import gateway
+from instrumentation import registry, span
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
-# Connect to Qdrant
-QDRANT_URL = "http://localhost:6333"
+# Connect to the vector store (Qdrant server, embedded Qdrant or NumPy index; see vector_backend.py)
 COLLECTION_NAME = "txt_file_data"
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Hybrid retrieval: dense and BM25 candidates are fused with RRF so a small context still keeps exact matches
+DENSE_CANDIDATES = 10
+SPARSE_CANDIDATES = 10
+CONTEXT_LIMIT = 3
 
-qdrant_client = qdrant_client.QdrantClient(QDRANT_URL)
+# Cross-encoder reranking: over-fetch RERANK_CANDIDATES fused hits, then pack the best into a token budget
+RERANK_ENABLED = os.environ.get("RAG_RERANK", "1") == "1"
+RERANK_CANDIDATES = 12
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("RAG_CONTEXT_TOKENS", "400"))
 
-# Initialize Sentence Transformer for Embeddings
-embedder = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+# Near-duplicate questions that retrieve the same context reuse the previous Mistral answer
+answer_cache = SemanticCache(COLLECTION_NAME, threshold=0.9, max_entries=512)
+registry.gauge("insightgenie_answer_cache_hit_ratio", "Semantic answer cache hits / lookups", fn=lambda: answer_cache.stats()["hit_ratio"])
+registry.counter("insightgenie_answer_cache_lookups_total", "Semantic answer cache lookups by result", ("result",),
+                 fn=lambda: {("hit",): answer_cache.hits, ("miss",): answer_cache.misses})
+registry.gauge("insightgenie_answer_cache_entries", "Answers held in the semantic cache", fn=lambda: answer_cache.stats()["entries"])
 
-# Load Mistral model via Ollama
 MODEL_NAME = "mistral:7b"
-try:
-    response = ollama.chat(model=MODEL_NAME, messages=[{"role": "system", "content": "You are an AI assistant, but you only structure answers retrieved from Qdrant. You will not generate any response beyond the retrieved data."}])
-    logger.info(f"✅ Mistral model '{MODEL_NAME}' configured for strict RAG-based responses.")
-except Exception as e:
-    logger.error(f"❌ Error loading Mistral model: {str(e)}")
-    exit(1)
+
+# The embedder and cross-encoder (torch or ONNX, see EMBEDDING_BACKEND) and the vector store client are created on first use, or ahead of time by
+# `warm_up()`, so importing this module stays cheap
+_components = {}
+_components_lock = threading.RLock()
+
+
+def _component(name, factory):
+    if name not in _components:
+        with _components_lock:
+            if name not in _components:
+                start = time.perf_counter()
+                _components[name] = factory()
+                logger.info(f"✅ Loaded {name} in {time.perf_counter() - start:.2f}s")
+    return _components[name]
+
+
+def get_embedder():
+    return _component("embedder", lambda: load_embedder(EMBEDDING_MODEL))
+
+
+def get_search_client():
+    def connect():
+        from retrieval import SearchClient, SearchParams
+        return SearchClient(get_vector_client(), COLLECTION_NAME, SearchParams(limit=DENSE_CANDIDATES))
+    return _component("search_client", connect)
+
+
+def get_bm25_index():
+    # The loader re-reads the index after store.py re-ingests the collection
+    return _component("bm25_index", lambda: BM25IndexLoader(COLLECTION_NAME)).get()
+
+
+def get_reranker():
+    def load():
+        from reranker import ContextReranker
+        return ContextReranker(token_budget=CONTEXT_TOKEN_BUDGET)
+    return _component("reranker", load) if RERANK_ENABLED else None
+
+
+def warm_up():
+    """ Loads every retrieval component, then pins Mistral. An unreachable Ollama is logged, not fatal:
+    the first answer retries the load. """
+    get_embedder()
+    get_search_client()
+    get_bm25_index()
+    get_reranker()
+    try:
+        gateway.warm("rag_answer", model=MODEL_NAME)
+        logger.info(f"✅ Mistral model '{MODEL_NAME}' loaded and pinned for strict RAG-based responses.")
+    except Exception as e:
+        logger.error(f"❌ Error loading Mistral model: {str(e)}")
+
+
+def start_warm_up():
+    """ Runs `warm_up()` on a daemon thread so a CLI can prompt for input while models load. """
+    def run():
+        try:
+            warm_up()
+        except Exception as e:
+            logger.error(f"❌ Warm-up failed: {str(e)}")
+
+    thread = threading.Thread(target=run, name="rag-warm-up", daemon=True)
+    thread.start()
+    return thread
+
 
 def retrieve_data_from_qdrant(user_query):
-    """ Converts user query to vector, searches Qdrant using `point_search()`, and retrieves matched results. """
+    """ Converts user query to vector, searches Qdrant, and retrieves matched results. """
 
     # Convert query to vector
-    query_vector = embedder.encode(user_query).tolist()
+    with span("embed"):
+        query_vector = get_embedder().encode(user_query).tolist()
+
+    return format_context(select_context(user_query, search_qdrant(query_vector)))
+
+
+def search_qdrant(query_vector):
+    """ Returns the top scored points for an already-embedded query. """
+
+    # Dense candidates (payload `content` only), narrowed to CONTEXT_LIMIT by hybrid_search()
+    with span("vector_search"):
+        return get_search_client().search(query_vector)
+
+
+def hybrid_search(user_query, dense_results, limit=CONTEXT_LIMIT):
+    """ Fuses dense hits with BM25 hits for the same question and keeps the best `limit`. """
+    bm25_index = get_bm25_index()
+    if bm25_index is None:
+        return list(dense_results)[:limit]
+
+    with span("sparse_search"):
+        sparse_results = bm25_index.search(user_query, limit=SPARSE_CANDIDATES)
+    return reciprocal_rank_fusion([dense_results, sparse_results], limit=limit)
+
+
+def select_context(user_query, dense_results):
+    """ Hybrid fusion, then cross-encoder rerank and token-budget packing when the reranker is enabled. """
+    reranker = get_reranker()
+    if reranker is None:
+        return hybrid_search(user_query, dense_results)
 
-    # Perform vector search using `point_search()`
-    search_results = qdrant_client.point_search(
-        collection_name=COLLECTION_NAME,
-        query_vector=query_vector,
-        limit=5,  # Retrieve top 5 relevant results
-        with_payload=True,  # Ensure payload is included in results
-        with_vectors=False  # Only retrieve the payload, not the vectors
-    )
+    candidates = hybrid_search(user_query, dense_results, limit=RERANK_CANDIDATES)
+    with span("rerank"):
+        selected, stats = reranker.select(user_query, candidates, baseline_k=CONTEXT_LIMIT)
+    logger.info(f"⚖️ Rerank stats: {stats}")
+    return selected
+
+
+def format_context(search_results):
+    """ Joins the `content` payloads of scored points into the context block handed to Mistral. """
 
     # Extract relevant answers
     matched_responses = [result.payload["content"] for result in search_results if "content" in result.payload]
@@ -50,14 +160,9 @@ def retrieve_data_from_qdrant(user_query):
     return "\n".join(matched_responses)
 
 
-def generate_final_answer(user_question):
-    """ Retrieves relevant data using RAG and reformats response via Mistral. """
-
-    # Step 1: Retrieve relevant content
-    retrieved_context = retrieve_data_from_qdrant(user_question)
-
-    # Step 2: Generate final answer using Mistral, **without adding its own response**
-    mistral_prompt = f"""
+def build_answer_prompt(user_question, retrieved_context):
+    """ Builds the strict RAG formatting prompt sent to Mistral. """
+    return f"""
     You are an AI assistant restricted to **only formatting answers from the retrieved context**.  
     You are a strict RAG-based model. Your only job is to format retrieved answers from the database.
     ❌ Do NOT generate new information.
@@ -77,15 +182,99 @@ def generate_final_answer(user_question):
     **Final Answer (structured without additional AI-generated details):**
     """
 
+
+def retrieve_for_answer(user_question):
+    """ Embeds the question once and returns `(query_vector, context_ids, retrieved_context)`. """
+    with span("embed"):
+        query_vector = get_embedder().encode(user_question)
+    search_results = select_context(user_question, search_qdrant(query_vector.tolist()))
+    context_ids = [result.id for result in search_results]
+    return query_vector, context_ids, format_context(search_results)
+
+
+def generate_final_answer(user_question):
+    """ Retrieves relevant data using RAG and reformats response via Mistral. """
+
+    # Step 1: Retrieve relevant content
+    query_vector, context_ids, retrieved_context = retrieve_for_answer(user_question)
+
+    # Step 2: Reuse the answer of a near-identical question that retrieved the same context
+    cached_answer = answer_cache.lookup(query_vector, context_ids)
+    if cached_answer is not None:
+        logger.info("♻️ Answer served from semantic cache")
+        return cached_answer
+
+    # Step 3: Generate final answer using Mistral, **without adding its own response**
+    mistral_prompt = build_answer_prompt(user_question, retrieved_context)
+
     try:
-        final_response = ollama.chat(model=MODEL_NAME, messages=[{"role": "user", "content": mistral_prompt}])
-        return final_response["message"]["content"]
+        start = time.perf_counter()
+        final_response = gateway.chat("rag_answer", [{"role": "user", "content": mistral_prompt}], model=MODEL_NAME)
+        answer = final_response["message"]["content"]
+        logger.info(f"⏱ Generation stats: {generation_stats(start, None, final_response)}")
     except Exception as e:
         logger.error(f"❌ Error generating answer via Mistral: {str(e)}")
         return "Failed to process request."
 
+    answer_cache.store(query_vector, context_ids, answer)
+    return answer
+
+
+def stream_final_answer(user_question):
+    """ Same pipeline as `generate_final_answer`, but yields Mistral's tokens as they arrive. """
+
+    # Step 1: Retrieve relevant content
+    query_vector, context_ids, retrieved_context = retrieve_for_answer(user_question)
+
+    # Step 2: A cached answer is emitted in one piece
+    cached_answer = answer_cache.lookup(query_vector, context_ids)
+    if cached_answer is not None:
+        logger.info("♻️ Answer served from semantic cache")
+        yield cached_answer
+        return
+
+    # Step 3: Stream the answer from Mistral
+    mistral_prompt = build_answer_prompt(user_question, retrieved_context)
+    start = time.perf_counter()
+    first_token_at = None
+    final_chunk = None
+    pieces = []
+
+    try:
+        with gateway.chat("rag_answer", [{"role": "user", "content": mistral_prompt}], model=MODEL_NAME, stream=True) as stream:
+            for chunk in stream:
+                token = chunk["message"]["content"]
+                if token:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    pieces.append(token)
+                    yield token
+                if chunk.get("done"):
+                    final_chunk = chunk
+    except Exception as e:
+        logger.error(f"❌ Error streaming answer via Mistral: {str(e)}")
+        # Tokens already printed stay on screen; say that the answer stops here
+        yield "\n\n⚠️ [Answer interrupted: the model stream failed]" if pieces else "Failed to process request."
+        return
+
+    logger.info(f"⏱ Generation stats: {generation_stats(start, first_token_at, final_chunk, len(pieces))}")
+    answer_cache.store(query_vector, context_ids, "".join(pieces))
+
+
 # Execute Query with User Input
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ask a question against the kongunadu collection.")
+    parser.add_argument("--no-stream", action="store_true", help="Wait for the full answer instead of streaming tokens")
+    args = parser.parse_args()
+
+    # Models load while the user types; the first answer waits for whatever is still loading
+    start_warm_up()
     user_query = input("📝 Enter your question: ")  # Allow dynamic user input
-    final_answer = generate_final_answer(user_query)
-    print(f"\n🎯 Final Answer:\n{final_answer}")
+    if args.no_stream:
+        final_answer = generate_final_answer(user_query)
+        print(f"\n🎯 Final Answer:\n{final_answer}")
+    else:
+        print("\n🎯 Final Answer:")
+        for token in stream_final_answer(user_query):
+            print(token, end="", flush=True)
+        print()
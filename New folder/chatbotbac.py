@@ -1,44 +1,108 @@
-import qdrant_client
-from qdrant_client.http import models
-from sentence_transformers import SentenceTransformer
-import ollama
 import logging
+import os
+import threading
+import time
+
+from onnx_embedder import load_embedder
+from query_rewrite import QueryRewriter, build_acronym_dictionary, load_corpus_text
+from vector_backend import get_vector_client
+
+from llm_gateway import gateway
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
-# Connect to Qdrant
-QDRANT_URL = "http://localhost:6333"
+# Connect to the vector store (Qdrant server, embedded Qdrant or NumPy index; see vector_backend.py)
 COLLECTION_NAME = "txt_file_data"
 
-qdrant_client = qdrant_client.QdrantClient(QDRANT_URL)
+# Query rewriting before retrieval: original | local | llm | rrf | rrf-llm (see query_rewrite.py)
+QUERY_REWRITE_MODE = os.environ.get("QUERY_REWRITE_MODE", "rrf")
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CORPUS_PATHS = [os.path.join(BASE_DIR, "kongunadu_data.txt"), os.path.join(BASE_DIR, "kongunadu_dataset.csv")]
 
-# Initialize Sentence Transformer for Embeddings
-embedder = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
-
-# Load Mistral model via Ollama
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 MODEL_NAME = "mistral:7B"
-try:
-    response = ollama.chat(model=MODEL_NAME, messages=[{"role": "system", "content": "You are an AI assistant."}])
-    logger.info(f"✅ Mistral model '{MODEL_NAME}' loaded successfully.")
-except Exception as e:
-    logger.error(f"❌ Error loading Mistral model: {str(e)}")
-    exit(1)
+
+# The embedder, vector store client and query rewriter are created on first use, or ahead of time by
+# `warm_up()`, so importing this module stays cheap (same scheme as chatbot.py)
+_components = {}
+_components_lock = threading.RLock()
+
+
+def _component(name, factory):
+    if name not in _components:
+        with _components_lock:
+            if name not in _components:
+                start = time.perf_counter()
+                _components[name] = factory()
+                logger.info(f"✅ Loaded {name} in {time.perf_counter() - start:.2f}s")
+    return _components[name]
+
+
+def get_embedder():
+    return _component("embedder", lambda: load_embedder(EMBEDDING_MODEL))
+
+
+def get_search_client():
+    def connect():
+        from retrieval import SearchClient, SearchParams
+        return SearchClient(get_vector_client(), COLLECTION_NAME, SearchParams(limit=5))
+    return _component("search_client", connect)
+
+
+def get_query_rewriter():
+    # Acronyms (CSE, ECE, ...) are learned from the same corpus that was ingested into Qdrant
+    return _component("query_rewriter", lambda: QueryRewriter(
+        search_qdrant,
+        analyze_question_format,
+        build_acronym_dictionary(load_corpus_text(CORPUS_PATHS)),
+        mode=QUERY_REWRITE_MODE,
+    ))
+
+
+def warm_up():
+    """ Loads the retrieval components, then Mistral. An unreachable Ollama is logged, not fatal. """
+    get_embedder()
+    get_search_client()
+    get_query_rewriter()
+    try:
+        gateway.warm("rag_answer", model=MODEL_NAME)
+        logger.info(f"✅ Mistral model '{MODEL_NAME}' loaded successfully.")
+    except Exception as e:
+        logger.error(f"❌ Error loading Mistral model: {str(e)}")
+
+
+def start_warm_up():
+    """ Runs `warm_up()` on a daemon thread so the CLI can prompt for input while models load. """
+    def run():
+        try:
+            warm_up()
+        except Exception as e:
+            logger.error(f"❌ Warm-up failed: {str(e)}")
+
+    thread = threading.Thread(target=run, name="rag-warm-up", daemon=True)
+    thread.start()
+    return thread
+
 
 def retrieve_data_from_qdrant(user_query):
     """ Converts user query to vector, searches Qdrant, and retrieves matched results. """
+    return format_context(search_qdrant(user_query))
+
+
+def search_qdrant(user_query):
+    """ Returns the ranked Qdrant points for a query string. """
 
     # Convert query to vector
-    query_vector = embedder.encode(user_query).tolist()
+    query_vector = get_embedder().encode(user_query).tolist()
+
+    # Search in Qdrant (top 5, `content` payload only)
+    return get_search_client().search(query_vector)
 
-    # Search in Qdrant
-    search_results = qdrant_client.search(
-        collection_name=COLLECTION_NAME,
-        query_vector=query_vector,
-        limit=5,  # Retrieve top 5 relevant results
-        query_filter=models.Filter(must=[models.FieldCondition(key="type", match=models.MatchValue(value="answer"))])
-    )
+
+def format_context(search_results):
+    """ Joins the matched payloads into the context block handed to Mistral. """
 
     # Extract relevant answers
     matched_responses = [result.payload["content"] for result in search_results]
@@ -56,7 +120,7 @@ def analyze_question_format(user_question):
     """
 
     try:
-        analysis_response = ollama.chat(model=MODEL_NAME, messages=[{"role": "user", "content": analysis_prompt}])
+        analysis_response = gateway.chat("query_rewrite", [{"role": "user", "content": analysis_prompt}], model=MODEL_NAME)
         return analysis_response["message"]["content"]
     except Exception as e:
         logger.error(f"❌ Error analyzing question format via Mistral: {str(e)}")
@@ -65,12 +129,11 @@ def analyze_question_format(user_question):
 def generate_final_answer(user_question):
     """ Retrieves relevant data using RAG and reformulates response via Mistral. """
 
-    # Step 1: Analyze question format
-    structured_query = analyze_question_format(user_question)
-    logger.info(f"🔍 Reformulated Query: {structured_query}")
-
-    # Step 2: Retrieve relevant content
-    retrieved_context = retrieve_data_from_qdrant(structured_query)
+    # Step 1 + 2: Rewrite the question (locally unless an LLM mode is configured) and retrieve relevant content
+    query_rewriter = get_query_rewriter()
+    search_results, structured_query = query_rewriter.retrieve(user_question)
+    logger.info(f"🔍 Reformulated Query ({query_rewriter.mode}): {structured_query}")
+    retrieved_context = format_context(search_results)
 
     # Step 3: Generate final answer using Mistral
     mistral_prompt = f"""
@@ -93,7 +156,7 @@ def generate_final_answer(user_question):
     """
 
     try:
-        final_response = ollama.chat(model=MODEL_NAME, messages=[{"role": "user", "content": mistral_prompt}])
+        final_response = gateway.chat("rag_answer", [{"role": "user", "content": mistral_prompt}], model=MODEL_NAME)
         return final_response["message"]["content"]
     except Exception as e:
         logger.error(f"❌ Error generating answer via Mistral: {str(e)}")
@@ -101,6 +164,11 @@ def generate_final_answer(user_question):
 
 # Execute Query with User Input
 if __name__ == "__main__":
+    # Models load while the user types; the first answer waits for whatever is still loading
+    start_warm_up()
     user_query = input("📝 Enter your question: ")  # Allow dynamic user input
-    final_answer = generate_final_answer(user_query)
+    try:
+        final_answer = generate_final_answer(user_query)
+    finally:
+        get_query_rewriter().close()
     print(f"\n🎯 Final Answer:\n{final_answer}")
@@ -0,0 +1,340 @@
+import heapq
+import json
+import logging
+import os
+import time
+import urllib.error
+import urllib.request
+import urllib.robotparser
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from html.parser import HTMLParser
+from urllib.parse import urldefrag, urljoin, urlsplit, urlunsplit
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "Mozilla/5.0 (compatible; KongunaduRAGCrawler/1.0)"
+
+# Politeness: at least this many seconds between two requests to the same host (robots.txt Crawl-delay can
+# raise it), doubled on 429/503 answers up to MAX_HOST_DELAY and relaxed again after successes
+DEFAULT_HOST_DELAY = float(os.environ.get("CRAWL_HOST_DELAY", "1.0"))
+MAX_HOST_DELAY = 60.0
+# A URL answered with 429/503 (or not loaded at all) goes back into the queue behind the backed-off host delay;
+# after this many attempts it is recorded as visited with its last status and not tried again
+MAX_ATTEMPTS = 3
+RETRY_STATUSES = (429, 503, None)
+
+# Priority: lower runs first. Each link hop costs DEPTH_WEIGHT; a page whose sitemap <lastmod> is recent gains
+# up to FRESHNESS_WEIGHT, halving every FRESHNESS_HALF_LIFE_DAYS; the sitemap's own <priority> (0..1) adds to it
+DEPTH_WEIGHT = 1.0
+FRESHNESS_WEIGHT = 1.0
+FRESHNESS_HALF_LIFE_DAYS = 30.0
+
+# Discovered links to these never hold page text
+SKIP_EXTENSIONS = (
+    ".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp", ".ico", ".css", ".js", ".zip", ".rar", ".mp4", ".mp3",
+    ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx",
+)
+
+SITEMAP_NS = "{http://www.sitemaps.org/schemas/sitemap/0.9}"
+
+
+def normalize_url(url, base=None):
+    """ Absolute http(s) URL without fragment, default port or empty path; None for anything else. """
+    url = urljoin(base, url.strip()) if base else url.strip()
+    url, _ = urldefrag(url)
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        return None
+    host = parts.hostname.lower()
+    if parts.port and parts.port != {"http": 80, "https": 443}[parts.scheme]:
+        host = f"{host}:{parts.port}"
+    return urlunsplit((parts.scheme, host, parts.path or "/", parts.query, ""))
+
+
+def _host(url):
+    return urlsplit(url).netloc
+
+
+def _parse_lastmod(value):
+    try:
+        moment = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except (AttributeError, ValueError):
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def fetch(url, timeout=15):
+    """ GET `url` with the crawler's user agent; returns `(status, body bytes)`. """
+    request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, b""
+
+
+class _LinkParser(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.links = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("a", "area"):
+            href = dict(attrs).get("href")
+            if href:
+                self.links.append(href)
+
+
+def extract_links(html):
+    """ Every `<a href>` / `<area href>` in the page, as written. """
+    parser = _LinkParser()
+    parser.feed(html)
+    return parser.links
+
+
+class CrawlFrontier:
+    """ Which URL to crawl next, and when.
+
+    A heap of (score, sequence, url) ordered by link depth and sitemap freshness; per-host delays from
+    `DEFAULT_HOST_DELAY`, robots.txt Crawl-delay and back-off; and a JSON checkpoint so an interrupted crawl
+    resumes where it stopped. The frontier does not fetch pages itself: the caller renders them (scraping.py
+    uses Playwright), then reports the outcome and the links it found.
+    """
+
+    def __init__(self, allowed_hosts, max_depth=3, max_pages=200, checkpoint_path=None, host_delay=DEFAULT_HOST_DELAY,
+                 respect_robots=True, clock=time.monotonic, sleep=time.sleep):
+        self.allowed_hosts = {host.lower() for host in allowed_hosts}
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.checkpoint_path = checkpoint_path
+        self.host_delay = host_delay
+        self.respect_robots = respect_robots
+        self._clock = clock
+        self._sleep = sleep
+
+        self._heap = []
+        self._sequence = 0
+        self.queued = {}     # url -> {"score", "depth"}; heap entries not matching it are stale
+        self.visited = {}    # url -> {"status", "fetched_at", "depth"}
+        self.lastmod = {}    # url -> sitemap <lastmod> as a UNIX timestamp
+        self.sitemap_priority = {}
+        self.host_delays = {}
+        self.attempts = {}   # url -> failed attempts so far (429/503/no response)
+        self._next_allowed = {}
+        self._robots = {}
+
+    # --- scheduling -------------------------------------------------------------------------------------
+
+    def allowed(self, url):
+        if url is None or _host(url) not in self.allowed_hosts:
+            return False
+        if not self.respect_robots:
+            return True
+        return self._robots_for(url).can_fetch(USER_AGENT, url)
+
+    def score(self, url, depth):
+        freshness = 0.0
+        if url in self.lastmod:
+            age_days = max(0.0, (time.time() - self.lastmod[url]) / 86400)
+            freshness = FRESHNESS_WEIGHT * 0.5 ** (age_days / FRESHNESS_HALF_LIFE_DAYS)
+        return DEPTH_WEIGHT * depth - freshness - self.sitemap_priority.get(url, 0.0)
+
+    def add(self, url, depth=0, base=None):
+        """ Queues `url` unless it is off-site, too deep, disallowed, already queued as shallow, or visited and
+        unchanged since (a newer sitemap <lastmod> than the visit re-queues it). Returns True when queued. """
+        url = normalize_url(url, base)
+        if url is None or depth > self.max_depth:
+            return False
+        if base is not None and urlsplit(url).path.lower().endswith(SKIP_EXTENSIONS):
+            return False
+        visit = self.visited.get(url)
+        if visit is not None and not (url in self.lastmod and self.lastmod[url] > visit["fetched_at"]):
+            return False
+        current = self.queued.get(url)
+        if current is not None and current["depth"] <= depth:
+            return False
+        if not self.allowed(url):
+            return False
+
+        score = self.score(url, depth)
+        self.queued[url] = {"score": score, "depth": depth}
+        self._sequence += 1
+        heapq.heappush(self._heap, (score, self._sequence, url))
+        return True
+
+    def add_links(self, page_url, links, page_depth):
+        """ Queues the links found on `page_url` one hop deeper; returns how many were new. """
+        return sum(self.add(link, page_depth + 1, base=page_url) for link in links)
+
+    def add_sitemap(self, sitemap_url, depth=0, _nested=0):
+        """ Queues the <loc> entries of a sitemap (following sitemap indexes) with their lastmod/priority. """
+        try:
+            status, body = fetch(sitemap_url)
+        except (urllib.error.URLError, OSError) as e:
+            logger.warning(f"⚠️ Could not fetch sitemap {sitemap_url}: {e}")
+            return 0
+        if status != 200 or not body:
+            logger.warning(f"⚠️ No sitemap at {sitemap_url} (HTTP {status})")
+            return 0
+        try:
+            root = ET.fromstring(body)
+        except ET.ParseError as e:
+            logger.warning(f"⚠️ Unreadable sitemap {sitemap_url}: {e}")
+            return 0
+
+        added = 0
+        if root.tag == f"{SITEMAP_NS}sitemapindex":
+            if _nested < 2:
+                for loc in root.iter(f"{SITEMAP_NS}loc"):
+                    added += self.add_sitemap(loc.text.strip(), depth, _nested + 1)
+            return added
+
+        for entry in root.iter(f"{SITEMAP_NS}url"):
+            loc = entry.findtext(f"{SITEMAP_NS}loc")
+            url = normalize_url(loc) if loc else None
+            if url is None:
+                continue
+            lastmod = _parse_lastmod(entry.findtext(f"{SITEMAP_NS}lastmod") or "")
+            if lastmod is not None:
+                self.lastmod[url] = lastmod
+            priority = entry.findtext(f"{SITEMAP_NS}priority")
+            if priority:
+                try:
+                    self.sitemap_priority[url] = min(1.0, max(0.0, float(priority)))
+                except ValueError:
+                    pass
+            added += self.add(url, depth)
+        logger.info(f"🗺 Queued {added} URLs from {sitemap_url}")
+        return added
+
+    def _robots_for(self, url):
+        parts = urlsplit(url)
+        host = parts.netloc
+        if host not in self._robots:
+            parser = urllib.robotparser.RobotFileParser(f"{parts.scheme}://{host}/robots.txt")
+            try:
+                status, body = fetch(parser.url)
+                if status == 200:
+                    parser.parse(body.decode("utf-8", errors="replace").splitlines())
+                else:
+                    parser.allow_all = True
+            except Exception as e:
+                logger.warning(f"⚠️ Could not read {parser.url}: {e}")
+                parser.allow_all = True
+            delay = parser.crawl_delay(USER_AGENT)
+            if delay:
+                self.host_delays[host] = max(self.host_delays.get(host, self.host_delay), float(delay))
+            self._robots[host] = parser
+        return self._robots[host]
+
+    def _delay(self, host):
+        return self.host_delays.get(host, self.host_delay)
+
+    def __len__(self):
+        return len(self.queued)
+
+    def done(self):
+        return not self.queued or len(self.visited) >= self.max_pages
+
+    def next_url(self):
+        """ Highest-priority URL whose host may be contacted now, waiting for the soonest host if none can.
+        Returns `(url, depth)`, or None when the frontier is empty or `max_pages` were crawled. """
+        while not self.done():
+            waiting = []
+            chosen = None
+            while self._heap:
+                score, sequence, url = heapq.heappop(self._heap)
+                entry = self.queued.get(url)
+                if entry is None or entry["score"] != score:
+                    continue  # superseded by a shallower re-add, or already handed out
+                if self._next_allowed.get(_host(url), 0.0) <= self._clock():
+                    chosen = (url, entry["depth"])
+                    break
+                waiting.append((score, sequence, url))
+            for item in waiting:
+                heapq.heappush(self._heap, item)
+
+            if chosen is not None:
+                url, depth = chosen
+                del self.queued[url]
+                self._next_allowed[_host(url)] = self._clock() + self._delay(_host(url))
+                return url, depth
+            if not waiting:
+                return None
+            self._sleep(max(0.0, min(self._next_allowed[_host(url)] for _, _, url in waiting) - self._clock()))
+        return None
+
+    def record(self, url, depth, status, links=()):
+        """ Marks `url` as visited, queues its links, adapts the host delay and checkpoints periodically.
+
+        A 429/503 or a page that did not load (status None) backs the host off and re-queues `url` to be tried
+        again once the longer delay has passed, up to `MAX_ATTEMPTS` times. Returns how many links were queued.
+        """
+        host = _host(url)
+        if status in RETRY_STATUSES:
+            self.host_delays[host] = min(MAX_HOST_DELAY, self._delay(host) * 2)
+            self._next_allowed[host] = self._clock() + self.host_delays[host]
+            self.attempts[url] = self.attempts.get(url, 0) + 1
+            if self.attempts[url] < MAX_ATTEMPTS:
+                self.add(url, depth)
+                logger.warning(f"⏳ {url} answered {status or 'nothing'}, retrying after {self.host_delays[host]:.1f}s "
+                               f"(attempt {self.attempts[url]} of {MAX_ATTEMPTS})")
+                return 0
+            logger.warning(f"⚠️ Giving up on {url} after {MAX_ATTEMPTS} attempts (last answer: {status or 'nothing'})")
+        elif host in self.host_delays and self.host_delays[host] > self.host_delay:
+            self.host_delays[host] = max(self.host_delay, self.host_delays[host] * 0.9)
+
+        self.attempts.pop(url, None)
+        self.visited[url] = {"status": status, "fetched_at": time.time(), "depth": depth}
+        added = self.add_links(url, links, depth) if links else 0
+        if self.checkpoint_path and len(self.visited) % 10 == 0:
+            self.save()
+        return added
+
+    # --- checkpoints ------------------------------------------------------------------------------------
+
+    def state(self):
+        return {
+            "allowed_hosts": sorted(self.allowed_hosts),
+            "max_depth": self.max_depth,
+            "max_pages": self.max_pages,
+            "queued": [[url, entry["depth"]] for url, entry in self.queued.items()],
+            "visited": self.visited,
+            "lastmod": self.lastmod,
+            "sitemap_priority": self.sitemap_priority,
+            "host_delays": self.host_delays,
+            "attempts": self.attempts,
+            "saved_at": datetime.now(timezone.utc).isoformat(),
+        }
+
+    def save(self, path=None):
+        path = path or self.checkpoint_path
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state(), f, indent=2)
+        os.replace(tmp_path, path)  # atomic, so a crash mid-write never leaves a truncated checkpoint
+        logger.info(f"💾 Checkpoint: {len(self.visited)} visited, {len(self.queued)} queued -> {path}")
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        """ Rebuilds a frontier from `save()`; keyword arguments override the saved limits (a raised `max_depth`
+        only applies to links found from now on: deeper links dropped by the previous run are not recovered). """
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        options = {"max_depth": state["max_depth"], "max_pages": state["max_pages"], **kwargs}
+        frontier = cls(state["allowed_hosts"], checkpoint_path=path, **options)
+        frontier.visited = state["visited"]
+        frontier.lastmod = state["lastmod"]
+        frontier.sitemap_priority = state["sitemap_priority"]
+        frontier.host_delays = state["host_delays"]
+        frontier.attempts = state.get("attempts", {})
+        for url, depth in state["queued"]:
+            frontier.add(url, depth)
+        # The previous run may have hit these hosts a moment ago
+        for host in {_host(url) for url in frontier.queued}:
+            frontier._next_allowed[host] = frontier._clock() + frontier._delay(host)
+        logger.info(f"♻️ Resumed crawl from {path}: {len(frontier.visited)} visited, {len(frontier.queued)} queued")
+        return frontier
@@ -0,0 +1,103 @@
+import asyncio
+import logging
+import time
+
+from latency import LatencyTracker
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """ Collects concurrent questions for up to `max_wait_ms` or `max_batch_size` items, embeds them with one
+    `encode` call and searches Qdrant with one `query_batch_points` request through `search_client`. """
+
+    def __init__(self, embedder, search_client, max_batch_size=16, max_wait_ms=5.0, latency=None):
+        self.embedder = embedder
+        self.search_client = search_client
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.latency = latency or LatencyTracker()
+        self.batches = 0
+        self.items = 0
+        self._queue = asyncio.Queue()
+        self._worker = None
+
+    async def start(self):
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def search(self, question):
+        """ Returns `(query_vector, points)` for a single question once its batch has been processed. """
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((question, future, time.perf_counter()))
+        return await future
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queue_depth": self._queue.qsize(),
+        }
+
+    async def _collect(self):
+        """ Waits for the first question, then keeps collecting until the batch is full or the wait budget is spent. """
+        batch = [await self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        # Anything that is already queued rides along for free
+        while len(batch) < self.max_batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            dispatched = time.perf_counter()
+            for _, _, enqueued in batch:
+                self.latency.record("queue_wait", dispatched - enqueued)
+
+            try:
+                results = await asyncio.to_thread(self._embed_and_search, [question for question, _, _ in batch])
+            except Exception as e:
+                logger.error(f"❌ Batched search failed for {len(batch)} questions: {str(e)}")
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.items += len(batch)
+            finished = time.perf_counter()
+            for (_, future, enqueued), result in zip(batch, results):
+                self.latency.record("batched_search", finished - enqueued)
+                if not future.done():
+                    future.set_result(result)
+
+    def _embed_and_search(self, questions):
+        """ One matmul for all question vectors and one round trip to Qdrant. """
+        with self.latency.measure("batch_embed"):
+            vectors = self.embedder.encode(questions, batch_size=len(questions), convert_to_tensor=False)
+
+        with self.latency.measure("batch_qdrant"):
+            results = self.search_client.search_batch(vectors)
+
+        return list(zip(vectors, results))
@@ -0,0 +1,74 @@
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+
+from instrumentation import percentile  # re-exported for the benchmarks
+
+
+class LatencyTracker:
+    """ Keeps a bounded window of recent latencies per stage and reports p50/p99.
+
+    `on_record(stage, seconds)`, when given, also receives every sample (e.g. to feed a Prometheus histogram).
+    """
+
+    def __init__(self, window=1000, on_record=None):
+        self._window = window
+        self._on_record = on_record
+        self._samples = defaultdict(lambda: deque(maxlen=self._window))
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self._samples[stage].append(seconds)
+            self._counts[stage] += 1
+        if self._on_record is not None:
+            self._on_record(stage, seconds)
+
+    @contextmanager
+    def measure(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def snapshot(self):
+        """ Returns {stage: {count, p50_ms, p99_ms, max_ms}} for every recorded stage. """
+        with self._lock:
+            samples = {stage: list(values) for stage, values in self._samples.items()}
+            counts = dict(self._counts)
+
+        report = {}
+        for stage, values in samples.items():
+            report[stage] = {
+                "count": counts[stage],
+                "p50_ms": round(percentile(values, 50) * 1000, 2),
+                "p99_ms": round(percentile(values, 99) * 1000, 2),
+                "max_ms": round(max(values) * 1000, 2) if values else 0.0,
+            }
+        return report
+
+
+def generation_stats(start, first_token_at, final_chunk=None, streamed_tokens=0):
+    """ Time-to-first-token and decode throughput for one LLM call.
+
+    Ollama reports `eval_count`/`eval_duration` (ns) on the final response; when they are missing the number
+    of streamed chunks over the wall-clock decode time is used instead.
+    """
+    end = time.perf_counter()
+    first_token_at = first_token_at or end
+    final_chunk = final_chunk or {}
+
+    tokens = final_chunk.get("eval_count") or streamed_tokens
+    eval_seconds = (final_chunk.get("eval_duration") or 0) / 1e9
+    if not eval_seconds:
+        eval_seconds = end - first_token_at
+
+    return {
+        "ttft_ms": round((first_token_at - start) * 1000, 2),
+        "total_ms": round((end - start) * 1000, 2),
+        "tokens": tokens,
+        "tokens_per_sec": round(tokens / eval_seconds, 2) if tokens and eval_seconds > 0 else 0.0,
+    }
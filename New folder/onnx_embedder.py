@@ -0,0 +1,282 @@
+import json
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Which runtime embeds text and scores reranker pairs:
+#   torch - sentence-transformers on PyTorch (the original setup)
+#   onnx  - the same models exported to ONNX (int8 by default) on onnxruntime; torch is never imported
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "torch")
+ONNX_MODEL_DIR = os.environ.get("ONNX_MODEL_DIR", os.path.join(BASE_DIR, "onnx_models"))
+ONNX_QUANTIZED = os.environ.get("ONNX_QUANTIZED", "1") == "1"
+
+EMBEDDING_BACKENDS = ("torch", "onnx")
+
+# The two models used in this folder (store.py / chatbot.py and scrab_store.py)
+MODEL_ALIASES = {
+    "minilm": "sentence-transformers/all-MiniLM-L6-v2",
+    "mpnet": "sentence-transformers/all-mpnet-base-v2",
+}
+
+FP32_FILE = "model.onnx"
+INT8_FILE = "model.int8.onnx"
+META_FILE = "embedder.json"
+
+
+def model_dir_for(model_name, root=None):
+    """ sentence-transformers/all-MiniLM-L6-v2 -> <ONNX_MODEL_DIR>/all-MiniLM-L6-v2 """
+    return os.path.join(root or ONNX_MODEL_DIR, model_name.rstrip("/").split("/")[-1])
+
+
+def _export_onnx(hf_model, tokenizer, output_name, output_dir, quantize, opset, sample):
+    """ Writes `hf_model`'s `output_name` output as model.onnx (and model.int8.onnx) plus the tokenizer. """
+    import inspect
+
+    import torch
+
+    input_names = list(tokenizer.model_input_names)
+
+    class Output(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.model = hf_model
+
+        def forward(self, *inputs):
+            return getattr(self.model(**dict(zip(input_names, inputs))), output_name)
+
+    encoded = tokenizer(*sample, padding=True, truncation=True, return_tensors="pt")
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes[output_name] = {0: "batch"} if output_name == "logits" else {0: "batch", 1: "sequence"}
+    # The dynamo exporter (newer torch default) does not honour dynamic_axes; stay on the TorchScript exporter
+    extra = {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+
+    fp32_path = os.path.join(output_dir, FP32_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            Output().eval(),
+            tuple(encoded[name] for name in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=[output_name],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+            do_constant_folding=True,
+            **extra,
+        )
+    logger.info(f"✅ Exported {fp32_path}")
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(fp32_path, os.path.join(output_dir, INT8_FILE), weight_type=QuantType.QInt8)
+        logger.info(f"✅ Wrote int8 weights to {os.path.join(output_dir, INT8_FILE)}")
+
+    tokenizer.save_pretrained(output_dir)
+    return {"input_names": input_names, "pad_token": tokenizer.pad_token, "pad_token_id": tokenizer.pad_token_id}
+
+
+def export_model(model_name, output_dir=None, quantize=True, opset=14):
+    """ Exports a sentence-transformers model to ONNX (+ a dynamically int8-quantized copy) with its tokenizer.
+
+    Needs torch, sentence-transformers, onnx and onnxruntime, but only here: the exported directory is
+    loaded by `OnnxEmbedder` with onnxruntime + tokenizers alone.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    output_dir = output_dir or model_dir_for(model_name)
+    os.makedirs(output_dir, exist_ok=True)
+
+    model = SentenceTransformer(model_name, device="cpu")
+    transformer, pooling = model[0], model[1]
+    # sentence-transformers < 5 spells it `pooling_mode_mean_tokens`, newer releases `pooling_mode: "mean"`
+    pooling_config = pooling.get_config_dict()
+    if not (pooling_config.get("pooling_mode") == "mean" or pooling_config.get("pooling_mode_mean_tokens")):
+        raise ValueError(f"{model_name} does not use mean pooling; only mean-pooled models can be exported")
+    normalize = any(type(module).__name__ == "Normalize" for module in model)
+
+    exported = _export_onnx(transformer.auto_model.eval(), transformer.tokenizer, "last_hidden_state", output_dir,
+                            quantize, opset, (["Export sample sentence.", "Another one"],))
+    with open(os.path.join(output_dir, META_FILE), "w", encoding="utf-8") as f:
+        json.dump({
+            "model_name": model_name,
+            "max_seq_length": model.max_seq_length,
+            "dimension": model.get_sentence_embedding_dimension(),
+            "normalize": normalize,
+            **exported,
+        }, f, indent=2)
+    return output_dir
+
+
+def export_cross_encoder(model_name, output_dir=None, quantize=True, opset=14):
+    """ Exports a single-label sentence-transformers `CrossEncoder` (the reranker's model) the same way. """
+    from sentence_transformers import CrossEncoder
+
+    output_dir = output_dir or model_dir_for(model_name)
+    os.makedirs(output_dir, exist_ok=True)
+
+    model = CrossEncoder(model_name, device="cpu")
+    if model.config.num_labels != 1:
+        raise ValueError(f"{model_name} has {model.config.num_labels} labels; only single-score rerankers can be exported")
+    exported = _export_onnx(model.model.eval(), model.tokenizer, "logits", output_dir, quantize, opset,
+                            (["Export sample question?", "Another one"], ["A passage to score.", "Another passage"]))
+    with open(os.path.join(output_dir, META_FILE), "w", encoding="utf-8") as f:
+        json.dump({
+            "model_name": model_name,
+            "max_seq_length": model.max_length or model.tokenizer.model_max_length,
+            "kind": "cross-encoder",
+            **exported,
+        }, f, indent=2)
+    return output_dir
+
+
+def _load_export(model_dir, quantized, threads):
+    """ `(meta, tokenizer, session)` of an exported directory. """
+    import onnxruntime
+    from tokenizers import Tokenizer
+
+    with open(os.path.join(model_dir, META_FILE), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+    tokenizer.enable_truncation(max_length=meta["max_seq_length"])
+    tokenizer.enable_padding(pad_id=meta["pad_token_id"], pad_token=meta["pad_token"])
+
+    options = onnxruntime.SessionOptions()
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if threads:
+        options.intra_op_num_threads = threads
+    model_file = INT8_FILE if quantized and os.path.exists(os.path.join(model_dir, INT8_FILE)) else FP32_FILE
+    session = onnxruntime.InferenceSession(os.path.join(model_dir, model_file), options, providers=["CPUExecutionProvider"])
+    logger.info(f"✅ Loaded ONNX model {meta['model_name']} ({model_file})")
+    return meta, tokenizer, session
+
+
+def _run(session, encodings):
+    arrays = {
+        "input_ids": np.array([encoding.ids for encoding in encodings], dtype=np.int64),
+        "attention_mask": np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64),
+        "token_type_ids": np.array([encoding.type_ids for encoding in encodings], dtype=np.int64),
+    }
+    input_names = [model_input.name for model_input in session.get_inputs()]
+    return session.run(None, {name: arrays[name] for name in input_names})[0], arrays["attention_mask"]
+
+
+class OnnxEmbedder:
+    """ `SentenceTransformer.encode` look-alike over an exported model: tokenizers + onnxruntime, mean pooling,
+    optional L2 normalisation. Returns NumPy arrays like the torch model does with `convert_to_tensor=False`. """
+
+    def __init__(self, model_dir, quantized=ONNX_QUANTIZED, batch_size=32, threads=None):
+        self.meta, self.tokenizer, self.session = _load_export(model_dir, quantized, threads)
+        self.model_dir = model_dir
+        self.batch_size = batch_size
+        self.max_seq_length = self.meta["max_seq_length"]
+        self.normalize = self.meta["normalize"]
+
+    def get_sentence_embedding_dimension(self):
+        return self.meta["dimension"]
+
+    def _embed_batch(self, texts, normalize):
+        hidden, attention_mask = _run(self.session, self.tokenizer.encode_batch(texts))
+
+        # Mean pooling over real (non-padding) tokens
+        mask = attention_mask[:, :, None].astype(np.float32)
+        embeddings = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if normalize:
+            embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return embeddings.astype(np.float32)
+
+    def encode(self, sentences, batch_size=None, show_progress_bar=False, convert_to_numpy=True, convert_to_tensor=False,
+               normalize_embeddings=False):
+        """ One string -> 1-D vector, a list -> 2-D array (same shapes as `SentenceTransformer.encode`).
+
+        Only the arguments this folder uses are accepted; anything else is a TypeError rather than being ignored.
+        `normalize_embeddings=True` L2-normalises even when the exported model has no Normalize layer.
+        """
+        if convert_to_tensor or not convert_to_numpy:
+            raise ValueError("OnnxEmbedder only returns NumPy arrays (convert_to_tensor=False, convert_to_numpy=True)")
+        normalize = self.normalize or normalize_embeddings
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, self.get_sentence_embedding_dimension()), dtype=np.float32)
+
+        # Embed in length order so each batch pads to a similar length, then restore the caller's order
+        batch_size = batch_size or self.batch_size
+        order = np.argsort([-len(text) for text in texts], kind="stable")
+        embeddings = np.zeros((len(texts), self.get_sentence_embedding_dimension()), dtype=np.float32)
+        for start in range(0, len(texts), batch_size):
+            positions = order[start:start + batch_size]
+            embeddings[positions] = self._embed_batch([texts[position] for position in positions], normalize)
+        return embeddings[0] if single else embeddings
+
+
+class OnnxCrossEncoder:
+    """ `CrossEncoder.predict` look-alike over `export_cross_encoder` output: one sigmoid relevance score per
+    (question, passage) pair, like sentence-transformers gives single-label models by default. """
+
+    def __init__(self, model_dir, quantized=ONNX_QUANTIZED, batch_size=32, threads=None):
+        self.meta, self.tokenizer, self.session = _load_export(model_dir, quantized, threads)
+        self.model_dir = model_dir
+        self.batch_size = batch_size
+
+    def predict(self, sentence_pairs, batch_size=None, show_progress_bar=False):
+        pairs = [tuple(pair) for pair in sentence_pairs]
+        batch_size = batch_size or self.batch_size
+        scores = np.zeros(len(pairs), dtype=np.float32)
+        for start in range(0, len(pairs), batch_size):
+            logits, _ = _run(self.session, self.tokenizer.encode_batch(pairs[start:start + batch_size]))
+            scores[start:start + batch_size] = 1 / (1 + np.exp(-logits[:, 0]))
+        return scores
+
+
+def load_embedder(model_name, backend=None, **onnx_options):
+    """ Returns an object with `.encode()` / `.get_sentence_embedding_dimension()` for the configured backend.
+
+    With the onnx backend a missing export is created on first use (this one time needs torch).
+    """
+    backend = backend or EMBEDDING_BACKEND
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name)
+    if backend == "onnx":
+        model_dir = model_dir_for(model_name)
+        if not os.path.exists(os.path.join(model_dir, META_FILE)):
+            logger.info(f"📦 No ONNX export of {model_name} in {model_dir}, exporting it now")
+            export_model(model_name, model_dir)
+        return OnnxEmbedder(model_dir, **onnx_options)
+    raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}', expected one of {', '.join(EMBEDDING_BACKENDS)}")
+
+
+def load_cross_encoder(model_name, backend=None, **onnx_options):
+    """ The reranker's cross-encoder on the configured backend, so EMBEDDING_BACKEND=onnx keeps torch out of
+    the serving process entirely (a missing export is created on first use, which needs torch once). """
+    backend = backend or EMBEDDING_BACKEND
+    if backend == "torch":
+        from sentence_transformers import CrossEncoder
+        return CrossEncoder(model_name, device="cpu")
+    if backend == "onnx":
+        model_dir = model_dir_for(model_name)
+        if not os.path.exists(os.path.join(model_dir, META_FILE)):
+            logger.info(f"📦 No ONNX export of {model_name} in {model_dir}, exporting it now")
+            export_cross_encoder(model_name, model_dir)
+        return OnnxCrossEncoder(model_dir, **onnx_options)
+    raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}', expected one of {', '.join(EMBEDDING_BACKENDS)}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export sentence-transformers models to ONNX with int8 dynamic quantization.")
+    parser.add_argument("models", nargs="+", help="e.g. sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--output-root", default=ONNX_MODEL_DIR)
+    parser.add_argument("--no-quantize", action="store_true")
+    parser.add_argument("--cross-encoder", action="store_true", help="The models are rerankers (e.g. cross-encoder/ms-marco-MiniLM-L-6-v2)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    export = export_cross_encoder if args.cross_encoder else export_model
+    for name in args.models:
+        export(name, model_dir_for(name, args.output_root), quantize=not args.no_quantize)
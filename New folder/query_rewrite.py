@@ -0,0 +1,177 @@
+import csv
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Rewrite modes understood by `QueryRewriter`
+#   original - search with the user's question as typed
+#   local    - cheap local rewrite (acronym + keyword expansion), no LLM call
+#   llm      - ask Mistral to reformulate the question first (the old chatbotbac behaviour)
+#   rrf      - search the original and the local rewrite, fuse with reciprocal rank fusion
+#   rrf-llm  - search the original while Mistral rewrites, then fuse both result lists
+REWRITE_MODES = ("original", "local", "llm", "rrf", "rrf-llm")
+
+# Words that may sit inside a long form without contributing a letter (e.g. "Electronics & Communication Engineering")
+ACRONYM_FILLERS = {"of", "and", "&", "the", "for", "in"}
+
+# Domain keywords users type versus the wording used on the college website
+KEYWORD_EXPANSIONS = {
+    "hod": ["Heads of the Departments", "Head"],
+    "head": ["Heads of the Departments"],
+    "email": ["Email", "E-Mail"],
+    "mail": ["Email", "E-Mail"],
+    "phone": ["Mobile", "Phone", "Contact Details"],
+    "mobile": ["Mobile", "Contact Details"],
+    "contact": ["Contact Details", "Mobile", "Email"],
+    "number": ["Mobile", "Phone"],
+    "started": ["established", "commenced"],
+    "start": ["established", "commenced"],
+    "founded": ["established"],
+    "seats": ["intake"],
+    "intake": ["intake", "seats"],
+    "fees": ["fee"],
+    "eligibility": ["Eligibility Criteria", "minimum requirements"],
+}
+
+
+def load_corpus_text(corpus_paths):
+    """ Reads the plain-text and CSV corpora into one string for dictionary building. """
+    parts = []
+    for path in corpus_paths:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                if path.endswith(".csv"):
+                    parts.extend(" ".join(row.values()) for row in csv.DictReader(f))
+                else:
+                    parts.append(f.read())
+        except OSError as e:
+            logger.warning(f"⚠️ Could not read corpus file {path}: {str(e)}")
+    return "\n".join(parts)
+
+
+def build_acronym_dictionary(corpus_text, min_score=2, max_long_forms=2):
+    """ Maps acronyms used in the corpus (CSE, ECE, IT, ...) to the long forms written out in the same corpus.
+
+    A long form is any run of capitalised words whose initials spell the acronym, optionally separated by
+    filler words, e.g. "Computer Science & Engineering" -> CSE. Candidates are scored by how often they occur,
+    with a bonus when written as "Long Form (ACR)", so one-off coincidences are dropped.
+    """
+    acronyms = {token for token in re.findall(r"\b[A-Z]{2,6}\b", corpus_text)}
+    words = re.findall(r"[A-Za-z][A-Za-z\-]*|&|\(", corpus_text)
+
+    scores = {}
+    for start, word in enumerate(words):
+        if not word[0].isupper() or word.isupper():
+            continue
+        initials = ""
+        long_form = []
+        for offset, candidate in enumerate(words[start:start + 12]):
+            if candidate.lower() in ACRONYM_FILLERS and long_form:
+                long_form.append(candidate)
+                continue
+            if not candidate[0].isupper() or candidate.isupper():
+                break
+            initials += candidate[0]
+            long_form.append(candidate)
+            if initials in acronyms:
+                key = (initials, " ".join(long_form))
+                following = words[start + offset + 1:start + offset + 3]
+                scores[key] = scores.get(key, 0) + (5 if following == ["(", initials] else 1)
+            if len(initials) >= 6:
+                break
+
+    dictionary = {}
+    for (acronym, phrase), score in sorted(scores.items(), key=lambda item: -item[1]):
+        if score >= min_score and len(dictionary.setdefault(acronym, [])) < max_long_forms:
+            dictionary[acronym].append(phrase)
+    return {acronym: phrases for acronym, phrases in dictionary.items() if phrases}
+
+
+def local_rewrite(question, acronym_dictionary):
+    """ Appends acronym long forms and website wording to the question; never calls the LLM. """
+    expansions = []
+    for token in re.findall(r"[A-Za-z&]+", question):
+        for phrase in acronym_dictionary.get(token.upper(), []):
+            if phrase.lower() not in question.lower():
+                expansions.append(phrase)
+        expansions.extend(KEYWORD_EXPANSIONS.get(token.lower(), []))
+
+    seen = set()
+    unique = [phrase for phrase in expansions if not (phrase.lower() in seen or seen.add(phrase.lower()))]
+    return f"{question} {' '.join(unique)}".strip() if unique else question
+
+
+def reciprocal_rank_fusion(result_lists, k=60, limit=None):
+    """ Fuses ranked lists of scored points by id: score = sum(1 / (k + rank)). """
+    scores = {}
+    points = {}
+    for results in result_lists:
+        for rank, point in enumerate(results, start=1):
+            scores[point.id] = scores.get(point.id, 0.0) + 1.0 / (k + rank)
+            points.setdefault(point.id, point)
+
+    fused = [points[point_id] for point_id in sorted(scores, key=scores.get, reverse=True)]
+    return fused[:limit] if limit else fused
+
+
+class QueryRewriter:
+    """ Configurable query-rewriting stage in front of vector search.
+
+    `search_fn(text)` returns a ranked list of scored points and `llm_rewrite_fn(text)` returns the
+    LLM-reformulated question; only the `llm` and `rrf-llm` modes ever call the latter. The parallel
+    searches run on a small thread pool; `close()` it (or use the rewriter as a context manager) when done.
+    """
+
+    def __init__(self, search_fn, llm_rewrite_fn, acronym_dictionary, mode="rrf", limit=5):
+        if mode not in REWRITE_MODES:
+            raise ValueError(f"Unknown query rewrite mode '{mode}', expected one of {', '.join(REWRITE_MODES)}")
+        self.search_fn = search_fn
+        self.llm_rewrite_fn = llm_rewrite_fn
+        self.acronym_dictionary = acronym_dictionary
+        self.mode = mode
+        self.limit = limit
+        self._pool = ThreadPoolExecutor(max_workers=2)
+
+    def retrieve(self, question, mode=None):
+        """ Returns `(points, rewritten_query)` for the question under the given (or configured) mode. """
+        mode = mode or self.mode
+
+        if mode == "original":
+            return self.search_fn(question), question
+
+        if mode == "local":
+            rewritten = local_rewrite(question, self.acronym_dictionary)
+            return self.search_fn(rewritten), rewritten
+
+        if mode == "llm":
+            rewritten = self.llm_rewrite_fn(question)
+            return self.search_fn(rewritten), rewritten
+
+        if mode == "rrf":
+            rewritten = local_rewrite(question, self.acronym_dictionary)
+            if rewritten == question:
+                return self.search_fn(question), question
+            original_results = self._pool.submit(self.search_fn, question)
+            rewritten_results = self._pool.submit(self.search_fn, rewritten)
+            fused = reciprocal_rank_fusion([original_results.result(), rewritten_results.result()], limit=self.limit)
+            return fused, rewritten
+
+        if mode == "rrf-llm":
+            # The original search runs while Mistral is still rewriting
+            original_results = self._pool.submit(self.search_fn, question)
+            rewritten = self.llm_rewrite_fn(question)
+            fused = reciprocal_rank_fusion([original_results.result(), self.search_fn(rewritten)], limit=self.limit)
+            return fused, rewritten
+
+        raise ValueError(f"Unknown query rewrite mode '{mode}', expected one of {', '.join(REWRITE_MODES)}")
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
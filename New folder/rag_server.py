@@ -0,0 +1,303 @@
+import argparse
+import asyncio
+import importlib
+import json
+import logging
+import os
+import time
+
+from aiohttp import web
+
+from embed_batcher import MicroBatcher
+from latency import LatencyTracker, generation_stats
+
+from instrumentation import CONTENT_TYPE, observe_stage, registry, render
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Server settings (overridable from the command line)
+DEFAULT_HOST = os.environ.get("RAG_SERVER_HOST", "127.0.0.1")
+DEFAULT_PORT = int(os.environ.get("RAG_SERVER_PORT", "8088"))
+DEFAULT_MAX_BATCH_SIZE = int(os.environ.get("RAG_MAX_BATCH_SIZE", "16"))
+DEFAULT_MAX_WAIT_MS = float(os.environ.get("RAG_MAX_WAIT_MS", "5"))
+
+# Every stage recorded here is also exported as insightgenie_stage_seconds{stage=...} on /metrics
+latency = LatencyTracker(on_record=observe_stage)
+
+
+class PipelineState:
+    """ Everything that changes once the server runs; aiohttp freezes the app itself after startup. """
+
+    def __init__(self):
+        self.ready = False
+        self.load_error = None
+        self.chatbot = None
+        self.llm = None
+        self.batcher = None
+        self.loader = None
+
+
+async def load_pipeline(app):
+    """ Imports `chatbot` and runs its warm-up in a worker thread so the embedder, Qdrant client and Mistral load
+    are paid at startup only, while the server already answers /ready and /metrics. """
+    state = app["state"]
+    start = time.perf_counter()
+    try:
+        chatbot = await asyncio.to_thread(importlib.import_module, "chatbot")
+        await asyncio.to_thread(chatbot.warm_up)
+        state.chatbot = chatbot
+        state.llm = chatbot.gateway
+        state.batcher = MicroBatcher(
+            chatbot.get_embedder(),
+            chatbot.get_search_client(),
+            max_batch_size=app["max_batch_size"],
+            max_wait_ms=app["max_wait_ms"],
+            latency=latency,
+        )
+        await state.batcher.start()
+        register_server_metrics(state)
+        state.ready = True
+        latency.record("startup", time.perf_counter() - start)
+        logger.info(f"✅ RAG pipeline loaded in {time.perf_counter() - start:.2f}s")
+    except Exception as e:
+        # Keep serving /ready so a failed embedder / vector store load is visible
+        state.load_error = str(e) or type(e).__name__
+        logger.error(f"❌ Failed to load RAG pipeline: {state.load_error}")
+
+
+def register_server_metrics(state):
+    batcher = state.batcher
+    registry.gauge("insightgenie_rag_ready", "1 once the RAG pipeline has loaded", fn=lambda: int(state.ready))
+    registry.counter("insightgenie_embed_batches_total", "Micro-batches embedded and searched", fn=lambda: batcher.batches)
+    registry.gauge("insightgenie_embed_batch_size_avg", "Average questions per micro-batch", fn=lambda: batcher.stats()["avg_batch_size"])
+    registry.gauge("insightgenie_embed_queue_depth", "Questions waiting for the next micro-batch", fn=lambda: batcher.stats()["queue_depth"])
+
+
+async def on_startup(app):
+    # The only app key written at startup; handlers and the loader mutate the state object instead
+    app["state"] = state = PipelineState()
+    state.loader = asyncio.create_task(load_pipeline(app))
+
+
+async def on_cleanup(app):
+    state = app["state"]
+    if state.loader is not None and not state.loader.done():
+        state.loader.cancel()
+    if state.batcher is not None:
+        await state.batcher.stop()
+
+
+async def read_question(request):
+    """ Returns `(question, error_response)` for a POST {"question": "..."} body. """
+    if not request.app["state"].ready:
+        return None, web.json_response({"error": "RAG pipeline is still loading"}, status=503)
+
+    try:
+        body = await request.json()
+    except Exception:
+        return None, web.json_response({"error": "Request body must be JSON"}, status=400)
+
+    question = str(body.get("question", "")).strip() if isinstance(body, dict) else ""
+    if not question:
+        return None, web.json_response({"error": "Missing 'question'"}, status=400)
+    return question, None
+
+
+async def retrieve(state, question):
+    """ Embed + search through the micro-batcher so concurrent questions share one encode and one Qdrant call. """
+    search_start = time.perf_counter()
+    query_vector, dense_results = await state.batcher.search(question)
+    # Fusion + cross-encoder reranking are CPU-bound, keep them off the event loop
+    search_results = await asyncio.to_thread(state.chatbot.select_context, question, dense_results)
+    search_seconds = time.perf_counter() - search_start
+    latency.record("search", search_seconds)
+
+    context_ids = [result.id for result in search_results]
+    return query_vector, context_ids, state.chatbot.format_context(search_results), search_seconds
+
+
+def record_generation(stats):
+    latency.record("ttft", stats["ttft_ms"] / 1000)
+    latency.record("generate", stats["total_ms"] / 1000)
+    logger.info(f"⏱ Generation stats: {stats}")
+
+
+async def handle_ask(request):
+    """ POST {"question": "..."} -> {"answer": "...", "timings_ms": {...}} """
+    question, error = await read_question(request)
+    if error is not None:
+        return error
+
+    state = request.app["state"]
+    chatbot = state.chatbot
+    request_start = time.perf_counter()
+
+    # Step 1: Retrieve relevant content
+    try:
+        query_vector, context_ids, retrieved_context, search_seconds = await retrieve(state, question)
+    except Exception as e:
+        return web.json_response({"error": f"Search failed: {str(e)}"}, status=502)
+
+    # Near-duplicate question over the same context: skip generation entirely
+    cached_answer = chatbot.answer_cache.lookup(query_vector, context_ids)
+    if cached_answer is not None:
+        latency.record("request", time.perf_counter() - request_start)
+        return web.json_response({
+            "question": question,
+            "answer": cached_answer,
+            "cached": True,
+            "timings_ms": {"search": round(search_seconds * 1000, 2), "generate": 0.0},
+        })
+
+    # Step 2: Generate the final answer over async HTTP
+    generate_start = time.perf_counter()
+    try:
+        final_response = await state.llm.achat(
+            "rag_answer",
+            [{"role": "user", "content": chatbot.build_answer_prompt(question, retrieved_context)}],
+            model=chatbot.MODEL_NAME,
+        )
+        answer = final_response["message"]["content"]
+    except Exception as e:
+        logger.error(f"❌ Error generating answer via Mistral: {str(e)}")
+        return web.json_response({"error": "Failed to process request."}, status=502)
+    stats = generation_stats(generate_start, None, final_response)
+    record_generation(stats)
+    chatbot.answer_cache.store(query_vector, context_ids, answer)
+
+    latency.record("request", time.perf_counter() - request_start)
+    return web.json_response({
+        "question": question,
+        "answer": answer,
+        "cached": False,
+        "timings_ms": {"search": round(search_seconds * 1000, 2), "generate": stats["total_ms"]},
+        "generation": stats,
+    })
+
+
+async def send_event(response, data, event=None):
+    message = f"event: {event}\n" if event else ""
+    message += f"data: {json.dumps(data)}\n\n"
+    await response.write(message.encode("utf-8"))
+
+
+async def handle_ask_stream(request):
+    """ POST {"question": "..."} -> server-sent events: `data: {"token": ...}` chunks, then `event: done` with stats. """
+    question, error = await read_question(request)
+    if error is not None:
+        return error
+
+    state = request.app["state"]
+    chatbot = state.chatbot
+    request_start = time.perf_counter()
+
+    try:
+        query_vector, context_ids, retrieved_context, search_seconds = await retrieve(state, question)
+    except Exception as e:
+        return web.json_response({"error": f"Search failed: {str(e)}"}, status=502)
+
+    response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+    await response.prepare(request)
+
+    cached_answer = chatbot.answer_cache.lookup(query_vector, context_ids)
+    if cached_answer is not None:
+        await send_event(response, {"token": cached_answer})
+        await send_event(response, {"cached": True, "search_ms": round(search_seconds * 1000, 2)}, event="done")
+        latency.record("request", time.perf_counter() - request_start)
+        await response.write_eof()
+        return response
+
+    generate_start = time.perf_counter()
+    first_token_at = None
+    final_chunk = None
+    pieces = []
+    stream = state.llm.astream(
+        "rag_answer",
+        [{"role": "user", "content": chatbot.build_answer_prompt(question, retrieved_context)}],
+        model=chatbot.MODEL_NAME,
+    )
+    try:
+        async for chunk in stream:
+            token = chunk["message"]["content"]
+            if token:
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                pieces.append(token)
+                await send_event(response, {"token": token})
+            if chunk.get("done"):
+                final_chunk = chunk
+    except (ConnectionResetError, asyncio.CancelledError) as e:
+        # The client went away mid-answer: nobody is left to send an error event to
+        logger.info(f"🔌 Client disconnected after {len(pieces)} streamed tokens")
+        if isinstance(e, asyncio.CancelledError):
+            raise
+        return response
+    except Exception as e:
+        logger.error(f"❌ Error streaming answer via Mistral: {str(e)}")
+        if request.transport is not None and not request.transport.is_closing():
+            try:
+                await send_event(response, {"error": "Failed to process request."}, event="error")
+                await response.write_eof()
+            except ConnectionResetError:
+                pass
+        return response
+    finally:
+        # Frees the gateway's in-flight slot now rather than when the generator is garbage collected
+        await stream.aclose()
+
+    stats = generation_stats(generate_start, first_token_at, final_chunk, len(pieces))
+    record_generation(stats)
+    chatbot.answer_cache.store(query_vector, context_ids, "".join(pieces))
+
+    latency.record("request", time.perf_counter() - request_start)
+    await send_event(response, {"cached": False, "search_ms": round(search_seconds * 1000, 2), **stats}, event="done")
+    await response.write_eof()
+    return response
+
+
+async def handle_ready(request):
+    state = request.app["state"]
+    if state.ready:
+        return web.json_response({"ready": True})
+    return web.json_response({"ready": False, "error": state.load_error}, status=503)
+
+
+async def handle_metrics(request):
+    """ Prometheus text by default; the JSON snapshot with `?format=json` or `Accept: application/json`. """
+    if request.query.get("format") != "json" and "application/json" not in request.headers.get("Accept", ""):
+        return web.Response(body=render().encode("utf-8"), headers={"Content-Type": CONTENT_TYPE})
+
+    state = request.app["state"]
+    return web.json_response({
+        "ready": state.ready,
+        "latency": latency.snapshot(),
+        "batching": state.batcher.stats() if state.batcher is not None else None,
+        "answer_cache": state.chatbot.answer_cache.stats() if state.ready else None,
+        "llm": state.llm.stats() if state.ready else None,
+    })
+
+
+def create_app(max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait_ms=DEFAULT_MAX_WAIT_MS):
+    app = web.Application()
+    app["max_batch_size"] = max_batch_size
+    app["max_wait_ms"] = max_wait_ms
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    app.router.add_post("/ask", handle_ask)
+    app.router.add_post("/ask/stream", handle_ask_stream)
+    app.router.add_get("/ready", handle_ready)
+    app.router.add_get("/metrics", handle_metrics)
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resident RAG query server for the kongunadu collection.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--max-batch-size", type=int, default=DEFAULT_MAX_BATCH_SIZE, help="Questions embedded together per batch")
+    parser.add_argument("--max-wait-ms", type=float, default=DEFAULT_MAX_WAIT_MS, help="How long the first question waits for company")
+    args = parser.parse_args()
+
+    web.run_app(create_app(args.max_batch_size, args.max_wait_ms), host=args.host, port=args.port)
@@ -0,0 +1,89 @@
+import re
+import time
+
+from bm25_index import SparseHit
+from onnx_embedder import load_cross_encoder
+
+DEFAULT_RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+
+def estimate_tokens(text):
+    """ Rough LLM token count (~1.3 tokens per whitespace word); only used for budgeting, not billing. """
+    return int(len(text.split()) * 1.3) + 1
+
+
+def _shingles(text):
+    words = re.findall(r"\w+", text.lower())
+    return {" ".join(words[i:i + 3]) for i in range(max(1, len(words) - 2))}
+
+
+def truncate_to_budget(text, budget):
+    """ Cuts `text` down to roughly `budget` tokens on a word boundary. """
+    words = text.split()
+    keep = max(1, int(budget / 1.3))
+    return text if len(words) <= keep else " ".join(words[:keep]) + " ..."
+
+
+class ContextReranker:
+    """ Reranks over-fetched candidates with a small CPU cross-encoder (torch or ONNX, following
+    EMBEDDING_BACKEND), then packs the best chunks into a token budget, skipping chunks that are
+    (near-)duplicates of one already packed. """
+
+    def __init__(self, model_name=DEFAULT_RERANK_MODEL, batch_size=16, token_budget=400, duplicate_threshold=0.8):
+        self.model = load_cross_encoder(model_name)
+        self.batch_size = batch_size
+        self.token_budget = token_budget
+        self.duplicate_threshold = duplicate_threshold
+
+    def rerank(self, question, candidates):
+        """ Returns `[(score, point), ...]` sorted by cross-encoder relevance. """
+        if not candidates:
+            return []
+        pairs = [(question, point.payload.get("content", "")) for point in candidates]
+        scores = self.model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False)
+        return sorted(zip((float(score) for score in scores), candidates), key=lambda item: -item[0])
+
+    def pack(self, ranked):
+        """ Greedily keeps the highest-scoring chunks that fit in the budget; the best chunk is truncated if needed. """
+        selected = []
+        seen_shingles = []
+        used = 0
+
+        for _, point in ranked:
+            content = point.payload.get("content", "")
+            shingles = _shingles(content)
+            if any(len(shingles & other) / max(1, len(shingles | other)) >= self.duplicate_threshold for other in seen_shingles):
+                continue
+
+            cost = estimate_tokens(content)
+            if used + cost > self.token_budget:
+                if selected:
+                    continue
+                # Always answer from something: trim the single best chunk to the budget
+                trimmed = truncate_to_budget(content, self.token_budget)
+                point = SparseHit(id=point.id, score=point.score, payload={**point.payload, "content": trimmed})
+                cost = estimate_tokens(trimmed)
+
+            selected.append(point)
+            seen_shingles.append(shingles)
+            used += cost
+
+        return selected, used
+
+    def select(self, question, candidates, baseline_k=3):
+        """ Rerank + pack. Stats compare against the `baseline_k` chunks the pipeline would have sent without reranking. """
+        start = time.perf_counter()
+        ranked = self.rerank(question, candidates)
+        rerank_seconds = time.perf_counter() - start
+
+        selected, used_tokens = self.pack(ranked)
+        baseline_tokens = sum(estimate_tokens(point.payload.get("content", "")) for point in candidates[:baseline_k])
+
+        stats = {
+            "candidates": len(candidates),
+            "selected": len(selected),
+            "rerank_ms": round(rerank_seconds * 1000, 2),
+            "context_tokens": used_tokens,
+            "tokens_saved": baseline_tokens - used_tokens,
+        }
+        return selected, stats
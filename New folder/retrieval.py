@@ -0,0 +1,104 @@
+import logging
+from dataclasses import dataclass, replace
+from typing import List, Optional, Sequence, Tuple
+
+from qdrant_client.http import models
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class SearchParams:
+    """ Everything that shapes one vector search; defaults match what the chatbots need. """
+
+    limit: int = 5
+    # Drop hits below this cosine score instead of padding the prompt with weak matches
+    score_threshold: Optional[float] = None
+    # Only these payload fields are sent back over the wire
+    payload_fields: Tuple[str, ...] = ("content",)
+    query_filter: Optional[models.Filter] = None
+    # When set, Qdrant first gathers this many candidates (HNSW with `hnsw_ef`) and re-scores them exactly.
+    # Both are Qdrant-only: the NumPy backends reject prefetch and ignore `hnsw_ef` (with a warning)
+    prefetch_limit: Optional[int] = None
+    hnsw_ef: Optional[int] = None
+    # Server-side timeout in seconds
+    timeout: Optional[int] = 5
+
+    def with_limit(self, limit):
+        return replace(self, limit=limit)
+
+
+def _as_list(vector):
+    return vector.tolist() if hasattr(vector, "tolist") else list(vector)
+
+
+class SearchClient:
+    """ Typed wrapper around `query_points` / `query_batch_points` shared by chatbot.py, chatbotbac.py and the RAG server.
+
+    Every search is exactly one request: payload selection, score threshold, filter, prefetch and timeout are
+    all pushed down to the vector store instead of being applied client-side.
+    """
+
+    def __init__(self, client, collection_name: str, params: SearchParams = SearchParams()):
+        self.client = client
+        self.collection_name = collection_name
+        self.params = params
+
+    def _payload_selector(self, params: SearchParams):
+        return list(params.payload_fields) if params.payload_fields else True
+
+    def _prefetch(self, query_vector: List[float], params: SearchParams):
+        if not params.prefetch_limit:
+            return None
+        return models.Prefetch(
+            query=query_vector,
+            limit=max(params.prefetch_limit, params.limit),
+            params=models.SearchParams(hnsw_ef=params.hnsw_ef) if params.hnsw_ef else None,
+        )
+
+    def _search_params(self, params: SearchParams):
+        if params.prefetch_limit:
+            # Candidates came from the prefetch stage; re-score them exactly
+            return models.SearchParams(exact=True)
+        return models.SearchParams(hnsw_ef=params.hnsw_ef) if params.hnsw_ef else None
+
+    def search(self, query_vector: Sequence[float], params: Optional[SearchParams] = None):
+        """ Returns the scored points for one embedded query. """
+        params = params or self.params
+        query_vector = _as_list(query_vector)
+        response = self.client.query_points(
+            collection_name=self.collection_name,
+            query=query_vector,
+            prefetch=self._prefetch(query_vector, params),
+            query_filter=params.query_filter,
+            search_params=self._search_params(params),
+            limit=params.limit,
+            score_threshold=params.score_threshold,
+            with_payload=self._payload_selector(params),
+            with_vectors=False,
+            timeout=params.timeout,
+        )
+        return response.points
+
+    def search_batch(self, query_vectors: Sequence[Sequence[float]], params: Optional[SearchParams] = None):
+        """ Returns one list of scored points per query vector, fetched with a single `query_batch_points` call. """
+        params = params or self.params
+        requests = []
+        for query_vector in query_vectors:
+            query_vector = _as_list(query_vector)
+            requests.append(models.QueryRequest(
+                query=query_vector,
+                prefetch=self._prefetch(query_vector, params),
+                filter=params.query_filter,
+                params=self._search_params(params),
+                limit=params.limit,
+                score_threshold=params.score_threshold,
+                with_payload=self._payload_selector(params),
+                with_vector=False,
+            ))
+        responses = self.client.query_batch_points(
+            collection_name=self.collection_name,
+            requests=requests,
+            timeout=params.timeout,
+        )
+        return [response.points for response in responses]
@@ -1,6 +1,4 @@
-from qdrant_client import QdrantClient
 from qdrant_client.http import models
-from sentence_transformers import SentenceTransformer
 import pandas as pd
 import logging
 import sys
@@ -14,14 +12,18 @@ from selenium.webdriver.support import expected_conditions as EC
 from webdriver_manager.chrome import ChromeDriverManager
 from bs4 import BeautifulSoup
 
+from onnx_embedder import load_embedder
+from semantic_cache import mark_collection_ingested
+from vector_backend import VECTOR_BACKEND, get_vector_client
+
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 # Connect to Qdrant
 try:
-    qdrant_client = QdrantClient("localhost", port=6333)
-    logger.info("✅ Connected to Qdrant successfully")
+    qdrant_client = get_vector_client()
+    logger.info(f"✅ Connected to vector store ({VECTOR_BACKEND}) successfully")
 except Exception as e:
     logger.error(f"❌ Failed to connect to Qdrant: {str(e)}")
     sys.exit(1)
@@ -30,7 +32,7 @@ except Exception as e:
 collection_name = "web_scraping_data"
 
 # Initialize the sentence transformer for embedding
-embedder = SentenceTransformer('sentence-transformers/all-mpnet-base-v2')
+embedder = load_embedder('sentence-transformers/all-mpnet-base-v2')
 
 # Auto-detect the vector dimension
 try:
@@ -128,6 +130,8 @@ for section in scraped_data:
 try:
     qdrant_client.upsert(collection_name=collection_name, points=points)
     logger.info(f"✅ Successfully stored {len(points)} entries in Qdrant.")
+    # Long-running chatbots drop answers cached against the old content
+    mark_collection_ingested(collection_name)
 except Exception as e:
     logger.error(f"❌ Failed to upsert points to Qdrant: {str(e)}")
     sys.exit(1)
@@ -1,8 +1,13 @@
 from playwright.sync_api import sync_playwright
 from bs4 import BeautifulSoup
+import json
+import os
 import re
 import logging
 import sys
+from urllib.parse import urlsplit
+
+from crawl_frontier import CrawlFrontier, extract_links
 
 # Setup logging for debugging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -37,9 +42,21 @@ for url in urls_to_scrape:
         logger.error(f"URL {url} does not belong to {base_domain}")
         sys.exit(1)
 
-data = []
-
+# The list above seeds a crawl that follows links and sitemap.xml within the site (see crawl_frontier.py).
+# CRAWL_CHECKPOINT holds the frontier and CRAWL_PAGES every scraped page, so a stopped crawl resumes on rerun;
+# delete both to start over.
+CRAWL_MAX_PAGES = int(os.environ.get("CRAWL_MAX_PAGES", "200"))
+CRAWL_MAX_DEPTH = int(os.environ.get("CRAWL_MAX_DEPTH", "3"))
+CRAWL_CHECKPOINT = os.environ.get("CRAWL_CHECKPOINT", "crawl_checkpoint.json")
+CRAWL_PAGES = os.environ.get("CRAWL_PAGES", "crawl_pages.jsonl")
+sitemap_url = f"{base_domain}/sitemap.xml"
+base_host = urlsplit(base_domain).netloc
+allowed_hosts = {base_host, base_host.removeprefix("www.")}
+
+# Returns (HTTP status, (title, content) or None, links found on the page)
 def scrape_page(url):
+    status = None
+    links = []
     try:
         # Use Playwright to handle dynamic content
         with sync_playwright() as p:
@@ -52,7 +69,8 @@ def scrape_page(url):
             })
             
             logger.info(f"Loading page: {url}")
-            page.goto(url, wait_until="domcontentloaded", timeout=30000)
+            response = page.goto(url, wait_until="domcontentloaded", timeout=30000)
+            status = response.status if response else None
             
             # Wait for the content to load
             page.wait_for_timeout(5000)  # Wait 5 seconds for JavaScript to render
@@ -62,14 +80,15 @@ def scrape_page(url):
             page_content = page.content()
             if not page_content:
                 logger.error("Failed to retrieve page content")
-                return None
+                return status, None, links
             logger.info("Page content retrieved successfully")
+            links = extract_links(page_content)
 
             # Parse the content with BeautifulSoup
             soup = BeautifulSoup(page_content, 'html.parser')
             if not soup:
                 logger.error("Failed to parse page content with BeautifulSoup")
-                return None
+                return status, None, links
             logger.info("Page content parsed successfully")
 
             # Extract the title
@@ -123,7 +142,7 @@ def scrape_page(url):
             # Check if raw content is empty or only whitespace
             if not raw_content or raw_content.isspace():
                 logger.error("Raw content is empty or contains only whitespace")
-                return None
+                return status, None, links
 
             # Minimal cleaning to preserve content details
             text_content = re.sub(r'\s+', ' ', raw_content).strip()
@@ -133,30 +152,55 @@ def scrape_page(url):
             # Final check for content
             if not text_content or text_content.isspace():
                 logger.error("No content after cleaning")
-                return None
+                return status, None, links
 
             browser.close()
-            return title, text_content
+            return status, (title, text_content), links
 
     except Exception as e:
         logger.error(f"Error scraping {url}: {str(e)}", exc_info=True)
-        return None
+        return status, None, links
+
+# Crawl: resume from the checkpoint (with the current page/depth limits), or seed the frontier with the list
+# above and the sitemap. A checkpoint without its pages file would skip pages whose text is gone: start over.
+if os.path.exists(CRAWL_CHECKPOINT) and not os.path.exists(CRAWL_PAGES):
+    logger.warning(f"{CRAWL_CHECKPOINT} exists but {CRAWL_PAGES} does not, starting a new crawl")
+if os.path.exists(CRAWL_CHECKPOINT) and os.path.exists(CRAWL_PAGES):
+    frontier = CrawlFrontier.load(CRAWL_CHECKPOINT, max_depth=CRAWL_MAX_DEPTH, max_pages=CRAWL_MAX_PAGES)
+else:
+    frontier = CrawlFrontier(allowed_hosts, max_depth=CRAWL_MAX_DEPTH, max_pages=CRAWL_MAX_PAGES, checkpoint_path=CRAWL_CHECKPOINT)
+    for url in urls_to_scrape:
+        frontier.add(url)
+    frontier.add_sitemap(sitemap_url)
+    open(CRAWL_PAGES, "w", encoding="utf-8").close()
 
-# Scrape the specified pages
 logger.info("Starting web scraping process...")
-for url in urls_to_scrape:
-    logger.info(f"Scraping URL: {url}")
-    result = scrape_page(url)
+while (next_item := frontier.next_url()) is not None:
+    url, depth = next_item
+    logger.info(f"Scraping URL: {url} (depth {depth}, {len(frontier)} queued)")
+    status, result, links = scrape_page(url)
+    # The page is on disk before record() can checkpoint it as visited, so a crash in between never loses it
     if result:
         title, content = result
-        data.append({
-            "url": url,
-            "title": title,
-            "content": content
-        })
-        logger.info(f"Successfully scraped {url}")
+        with open(CRAWL_PAGES, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"url": url, "title": title, "content": content}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+    new_links = frontier.record(url, depth, status, links)
+    if result:
+        logger.info(f"Successfully scraped {url}, queued {new_links} new links")
     else:
         logger.error(f"Failed to scrape {url} or extract content")
+frontier.save()
+
+# Every page scraped so far, including earlier runs of a resumed crawl (a re-scraped URL keeps its latest text)
+pages = {}
+with open(CRAWL_PAGES, "r", encoding="utf-8") as f:
+    for line in f:
+        if line.strip():
+            entry = json.loads(line)
+            pages[entry["url"]] = entry
+data = list(pages.values())
 
 # Save to a .txt file
 try:
@@ -0,0 +1,123 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Ingestion scripts touch this file after every upsert so long-lived caches know the collection changed
+STAMP_DIR = os.path.dirname(os.path.abspath(__file__))
+# Caches re-read the stamp at most this often, not on every lookup
+STAMP_CHECK_SECONDS = 2.0
+
+
+def ingest_stamp_path(collection_name):
+    return os.path.join(STAMP_DIR, f".{collection_name}.ingest_stamp")
+
+
+def mark_collection_ingested(collection_name):
+    """ Records that `collection_name` was (re-)ingested; called by store.py after a successful upsert. """
+    with open(ingest_stamp_path(collection_name), "w", encoding="utf-8") as f:
+        f.write(str(time.time()))
+
+
+def read_ingest_stamp(collection_name):
+    try:
+        with open(ingest_stamp_path(collection_name), "r", encoding="utf-8") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+class SemanticCache:
+    """ Bounded LRU of (query vector, retrieved context IDs, final answer).
+
+    A lookup only hits when the retrieved context IDs are the same set as a cached entry's (in any order) and
+    the query vectors are at least `threshold` cosine-similar, so near-duplicate questions skip the Mistral
+    call without ever answering from different context. The whole cache is dropped when the collection's
+    ingest stamp changes; the stamp is checked at most every `stamp_check_seconds`.
+    """
+
+    def __init__(self, collection_name, threshold=0.9, max_entries=512, stamp_check_seconds=STAMP_CHECK_SECONDS):
+        self.collection_name = collection_name
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (normalised vector, context ids, answer)
+        self._buckets = {}  # frozenset of context ids -> set of keys
+        self._next_key = 0
+        self.stamp_check_seconds = stamp_check_seconds
+        self._stamp = read_ingest_stamp(collection_name)
+        self._stamp_checked_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalise(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _check_stamp(self):
+        now = time.monotonic()
+        if now - self._stamp_checked_at < self.stamp_check_seconds:
+            return
+        self._stamp_checked_at = now
+        stamp = read_ingest_stamp(self.collection_name)
+        if stamp != self._stamp:
+            if self._entries:
+                logger.info(f"🗑 Collection {self.collection_name} was re-ingested, dropping {len(self._entries)} cached answers")
+            self._entries.clear()
+            self._buckets.clear()
+            self._stamp = stamp
+
+    def lookup(self, query_vector, context_ids):
+        """ Returns the cached answer for a similar question over the same context, or None. """
+        context_ids = frozenset(context_ids)
+        with self._lock:
+            self._check_stamp()
+            keys = list(self._buckets.get(context_ids, ()))
+            if keys:
+                query = self._normalise(query_vector)
+                candidates = np.stack([self._entries[key][0] for key in keys])
+                scores = candidates @ query
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    self._entries.move_to_end(keys[best])
+                    self.hits += 1
+                    return self._entries[keys[best]][2]
+            self.misses += 1
+            return None
+
+    def store(self, query_vector, context_ids, answer):
+        context_ids = frozenset(context_ids)
+        with self._lock:
+            self._check_stamp()
+            key = self._next_key
+            self._next_key += 1
+            self._entries[key] = (self._normalise(query_vector), context_ids, answer)
+            self._buckets.setdefault(context_ids, set()).add(key)
+
+            while len(self._entries) > self.max_entries:
+                old_key, (_, old_ids, _) = self._entries.popitem(last=False)
+                bucket = self._buckets[old_ids]
+                bucket.discard(old_key)
+                if not bucket:
+                    del self._buckets[old_ids]
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
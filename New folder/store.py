@@ -1,69 +1,24 @@
 import os
 import glob
-from sentence_transformers import SentenceTransformer
-from qdrant_client import QdrantClient
+import csv
 from qdrant_client.http import models
 import logging
 import sys
+import uuid
 
-# Setup logging
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
-logger = logging.getLogger(__name__)
+from bm25_index import BM25Index, bm25_index_path
+from onnx_embedder import load_embedder
+from semantic_cache import mark_collection_ingested
+from vector_backend import VECTOR_BACKEND, get_vector_client
 
-# Qdrant Connection
-try:
-    qdrant_client = QdrantClient("localhost", port=6333, timeout=30)
-    logger.info("✅ Connected to Qdrant successfully")
-except Exception as e:
-    logger.error(f"❌ Failed to connect to Qdrant: {str(e)}")
-    sys.exit(1)
+logger = logging.getLogger(__name__)
 
 # Define Collection Name
 collection_name = "txt_file_data"
-
-# Initialize Sentence Transformer Model
-embedder = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
-
-# Detect the embedding dimension automatically
-try:
-    sample_text = "Test sentence for embedding dimension check."
-    sample_embedding = embedder.encode([sample_text], convert_to_tensor=False)[0]
-    vector_dimension = len(sample_embedding)  # Should be 384 for this model
-    logger.info(f"✅ Detected embedding dimension: {vector_dimension}")
-except Exception as e:
-    logger.error(f"❌ Failed to detect embedding dimension: {str(e)}")
-    sys.exit(1)
-
-# Ensure Collection Matches Correct Vector Size
-if qdrant_client.collection_exists(collection_name):
-    collection_info = qdrant_client.get_collection(collection_name)
-    if collection_info.config.params.vectors.size == vector_dimension:
-        logger.info(f"✅ Collection {collection_name} exists with correct vector dimension {vector_dimension}")
-    else:
-        qdrant_client.delete_collection(collection_name)
-        logger.info(f"🗑 Deleted previous collection {collection_name} due to dimension mismatch")
-        qdrant_client.create_collection(
-            collection_name=collection_name,
-            vectors_config=models.VectorParams(size=vector_dimension, distance=models.Distance.COSINE),
-        )
-        logger.info(f"✅ Created collection {collection_name} with vector dimension {vector_dimension}")
-else:
-    qdrant_client.create_collection(
-        collection_name=collection_name,
-        vectors_config=models.VectorParams(size=vector_dimension, distance=models.Distance.COSINE),
-    )
-    logger.info(f"✅ Created collection {collection_name} with vector dimension {vector_dimension}")
-
-# Read the TXT File
+embedding_model_name = "sentence-transformers/all-MiniLM-L6-v2"
 txt_file_path = "kongunadu_data.txt"
+csv_file_path = "kongunadu_dataset.csv"
 
-try:
-    with open(txt_file_path, "r", encoding="utf-8") as file:
-        raw_content = file.readlines()
-    logger.info(f"📄 Successfully loaded text file: {txt_file_path}")
-except Exception as e:
-    logger.error(f"❌ Failed to read text file: {str(e)}")
-    sys.exit(1)
 
 # Function to Split and Process Content
 def split_content(lines, max_chunk_length=150):
@@ -75,7 +30,7 @@ def split_content(lines, max_chunk_length=150):
         line = line.strip()
         if not line:
             continue
-        
+
         # If adding the line exceeds max length, save current chunk and start a new one
         if len(current_chunk) + len(line) > max_chunk_length and current_chunk:
             chunks.append(current_chunk.strip())
@@ -89,34 +44,167 @@ def split_content(lines, max_chunk_length=150):
     logger.info(f"📌 Split text into {len(chunks)} dynamic chunks")
     return chunks
 
-# Process the Content
-content_chunks = split_content(raw_content)
-
-# Prepare Data Points for Qdrant
-points = []
-point_id = 0
-
-try:
-    embeddings = embedder.encode(content_chunks, convert_to_tensor=False)
-    
-    for embedding, chunk in zip(embeddings, content_chunks):
-        points.append(
-            models.PointStruct(
-                id=point_id,
-                vector=embedding.tolist(),
-                payload={
-                    "source": txt_file_path,
-                    "content": chunk
-                }
-            )
+
+def split_char_windows(lines, window=500, overlap=100):
+    """ Fixed-size character windows (cut on word boundaries) that overlap by `overlap` characters.
+
+    `split_content` never splits a line, so the scraped pages (one long line each) end up as single
+    multi-thousand-character chunks; windows keep chunks small enough for the embedder to focus.
+    """
+    text = " ".join(line.strip() for line in lines if line.strip())
+    chunks = []
+    start = 0
+
+    while start < len(text):
+        end = min(len(text), start + window)
+        if end < len(text):
+            # Back off to the last space so words are not cut in half
+            space = text.rfind(" ", start + 1, end)
+            end = space if space > start else end
+        chunks.append(text[start:end].strip())
+        if end >= len(text):
+            break
+        next_start = max(end - overlap, start + 1)
+        space = text.find(" ", next_start, end)
+        start = space + 1 if space != -1 else next_start
+
+    logger.info(f"📌 Split text into {len(chunks)} window chunks")
+    return [chunk for chunk in chunks if chunk]
+
+
+CHUNKERS = {
+    "lines": split_content,
+    "window": split_char_windows,
+}
+
+
+def load_chunks(chunker="window", txt_path=txt_file_path, csv_path=csv_file_path, **chunk_options):
+    """ Returns `(chunks, sources)` for the TXT file and every row of the CSV dataset. """
+    split = CHUNKERS[chunker]
+
+    with open(txt_path, "r", encoding="utf-8") as file:
+        raw_content = file.readlines()
+    logger.info(f"📄 Successfully loaded text file: {txt_path}")
+
+    content_chunks = split(raw_content, **chunk_options)
+    chunk_sources = [txt_path] * len(content_chunks)
+
+    # Read the CSV dataset (contact page etc.) so exact lookups like phone numbers and emails are searchable too.
+    # Each row is a whole scraped page on one line, which `split_content` would keep as a single chunk, so rows
+    # are always cut into windows
+    row_split, row_options = (split, chunk_options) if split is split_char_windows else (split_char_windows, {})
+    try:
+        with open(csv_path, "r", encoding="utf-8") as file:
+            for row in csv.DictReader(file):
+                row_chunks = row_split([row.get("content", "")], **row_options)
+                content_chunks.extend(row_chunks)
+                chunk_sources.extend([row.get("url") or csv_path] * len(row_chunks))
+        logger.info(f"📄 Successfully loaded CSV file: {csv_path}")
+    except Exception as e:
+        logger.warning(f"⚠️ Skipping CSV file {csv_path}: {str(e)}")
+
+    return content_chunks, chunk_sources
+
+
+def ensure_collection(qdrant_client, name, vector_dimension):
+    """ Creates the collection, recreating it when the stored vector size does not match the embedder. """
+    if qdrant_client.collection_exists(name):
+        collection_info = qdrant_client.get_collection(name)
+        if collection_info.config.params.vectors.size == vector_dimension:
+            logger.info(f"✅ Collection {name} exists with correct vector dimension {vector_dimension}")
+            return
+        qdrant_client.delete_collection(name)
+        logger.info(f"🗑 Deleted previous collection {name} due to dimension mismatch")
+
+    qdrant_client.create_collection(
+        collection_name=name,
+        vectors_config=models.VectorParams(size=vector_dimension, distance=models.Distance.COSINE),
+    )
+    logger.info(f"✅ Created collection {name} with vector dimension {vector_dimension}")
+
+
+def ingest(qdrant_client, embedder, name, content_chunks, chunk_sources, batch_size=32):
+    """ Embeds the chunks and upserts them as points `0..n-1`, then deletes whatever an earlier, larger ingest
+    left behind; returns the stored points. """
+    embeddings = embedder.encode(content_chunks, batch_size=batch_size, convert_to_tensor=False)
+    # Every point of this run carries the same ingest id, so stale points are the ones with any other id
+    ingest_id = uuid.uuid4().hex
+
+    points = [
+        models.PointStruct(
+            id=point_id,
+            vector=embedding.tolist(),
+            payload={
+                "source": source,
+                "content": chunk,
+                "ingest_id": ingest_id,
+            }
         )
-        point_id += 1
+        for point_id, (embedding, chunk, source) in enumerate(zip(embeddings, content_chunks, chunk_sources))
+    ]
 
     # Store Points in Qdrant
-    qdrant_client.upsert(collection_name=collection_name, points=points)
+    qdrant_client.upsert(collection_name=name, points=points)
     logger.info(f"✅ Successfully stored {len(points)} entries in Qdrant.")
-    print("🎯 TXT file content uploaded and stored in Qdrant!")
 
-except Exception as e:
-    logger.error(f"❌ Failed to store data in Qdrant: {str(e)}")
-    sys.exit(1)
\ No newline at end of file
+    # Upserting first keeps the collection searchable throughout the re-ingest
+    qdrant_client.delete(
+        collection_name=name,
+        points_selector=models.FilterSelector(filter=models.Filter(
+            must_not=[models.FieldCondition(key="ingest_id", match=models.MatchValue(value=ingest_id))],
+        )),
+    )
+    logger.info(f"🗑 Deleted points left over from earlier ingests of {name}")
+    return points
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    # Qdrant Connection
+    try:
+        qdrant_client = get_vector_client(timeout=30)
+        logger.info(f"✅ Connected to vector store ({VECTOR_BACKEND}) successfully")
+    except Exception as e:
+        logger.error(f"❌ Failed to connect to Qdrant: {str(e)}")
+        sys.exit(1)
+
+    # Initialize Sentence Transformer Model
+    embedder = load_embedder(embedding_model_name)
+
+    # Detect the embedding dimension automatically
+    try:
+        sample_text = "Test sentence for embedding dimension check."
+        sample_embedding = embedder.encode([sample_text], convert_to_tensor=False)[0]
+        vector_dimension = len(sample_embedding)  # Should be 384 for this model
+        logger.info(f"✅ Detected embedding dimension: {vector_dimension}")
+    except Exception as e:
+        logger.error(f"❌ Failed to detect embedding dimension: {str(e)}")
+        sys.exit(1)
+
+    # Ensure Collection Matches Correct Vector Size
+    ensure_collection(qdrant_client, collection_name, vector_dimension)
+
+    # Read and chunk the TXT file and CSV dataset
+    try:
+        content_chunks, chunk_sources = load_chunks(os.environ.get("RAG_CHUNKER", "window"))
+    except Exception as e:
+        logger.error(f"❌ Failed to read text file: {str(e)}")
+        sys.exit(1)
+
+    try:
+        points = ingest(qdrant_client, embedder, collection_name, content_chunks, chunk_sources)
+
+        # Build the sparse BM25 index over the same point ids for hybrid retrieval
+        BM25Index.build([point.id for point in points], [point.payload for point in points]).save(bm25_index_path(collection_name))
+        logger.info(f"✅ Built BM25 index for {len(points)} entries at {bm25_index_path(collection_name)}")
+        mark_collection_ingested(collection_name)
+        print("🎯 TXT file content uploaded and stored in Qdrant!")
+
+    except Exception as e:
+        logger.error(f"❌ Failed to store data in Qdrant: {str(e)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,396 @@
+import json
+import logging
+import os
+import shutil
+import time
+from collections import namedtuple
+from types import SimpleNamespace
+
+import numpy as np
+
+from semantic_cache import STAMP_CHECK_SECONDS
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Which vector store the scripts talk to:
+#   server   - Qdrant server at QDRANT_URL (the original setup)
+#   embedded - Qdrant local mode, in-process, persisted under QDRANT_LOCAL_PATH
+#   numpy    - pure NumPy flat index (mmap-loaded), persisted under NUMPY_INDEX_PATH
+#   ivf      - same NumPy store, searched through an inverted-file (k-means) index
+VECTOR_BACKEND = os.environ.get("VECTOR_BACKEND", "server")
+QDRANT_URL = os.environ.get("QDRANT_URL", "http://localhost:6333")
+QDRANT_LOCAL_PATH = os.environ.get("QDRANT_LOCAL_PATH", os.path.join(BASE_DIR, "qdrant_local"))
+NUMPY_INDEX_PATH = os.environ.get("NUMPY_INDEX_PATH", os.path.join(BASE_DIR, "numpy_index"))
+
+BACKENDS = ("server", "embedded", "numpy", "ivf")
+
+# Result shape of NumpyVectorStore searches; mirrors the attributes read from Qdrant's ScoredPoint
+ScoredHit = namedtuple("ScoredHit", ["id", "score", "payload", "vector"])
+
+
+def get_vector_client(backend=None, timeout=30):
+    """ Returns a client for the configured backend; every backend answers the same Qdrant calls the scripts make. """
+    backend = backend or VECTOR_BACKEND
+    if backend == "server":
+        from qdrant_client import QdrantClient
+        return QdrantClient(QDRANT_URL, timeout=timeout)
+    if backend == "embedded":
+        from qdrant_client import QdrantClient
+        return QdrantClient(path=QDRANT_LOCAL_PATH)
+    if backend in ("numpy", "ivf"):
+        return NumpyVectorStore(NUMPY_INDEX_PATH, index_type="ivf" if backend == "ivf" else "flat")
+    raise ValueError(f"Unknown VECTOR_BACKEND '{backend}', expected one of {', '.join(BACKENDS)}")
+
+
+def _normalise_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _condition_values(condition):
+    """ The payload values a `FieldCondition` with `MatchValue` / `MatchAny` accepts. """
+    match = getattr(condition, "match", None)
+    if getattr(condition, "key", None) is not None and match is not None:
+        if hasattr(match, "value"):
+            return [match.value]
+        if hasattr(match, "any"):
+            return list(match.any)
+    raise NotImplementedError(f"NumPy vector store only filters on MatchValue / MatchAny field conditions, got {condition!r}")
+
+
+def _compile_filter(query_filter):
+    """ Turns a Qdrant `Filter` into a payload predicate; anything beyond `must` / `must_not` is rejected rather
+    than ignored, so a filter this store cannot apply never returns unfiltered results. """
+    if query_filter is None:
+        return lambda payload: True
+    if getattr(query_filter, "should", None) or getattr(query_filter, "min_should", None):
+        raise NotImplementedError("NumPy vector store does not support `should` / `min_should` filters")
+    must = [(condition.key, _condition_values(condition)) for condition in getattr(query_filter, "must", None) or []]
+    must_not = [(condition.key, _condition_values(condition)) for condition in getattr(query_filter, "must_not", None) or []]
+
+    def matches(payload):
+        return (all(payload.get(key) in values for key, values in must)
+                and not any(payload.get(key) in values for key, values in must_not))
+    return matches
+
+
+def _select_payload(payload, with_payload):
+    if with_payload is True:
+        return payload
+    if not with_payload:
+        return {}
+    return {key: payload[key] for key in with_payload if key in payload}
+
+
+class NumpyCollection:
+    """ One collection on disk: normalised float32 vectors (.npy, mmap-loaded), ids and payloads (JSON).
+
+    Every save writes a new `vectors-<version>.npy` / `payloads-<version>.json` pair and then atomically
+    replaces `meta.json`, which names the version; a reader therefore always gets a matching pair, and the
+    previous version stays on disk for readers that opened it a moment before.
+    """
+
+    def __init__(self, path, size=None, index_type="flat", nprobe=4, ivf_min_points=1024):
+        self.path = path
+        self.index_type = index_type
+        self.nprobe = nprobe
+        self.ivf_min_points = ivf_min_points
+        self.size = size
+        self.ids = []
+        self.payloads = []
+        self.vectors = np.zeros((0, size or 0), dtype=np.float32)
+        self.centroids = None
+        self.assignments = None
+        self.version = None
+        self.saved_mtime = None  # meta.json mtime this object matches
+        if os.path.exists(self._meta_path()):
+            self._load()
+
+    def _meta_path(self):
+        return os.path.join(self.path, "meta.json")
+
+    def _files(self, version):
+        # Collections saved before versioning have plain vectors.npy / payloads.json
+        suffix = f"-{version}" if version else ""
+        return os.path.join(self.path, f"vectors{suffix}.npy"), os.path.join(self.path, f"payloads{suffix}.json")
+
+    def _load(self):
+        # Stat first: a save racing this load then shows up as stale and is picked up on the next check
+        saved_mtime = os.stat(self._meta_path()).st_mtime_ns
+        with open(self._meta_path(), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        vectors_path, payloads_path = self._files(meta.get("version"))
+        with open(payloads_path, "r", encoding="utf-8") as f:
+            stored = json.load(f)
+        self.size = meta["size"]
+        self.ids = stored["ids"]
+        self.payloads = stored["payloads"]
+        self.vectors = np.load(vectors_path, mmap_mode="r")
+        self.version = meta.get("version")
+        self.saved_mtime = saved_mtime
+        self._build_ivf()
+
+    def stale(self):
+        """ True when another process saved (or deleted) the collection after this object loaded it. """
+        try:
+            return os.stat(self._meta_path()).st_mtime_ns != self.saved_mtime
+        except OSError:
+            return True
+
+    def _save(self):
+        os.makedirs(self.path, exist_ok=True)
+        previous = self.version
+        version = f"{time.time_ns():x}"
+        vectors_path, payloads_path = self._files(version)
+        with open(vectors_path, "wb") as f:
+            np.save(f, np.ascontiguousarray(self.vectors, dtype=np.float32))
+        with open(payloads_path, "w", encoding="utf-8") as f:
+            json.dump({"ids": self.ids, "payloads": self.payloads}, f)
+        tmp_path = f"{self._meta_path()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"size": self.size, "distance": "Cosine", "points": len(self.ids), "version": version}, f)
+        os.replace(tmp_path, self._meta_path())
+        self.version = version
+        self.saved_mtime = os.stat(self._meta_path()).st_mtime_ns
+        self._remove_old_versions(keep={version, previous})
+
+    def _remove_old_versions(self, keep):
+        keep_files = {os.path.basename(path) for version in keep if version for path in self._files(version)}
+        for name in os.listdir(self.path):
+            if name.startswith(("vectors", "payloads")) and name not in keep_files:
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except OSError:
+                    pass  # still mmap-ed by a reader on Windows; the next save retries
+
+    def _build_ivf(self, iterations=10):
+        """ Spherical k-means over the stored vectors; small collections stay on the exact flat scan. """
+        self.centroids = None
+        self.assignments = None
+        count = len(self.ids)
+        if self.index_type != "ivf" or count < self.ivf_min_points:
+            return
+
+        vectors = np.asarray(self.vectors)
+        # k-means needs at least one distinct point per cluster
+        nlist = min(count, max(2, int(np.sqrt(count))))
+        rng = np.random.default_rng(0)
+        centroids = vectors[rng.choice(count, nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignments = np.argmax(vectors @ centroids.T, axis=1)
+            for cluster in range(nlist):
+                members = vectors[assignments == cluster]
+                if len(members):
+                    centroids[cluster] = members.mean(axis=0)
+            centroids = _normalise_rows(centroids)
+        self.centroids = centroids
+        self.assignments = np.argmax(vectors @ centroids.T, axis=1)
+
+    def upsert(self, points):
+        vectors = np.asarray(self.vectors, dtype=np.float32)
+        positions = {point_id: i for i, point_id in enumerate(self.ids)}
+        new_vectors = []
+        for point in points:
+            vector = np.asarray(point.vector, dtype=np.float32)
+            payload = dict(point.payload or {})
+            if point.id in positions:
+                if not vectors.flags.writeable:
+                    vectors = vectors.copy()
+                vectors[positions[point.id]] = vector
+                self.payloads[positions[point.id]] = payload
+            else:
+                positions[point.id] = len(self.ids)
+                self.ids.append(point.id)
+                self.payloads.append(payload)
+                new_vectors.append(vector)
+
+        if new_vectors:
+            vectors = np.vstack([vectors.reshape(-1, self.size), np.stack(new_vectors)])
+        self.vectors = _normalise_rows(vectors.astype(np.float32))
+        self._save()
+        self._build_ivf()
+
+    def delete(self, keep):
+        """ Drops every point for which `keep(point_id, payload)` is False; returns how many were removed. """
+        kept = [i for i, (point_id, payload) in enumerate(zip(self.ids, self.payloads)) if keep(point_id, payload)]
+        removed = len(self.ids) - len(kept)
+        if removed:
+            self.ids = [self.ids[i] for i in kept]
+            self.payloads = [self.payloads[i] for i in kept]
+            self.vectors = np.asarray(self.vectors, dtype=np.float32).reshape(-1, self.size)[kept]
+            self._save()
+            self._build_ivf()
+        return removed
+
+    def search(self, query, limit=10, query_filter=None, score_threshold=None, with_payload=True, with_vectors=False,
+               exact=False):
+        matches = _compile_filter(query_filter)
+        if not self.ids:
+            return []
+        query = np.asarray(query, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        query = query / norm if norm else query
+
+        if self.centroids is not None and not exact:
+            probes = np.argsort(-(self.centroids @ query))[:self.nprobe]
+            candidates = np.flatnonzero(np.isin(self.assignments, probes))
+        else:
+            candidates = np.arange(len(self.ids))
+
+        scores = np.asarray(self.vectors[candidates]) @ query
+        hits = []
+        for position in np.argsort(-scores):
+            score = float(scores[position])
+            if score_threshold is not None and score < score_threshold:
+                break
+            index = int(candidates[position])
+            payload = self.payloads[index]
+            if not matches(payload):
+                continue
+            hits.append(ScoredHit(
+                id=self.ids[index],
+                score=score,
+                payload=_select_payload(payload, with_payload),
+                vector=np.asarray(self.vectors[index]).tolist() if with_vectors else None,
+            ))
+            if len(hits) >= limit:
+                break
+        return hits
+
+
+class NumpyVectorStore:
+    """ Drop-in for the subset of QdrantClient used by store.py and the chatbots, with no server and no network hop.
+
+    Open collections are re-checked at most every `check_seconds` and reopened once another process (store.py
+    re-ingesting) has saved them, so long-running servers search the same corpus their BM25 index and answer
+    cache were reloaded for.
+    """
+
+    def __init__(self, path, index_type="flat", nprobe=4, ivf_min_points=1024, check_seconds=STAMP_CHECK_SECONDS):
+        self.path = path
+        self.index_type = index_type
+        self.nprobe = nprobe
+        self.ivf_min_points = ivf_min_points
+        self.check_seconds = check_seconds
+        self._collections = {}
+        self._checked_at = {}
+
+    def _open(self, collection_name, size=None):
+        return NumpyCollection(self._collection_path(collection_name), size=size, index_type=self.index_type,
+                               nprobe=self.nprobe, ivf_min_points=self.ivf_min_points)
+
+    def _collection_path(self, collection_name):
+        return os.path.join(self.path, collection_name)
+
+    def _collection(self, collection_name):
+        now = time.monotonic()
+        collection = self._collections.get(collection_name)
+        if collection is not None and now - self._checked_at.get(collection_name, now) < self.check_seconds:
+            return collection
+        if collection is not None and collection.stale():
+            logger.info(f"🔄 Collection {collection_name} changed on disk, reopening it")
+            del self._collections[collection_name]
+            collection = None
+        if collection is None:
+            if not self.collection_exists(collection_name):
+                raise ValueError(f"Collection {collection_name} not found in {self.path}")
+            collection = self._collections[collection_name] = self._open(collection_name)
+        self._checked_at[collection_name] = now
+        return collection
+
+    def collection_exists(self, collection_name):
+        return collection_name in self._collections or os.path.exists(os.path.join(self._collection_path(collection_name), "meta.json"))
+
+    def create_collection(self, collection_name, vectors_config, **kwargs):
+        collection = self._open(collection_name, size=vectors_config.size)
+        collection._save()
+        self._collections[collection_name] = collection
+        self._checked_at[collection_name] = time.monotonic()
+        return True
+
+    def delete_collection(self, collection_name, **kwargs):
+        self._collections.pop(collection_name, None)
+        self._checked_at.pop(collection_name, None)
+        shutil.rmtree(self._collection_path(collection_name), ignore_errors=True)
+        return True
+
+    def get_collection(self, collection_name):
+        collection = self._collection(collection_name)
+        return SimpleNamespace(
+            points_count=len(collection.ids),
+            config=SimpleNamespace(params=SimpleNamespace(vectors=SimpleNamespace(size=collection.size, distance="Cosine"))),
+        )
+
+    def upsert(self, collection_name, points, **kwargs):
+        self._collection(collection_name).upsert(points)
+        return SimpleNamespace(status="completed")
+
+    def delete(self, collection_name, points_selector, wait=True):
+        """ Deletes by a list of ids (`PointIdsList` or a plain list) or by a `FilterSelector` / `Filter`. """
+        point_filter = getattr(points_selector, "filter", None)
+        if point_filter is None and hasattr(points_selector, "must"):
+            point_filter = points_selector
+        if point_filter is not None:
+            matches = _compile_filter(point_filter)
+            removed = self._collection(collection_name).delete(lambda point_id, payload: not matches(payload))
+        else:
+            doomed = set(getattr(points_selector, "points", points_selector))
+            removed = self._collection(collection_name).delete(lambda point_id, payload: point_id not in doomed)
+        logger.info(f"🗑 Deleted {removed} points from {collection_name}")
+        return SimpleNamespace(status="completed")
+
+    def search(self, collection_name, query_vector, limit=10, query_filter=None, score_threshold=None,
+               with_payload=True, with_vectors=False, search_params=None, timeout=None):
+        """ `timeout` is accepted for signature compatibility: an in-process scan has no request to time out. """
+        return self._collection(collection_name).search(
+            query_vector, limit=limit, query_filter=query_filter, score_threshold=score_threshold,
+            with_payload=with_payload, with_vectors=with_vectors, exact=_exact(search_params),
+        )
+
+    def query_points(self, collection_name, query, limit=10, query_filter=None, score_threshold=None,
+                     with_payload=True, with_vectors=False, prefetch=None, search_params=None, timeout=None):
+        """ Dense nearest-neighbour queries only: a `prefetch` stage is rejected, and `search_params` may only
+        ask for an exact scan (`hnsw_ef` is accepted but ignored with a warning: there is no graph to tune). """
+        if prefetch:
+            raise NotImplementedError("NumPy vector store does not support prefetch queries")
+        return SimpleNamespace(points=self.search(
+            collection_name, query, limit=limit, query_filter=query_filter, score_threshold=score_threshold,
+            with_payload=with_payload, with_vectors=with_vectors, search_params=search_params, timeout=timeout,
+        ))
+
+    def query_batch_points(self, collection_name, requests, timeout=None):
+        return [
+            self.query_points(
+                collection_name,
+                request.query,
+                limit=request.limit or 10,
+                query_filter=getattr(request, "filter", None),
+                score_threshold=getattr(request, "score_threshold", None),
+                with_payload=request.with_payload if request.with_payload is not None else True,
+                with_vectors=getattr(request, "with_vector", False) or False,
+                prefetch=getattr(request, "prefetch", None),
+                search_params=getattr(request, "params", None),
+                timeout=timeout,
+            )
+            for request in requests
+        ]
+
+
+_hnsw_ef_warned = False
+
+
+def _exact(search_params):
+    """ True when `search_params` asks for an exact scan; only `exact` and `hnsw_ef` (ignored) are understood. """
+    global _hnsw_ef_warned
+    if search_params is None:
+        return False
+    unsupported = [name for name in search_params.model_dump(exclude_defaults=True) if name not in ("exact", "hnsw_ef")]
+    if unsupported:
+        raise NotImplementedError(f"NumPy vector store does not support search params: {', '.join(unsupported)}")
+    if search_params.hnsw_ef and not _hnsw_ef_warned:
+        _hnsw_ef_warned = True
+        logger.warning("⚠️ hnsw_ef only applies to Qdrant's HNSW index; the NumPy backend ignores it")
+    return bool(search_params.exact)
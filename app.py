@@ -1,57 +1,171 @@
-from flask import Flask, request, render_template_string
-import mysql.connector
-import pandas as pd
-import ollama
+from flask import Flask, Response, request, render_template_string
+from llm_gateway import gateway
+from instrumentation import CONTENT_TYPE, observe_stage, registry, render, span
+from schema_cache import SchemaCache
 import re  # For regex-based query correction
+import atexit
+import calendar
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import date, datetime
+from html import escape
 
 app = Flask(__name__)
 
-# Function to generate SQL from natural language prompt
-def generate_sql_query(user_input):
-    try:
-        system_prompt = (
-            "You are a helpful assistant that converts natural language prompts into SQL queries for a given database schema. "
-            "You will:\n"
-            "🔹 Understand the user's prompt and identify the intent (e.g., select, filter, aggregate, join).\n"
-            "🔹 Use the provided database schema to map the prompt to the correct table and column names.\n"
-            "🔹 Generate a syntactically correct SQL query in a simple and clear format.\n\n"
-            "⚠️ Rules:\n"
-            "- Only generate SQL queries related to the provided schema.\n"
-            "- If the prompt is unclear or unrelated to SQL generation, respond: \"Sorry, I can only help with generating SQL queries for the given database schema.\"\n"
-            "- If the schema is insufficient or missing, respond: \"Please provide the database schema to generate the SQL query.\"\n"
-            "- For non-null checks, always use `IS NOT NULL` exactly as shown (e.g., `Product IS NOT NULL`). Do NOT use `NOT NULL` or duplicate `IS` (e.g., do NOT write `IS IS NOT NULL`). For example, for 'customers who purchased a product,' include `Product IS NOT NULL` to ensure a product was purchased.\n"
-            "- When the prompt asks for 'missing' or 'not provided' data (e.g., 'missing email addresses'), interpret it as records where the column is null or an empty string. Use `IS NULL OR column = ''` for string columns like `Phone` or `Email`. For example, for 'Get sales data with missing email addresses,' the query should be: `SELECT * FROM Honda_Sales WHERE Email IS NULL OR Email = '';`.\n"
-            "- Do NOT add conditions for columns that are not mentioned in the prompt. For example, if the prompt only mentions 'missing email addresses,' do NOT add conditions for other columns like `Phone` unless explicitly requested.\n"
-            "- When the user asks for a specific number of results (e.g., 'top 5'), include a `LIMIT` clause with the specified number (e.g., `LIMIT 5`).\n"
-            "- In the `ORDER BY` clause, ensure the column or alias matches exactly what is defined in the `SELECT` clause (e.g., if `SELECT SUM(Units_Sold) AS Total_Sales`, use `ORDER BY Total_Sales`, not `TotalSales`).\n"
-            "- When the user refers to 'total sales' (e.g., in prompts like 'top 5 cities by total sales'), ALWAYS interpret it as the monetary value of sales, which MUST be calculated using the `Total_Sale` column (e.g., `SUM(Total_Sale)`), NOT the number of units sold (`Units_Sold`). For example, for 'top 5 cities by total sales,' the query should be: `SELECT City, SUM(Total_Sale) AS Total_Sales FROM Honda_Sales GROUP BY City ORDER BY Total_Sales DESC LIMIT 5;`.\n"
-            "- When the user asks for data from 'last month' or 'previous month,' interpret it as the entire previous month relative to the current date (e.g., if today is May 2025, last month is all of April 2025). Use a date range to cover the whole month, from the first day to the last day of the previous month. For example, for 'Show me all sales from last month,' the query should be: `SELECT * FROM Honda_Sales WHERE Date >= DATE_SUB(DATE_SUB(CURDATE(), INTERVAL 1 MONTH), INTERVAL DAY(CURDATE())-1 DAY) AND Date <= LAST_DAY(DATE_SUB(CURDATE(), INTERVAL 1 MONTH));`. Do NOT use `Date = DATE_SUB(...)` as it only matches a single day.\n"
-            "- When the user mentions a specific month and year (e.g., 'March 2025'), calculate the date range for that specific month. For example, for 'Calculate the total revenue generated in March 2025,' use a fixed date range: `SELECT SUM(Total_Sale) AS Total_Revenue FROM Honda_Sales WHERE Date >= '2025-03-01' AND Date <= '2025-03-31';`. Alternatively, calculate the interval dynamically relative to the current date (e.g., if today is May 2025, March 2025 is 2 months back, so use `INTERVAL 2 MONTH`).\n"
-            "- When the user mentions a location like 'Chennai' in the context of 'in Chennai' or 'from Chennai,' interpret it as a city and use the `City` column, NOT the `Region` column. The `Region` column should be used for broader areas like 'South India,' while `City` is for specific cities like 'Chennai,' 'Bangalore,' etc. For example, for 'customers who purchased a product in Chennai,' the query should be: `SELECT Customer_Name FROM Honda_Sales WHERE City = 'Chennai' AND Product IS NOT NULL;`.\n"
-            "- ONLY return the SQL code inside a code block like ```sql ... ``` with NO explanation.\n\n"
-
-            "The database schema is:\n"
-            "Table: Honda_Sales\n"
-            "Columns: Sale_ID (VARCHAR), Date (DATE), City (VARCHAR), Region (VARCHAR), Showroom (VARCHAR), Category (VARCHAR), "
-            "Product (VARCHAR), Units_Sold (INT), Unit_Price (DECIMAL), Discount_Applied (DECIMAL), Total_Sale (DECIMAL), "
-            "Sales_Executive (VARCHAR), Customer_Name (VARCHAR), Phone (VARCHAR), Email (VARCHAR), Payment_Mode (VARCHAR)\n\n"
-            "Generate the SQL query based on the user’s prompt."
-        )
-
-        response = ollama.chat(
-            model='llama2:7b-chat',
-            messages=[
-                {'role': 'system', 'content': system_prompt},
+# Bounded SQL generation: greedy decoding, a hard cap on output tokens, and stop at the closing code fence
+# so the model never spends tokens on the explanation that clean_sql_query would throw away anyway.
+# The stop strings only match a closing fence ("```sql" is never followed by a newline or space directly).
+SQL_GENERATION_OPTIONS = {'temperature': 0, 'num_predict': 200, 'stop': ['\n```\n', '\n``` ']}
+UNBOUNDED_GENERATION_OPTIONS = {'num_predict': -1}
+
+# 'fenced' returns ```sql ... ``` text; 'json' uses Ollama's structured output and returns {"sql": "..."}
+SQL_OUTPUT_FORMAT = os.environ.get('SQL_OUTPUT_FORMAT', 'fenced')
+SQL_JSON_SCHEMA = {'type': 'object', 'properties': {'sql': {'type': 'string'}}, 'required': ['sql']}
+SQL_JSON_INSTRUCTION = (
+    "\n\nOutput format override: respond ONLY with a JSON object of the form {\"sql\": \"<query>\"}. "
+    "If you must refuse, put the refusal sentence in the \"sql\" field."
+)
+
+# Where generated SQL runs: 'mysql' (the honda database) or 'sqlite', an embedded copy of Honda_Sales used for
+# offline benchmarking (see bench_nl2sql.py, which builds it from honda_sales_data.xlsx)
+SQL_DB_BACKEND = os.environ.get('SQL_DB_BACKEND', 'mysql')
+MYSQL_CONFIG = {
+    'host': os.environ.get('MYSQL_HOST', 'localhost'),
+    'user': os.environ.get('MYSQL_USER', 'root'),
+    'password': os.environ.get('MYSQL_PASSWORD', ''),
+    'database': os.environ.get('MYSQL_DATABASE', 'honda'),
+}
+SQLITE_PATH = os.environ.get('SQLITE_PATH', 'honda_sales.sqlite')
+
+# Hedged generation: with SQL_HEDGE_FANOUT > 1 each question fires that many generations at once (candidate i
+# gets seed SQL_HEDGE_SEED + i and the i-th temperature, so candidate 0 is the usual greedy one), validates each
+# with a dry-run EXPLAIN, answers with the first valid query and cancels the rest. Candidates share the
+# gateway's OLLAMA_MAX_IN_FLIGHT slots, so a fan-out above that queues part of it.
+SQL_HEDGE_FANOUT = int(os.environ.get('SQL_HEDGE_FANOUT', '1'))
+SQL_HEDGE_TEMPERATURES = [float(value) for value in os.environ.get('SQL_HEDGE_TEMPERATURES', '0,0.4,0.7,1.0').split(',')]
+SQL_HEDGE_SEED = int(os.environ.get('SQL_HEDGE_SEED', '42'))
+
+# Opt-in: with SQL_QUERY_LOG set (e.g. sql_query_log.jsonl) every executed (cleaned) query is appended there as
+# one JSON line for index_advisor.py to replay through EXPLAIN. Past SQL_QUERY_LOG_MAX_BYTES the file is rotated
+# to <SQL_QUERY_LOG>.1, so the log never holds more than two files' worth of queries.
+SQL_QUERY_LOG = os.environ.get('SQL_QUERY_LOG', '')
+SQL_QUERY_LOG_MAX_BYTES = int(os.environ.get('SQL_QUERY_LOG_MAX_BYTES', str(10 * 1024 * 1024)))
+sql_query_log_lock = threading.Lock()
+
+# Used in the SQL prompt when the schema cache cannot reach the DB
+HONDA_SALES_SCHEMA = (
+    "Table: Honda_Sales\n"
+    "Columns: Sale_ID (VARCHAR), Date (DATE), City (VARCHAR), Region (VARCHAR), Showroom (VARCHAR), Category (VARCHAR), "
+    "Product (VARCHAR), Units_Sold (INT), Unit_Price (DECIMAL), Discount_Applied (DECIMAL), Total_Sale (DECIMAL), "
+    "Sales_Executive (VARCHAR), Customer_Name (VARCHAR), Phone (VARCHAR), Email (VARCHAR), Payment_Mode (VARCHAR)\n"
+)
+
+# Running totals of generated tokens (Ollama's eval_count), to compare bounded vs unbounded generation
+sql_token_stats = {'requests': 0, 'eval_tokens': 0}
+sql_token_stats_lock = threading.Lock()
+
+# Tokens and model seconds (request sent -> stream closed) of the winning candidate vs. the losing / cancelled
+# ones, and how many of those reached the model at all (a candidate cancelled while queued sends nothing).
+# `candidates` counts every candidate fired, so the reported fan-out is the one the questions actually used.
+sql_hedge_stats = {'questions': 0, 'candidates': 0, 'no_valid_candidate': 0, 'used_tokens': 0, 'wasted_tokens': 0, 'used_seconds': 0.0, 'wasted_seconds': 0.0,
+                   'wasted_requests': 0, 'not_sent': 0}
+sql_hedge_stats_lock = threading.Lock()
+
+SQL_HEDGE_CANDIDATES = registry.counter('insightgenie_sql_hedge_candidates_total', 'Hedged SQL generations by outcome', ('outcome',))
+# Seconds, not tokens: a candidate cancelled during prompt evaluation costs model time but generates no tokens
+registry.gauge('insightgenie_sql_hedge_wasted_ratio', 'Share of hedged model seconds spent on candidates that were not used',
+               fn=lambda: sql_hedge_stats['wasted_seconds'] / max(1e-9, sql_hedge_stats['used_seconds'] + sql_hedge_stats['wasted_seconds']))
+SQL_QUERIES = registry.counter('insightgenie_sql_queries_total', 'Generated SQL queries executed against the DB', ('status',))
+LITERAL_CORRECTIONS = registry.counter('insightgenie_sql_literal_corrections_total', 'Entity literals in generated SQL fixed by the schema cache')
+registry.gauge('insightgenie_sql_generated_tokens_avg', 'Average tokens generated per NL->SQL request',
+               fn=lambda: average_generation_tokens())
+
+def average_generation_tokens():
+    with sql_token_stats_lock:
+        return sql_token_stats['eval_tokens'] / sql_token_stats['requests'] if sql_token_stats['requests'] else 0.0
+
+def record_generation_tokens(response):
+    eval_count = response.get('eval_count') or 0
+    with sql_token_stats_lock:
+        sql_token_stats['requests'] += 1
+        sql_token_stats['eval_tokens'] += eval_count
+        average = sql_token_stats['eval_tokens'] / sql_token_stats['requests']
+    app.logger.info(f"SQL generation used {eval_count} tokens (avg {average:.1f})")
+    return eval_count
+
+# Function to build the NL->SQL chat request: messages, options and (for JSON output) the format schema
+def build_sql_request(user_input, bounded=True, output_format=None):
+    output_format = output_format or SQL_OUTPUT_FORMAT
+    system_prompt = (
+        "You are a helpful assistant that converts natural language prompts into SQL queries for a given database schema. "
+        "You will:\n"
+        "🔹 Understand the user's prompt and identify the intent (e.g., select, filter, aggregate, join).\n"
+        "🔹 Use the provided database schema to map the prompt to the correct table and column names.\n"
+        "🔹 Generate a syntactically correct SQL query in a simple and clear format.\n\n"
+        "⚠️ Rules:\n"
+        "- Only generate SQL queries related to the provided schema.\n"
+        "- If the prompt is unclear or unrelated to SQL generation, respond: \"Sorry, I can only help with generating SQL queries for the given database schema.\"\n"
+        "- If the schema is insufficient or missing, respond: \"Please provide the database schema to generate the SQL query.\"\n"
+        "- For non-null checks, always use `IS NOT NULL` exactly as shown (e.g., `Product IS NOT NULL`). Do NOT use `NOT NULL` or duplicate `IS` (e.g., do NOT write `IS IS NOT NULL`). For example, for 'customers who purchased a product,' include `Product IS NOT NULL` to ensure a product was purchased.\n"
+        "- When the prompt asks for 'missing' or 'not provided' data (e.g., 'missing email addresses'), interpret it as records where the column is null or an empty string. Use `IS NULL OR column = ''` for string columns like `Phone` or `Email`. For example, for 'Get sales data with missing email addresses,' the query should be: `SELECT * FROM Honda_Sales WHERE Email IS NULL OR Email = '';`.\n"
+        "- Do NOT add conditions for columns that are not mentioned in the prompt. For example, if the prompt only mentions 'missing email addresses,' do NOT add conditions for other columns like `Phone` unless explicitly requested.\n"
+        "- When the user asks for a specific number of results (e.g., 'top 5'), include a `LIMIT` clause with the specified number (e.g., `LIMIT 5`).\n"
+        "- In the `ORDER BY` clause, ensure the column or alias matches exactly what is defined in the `SELECT` clause (e.g., if `SELECT SUM(Units_Sold) AS Total_Sales`, use `ORDER BY Total_Sales`, not `TotalSales`).\n"
+        "- When the user refers to 'total sales' (e.g., in prompts like 'top 5 cities by total sales'), ALWAYS interpret it as the monetary value of sales, which MUST be calculated using the `Total_Sale` column (e.g., `SUM(Total_Sale)`), NOT the number of units sold (`Units_Sold`). For example, for 'top 5 cities by total sales,' the query should be: `SELECT City, SUM(Total_Sale) AS Total_Sales FROM Honda_Sales GROUP BY City ORDER BY Total_Sales DESC LIMIT 5;`.\n"
+        "- When the user asks for data from 'last month' or 'previous month,' interpret it as the entire previous month relative to the current date (e.g., if today is May 2025, last month is all of April 2025). Use a date range to cover the whole month, from the first day to the last day of the previous month. For example, for 'Show me all sales from last month,' the query should be: `SELECT * FROM Honda_Sales WHERE Date >= DATE_SUB(DATE_SUB(CURDATE(), INTERVAL 1 MONTH), INTERVAL DAY(CURDATE())-1 DAY) AND Date <= LAST_DAY(DATE_SUB(CURDATE(), INTERVAL 1 MONTH));`. Do NOT use `Date = DATE_SUB(...)` as it only matches a single day.\n"
+        "- When the user mentions a specific month and year (e.g., 'March 2025'), calculate the date range for that specific month. For example, for 'Calculate the total revenue generated in March 2025,' use a fixed date range: `SELECT SUM(Total_Sale) AS Total_Revenue FROM Honda_Sales WHERE Date >= '2025-03-01' AND Date <= '2025-03-31';`. Alternatively, calculate the interval dynamically relative to the current date (e.g., if today is May 2025, March 2025 is 2 months back, so use `INTERVAL 2 MONTH`).\n"
+        "- When the user mentions a location like 'Chennai' in the context of 'in Chennai' or 'from Chennai,' interpret it as a city and use the `City` column, NOT the `Region` column. The `Region` column should be used for broader areas like 'South India,' while `City` is for specific cities like 'Chennai,' 'Bangalore,' etc. For example, for 'customers who purchased a product in Chennai,' the query should be: `SELECT Customer_Name FROM Honda_Sales WHERE City = 'Chennai' AND Product IS NOT NULL;`.\n"
+        "- ONLY return the SQL code inside a code block like ```sql ... ``` with NO explanation.\n\n"
+
+        "The database schema is:\n"
+        + schema_cache.schema_text(default=HONDA_SALES_SCHEMA) + "\n"
+        "Generate the SQL query based on the user’s prompt."
+    )
+
+    options = SQL_GENERATION_OPTIONS if bounded else UNBOUNDED_GENERATION_OPTIONS
+
+    if output_format == 'json':
+        # The closing-fence stop sequence does not apply to JSON output
+        return {
+            'messages': [
+                {'role': 'system', 'content': system_prompt + SQL_JSON_INSTRUCTION},
                 {'role': 'user', 'content': user_input}
-            ]
-        )
+            ],
+            'options': {key: value for key, value in options.items() if key != 'stop'},
+            'format': SQL_JSON_SCHEMA
+        }
+
+    return {
+        'messages': [
+            {'role': 'system', 'content': system_prompt},
+            {'role': 'user', 'content': user_input}
+        ],
+        'options': options
+    }
 
-        return response['message']['content']
+# Function to turn the model's reply into SQL text (JSON output carries it in the "sql" field)
+def parse_sql_reply(content, output_format=None):
+    if (output_format or SQL_OUTPUT_FORMAT) == 'json':
+        return json.loads(content)['sql'].strip()
+    return content
+
+# Function to generate SQL from natural language prompt
+def generate_sql_query(user_input, bounded=True, output_format=None):
+    try:
+        response = gateway.chat('sql', **build_sql_request(user_input, bounded, output_format))
+        record_generation_tokens(response)
+        return parse_sql_reply(response['message']['content'], output_format)
     except Exception as e:
         return f"Error generating SQL query: {str(e)}"
 
-# Function to clean the SQL query by removing Markdown code block markers and fixing syntax errors
-def clean_sql_query(sql_query):
+# Function to clean the SQL query by removing Markdown code block markers and fixing syntax errors.
+# `prompt` is the user's question; some fixes depend on what was asked (e.g. "missing phone"). When
+# `corrections` is a list it receives the (before, after) literal fixes, so the answer can show them.
+def clean_sql_query(sql_query, prompt='', corrections=None):
     # Remove the ```sql and ``` markers, and strip any whitespace
     if sql_query.startswith('```sql'):
         sql_query = sql_query.replace('```sql', '').replace('```', '').strip()
@@ -62,16 +176,21 @@ def clean_sql_query(sql_query):
     # Fallback: Fix incorrect `IS IS NOT NULL` by removing the extra `IS`
     sql_query = re.sub(r'(\w+)\s+IS\s+IS\s+NOT\s+NULL', r'\1 IS NOT NULL', sql_query, flags=re.IGNORECASE)
     
-    # Fallback: Fix incorrect `Region = 'Chennai'` with `City = 'Chennai'`
-    if "Region = 'Chennai'" in sql_query:
-        sql_query = sql_query.replace("Region = 'Chennai'", "City = 'Chennai'")
+    # Resolve City/Region/Product/Category/Payment_Mode literals against the DB's actual values
+    # (e.g. `Region = 'Chennai'` -> `City = 'Chennai'`, `City = 'Kolkatta'` -> `City = 'Kolkata'`)
+    sql_query, literal_corrections = schema_cache.correct_literals(sql_query)
+    for before, after in literal_corrections:
+        LITERAL_CORRECTIONS.inc()
+        app.logger.info(f"Corrected SQL literal: {before} -> {after}")
+    if corrections is not None:
+        corrections.extend(literal_corrections)
     
     # Fallback: Fix incorrect `Phone IS NOT NULL` with `Phone IS NULL` for "missing" data
-    if "missing phone" in request.form.get('prompt', '').lower() and "Phone IS NOT NULL" in sql_query:
+    prompt_lower = prompt.lower()
+    if "missing phone" in prompt_lower and "Phone IS NOT NULL" in sql_query:
         sql_query = sql_query.replace("Phone IS NOT NULL", "Phone IS NULL")
     
     # Enhancement: Add check for empty strings for "missing" data in string columns like Phone or Email
-    prompt_lower = request.form.get('prompt', '').lower()
     if "missing phone" in prompt_lower and "Phone IS NULL" in sql_query and "Phone = ''" not in sql_query:
         sql_query = sql_query.replace("Phone IS NULL", "Phone IS NULL OR Phone = ''")
     elif "missing email" in prompt_lower and "Email IS NULL" in sql_query and "Email = ''" not in sql_query:
@@ -118,52 +237,295 @@ def clean_sql_query(sql_query):
     
     return sql_query
 
-# Function to run SQL query on MySQL DB
+def _last_day(value):
+    day = datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+    return day.replace(day=calendar.monthrange(day.year, day.month)[1]).isoformat()
+
+# The MySQL date functions the system prompt teaches the model, for the embedded SQLite copy.
+# `DATE_SUB(... INTERVAL n MONTH)` has no SQLite equivalent, so those queries still fail there.
+SQLITE_FUNCTIONS = {
+    'CURDATE': (0, lambda: date.today().isoformat()),
+    'LAST_DAY': (1, _last_day),
+    'DAY': (1, lambda value: int(str(value)[8:10])),
+    'MONTH': (1, lambda value: int(str(value)[5:7])),
+    'YEAR': (1, lambda value: int(str(value)[:4])),
+}
+
+def get_db_connection():
+    if SQL_DB_BACKEND == 'sqlite':
+        conn = sqlite3.connect(SQLITE_PATH)
+        for name, (arity, func) in SQLITE_FUNCTIONS.items():
+            conn.create_function(name, arity, func)
+        return conn
+    import mysql.connector
+    return mysql.connector.connect(**MYSQL_CONFIG)
+
+# Column types and the distinct entity values, introspected from the DB on first use (or by warm_up)
+schema_cache = SchemaCache(get_db_connection, SQL_DB_BACKEND)
+
+def log_executed_query(sql_query, status, seconds, rows=None, error=None):
+    if not SQL_QUERY_LOG:
+        return
+    entry = {'ts': datetime.now().isoformat(timespec='seconds'), 'backend': SQL_DB_BACKEND, 'sql': sql_query,
+             'status': status, 'seconds': round(seconds, 6), 'rows': rows}
+    if error:
+        entry['error'] = error
+    try:
+        with sql_query_log_lock:
+            if os.path.exists(SQL_QUERY_LOG) and os.path.getsize(SQL_QUERY_LOG) >= SQL_QUERY_LOG_MAX_BYTES:
+                os.replace(SQL_QUERY_LOG, SQL_QUERY_LOG + '.1')
+            with open(SQL_QUERY_LOG, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + '\n')
+    except OSError as e:
+        app.logger.warning(f"Could not append to the query log {SQL_QUERY_LOG}: {e}")
+
+# Function to run SQL query on the configured DB
 def retrieve_data_from_db(sql_query):
+    import pandas as pd
+    start = None
     try:
-        conn = mysql.connector.connect(
-            host='localhost',
-            user='root',
-            password='',
-            database='honda'
-        )
-        df = pd.read_sql(sql_query, conn)
+        with span('db_connect'):
+            conn = get_db_connection()
+        start = time.perf_counter()
+        with span('sql_execution'):
+            df = pd.read_sql(sql_query, conn)
+        log_executed_query(sql_query, 'ok', time.perf_counter() - start, rows=len(df))
         conn.close()
+        SQL_QUERIES.inc(status='ok')
         return df
     except Exception as e:
+        SQL_QUERIES.inc(status='error')
+        if start is not None:
+            log_executed_query(sql_query, 'error', time.perf_counter() - start, error=str(e))
         return f"Error executing query: {e}"
 
+# Function to turn the query result (or error message) into the HTML shown under "Result:"
+def render_result(result):
+    import pandas as pd
+    if isinstance(result, str) and result.startswith('Error'):
+        return f"<p style='color:red;'>{result}</p>"
+    elif isinstance(result, pd.DataFrame):
+        if result.empty:
+            return '<p>No data returned.</p>'
+        return result.to_html(classes='table table-striped', index=False)
+    return '<p>Unexpected error.</p>'
+
+# Every literal the schema cache changed is shown above the result, so a rewritten question is never silent
+def render_corrections(corrections):
+    if not corrections:
+        return ''
+    items = ''.join(f'<li><code>{escape(before)}</code> → <code>{escape(after)}</code></li>' for before, after in corrections)
+    return f"<div class='alert alert-info'>Adjusted the query to values that exist in the data:<ul class='mb-0'>{items}</ul></div>"
+
+# Dry run: the DB parses and plans the query without executing it. Returns None when valid, else the error.
+def validate_sql(sql_query):
+    conn = None
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute(('EXPLAIN QUERY PLAN ' if SQL_DB_BACKEND == 'sqlite' else 'EXPLAIN ') + sql_query.strip().rstrip(';'))
+        cursor.fetchall()
+        cursor.close()
+        return None
+    except Exception as e:
+        return str(e)
+    finally:
+        if conn is not None:
+            conn.close()
+
+hedge_pool = None
+hedge_pool_lock = threading.Lock()
+
+def get_hedge_pool():
+    global hedge_pool
+    with hedge_pool_lock:
+        if hedge_pool is None:
+            hedge_pool = ThreadPoolExecutor(max_workers=max(4, SQL_HEDGE_FANOUT * 4), thread_name_prefix='sql-hedge')
+            # Losers still streaming at exit are dropped instead of holding the interpreter open
+            atexit.register(hedge_pool.shutdown, wait=False, cancel_futures=True)
+        return hedge_pool
+
+# One hedged candidate: streams the generation so it can stop as soon as `cancel` is set (closing the stream
+# drops the HTTP connection and Ollama stops generating), then cleans and dry-runs the SQL. A candidate still
+# queued for a gateway slot when `cancel` is set never sends its request.
+def generate_sql_candidate(prompt, index, cancel):
+    request_kwargs = build_sql_request(prompt)
+    request_kwargs['options'] = {
+        **request_kwargs['options'],
+        'seed': SQL_HEDGE_SEED + index,
+        'temperature': SQL_HEDGE_TEMPERATURES[index % len(SQL_HEDGE_TEMPERATURES)],
+    }
+    candidate = {'index': index, 'sql_query': None, 'clean_query': None, 'corrections': [], 'error': None, 'tokens': 0,
+                 'cancelled': False, 'sent': False, 'seconds': 0.0}
+    parts = []
+    done = False
+    try:
+        with gateway.chat('sql', stream=True, cancel=cancel, **request_kwargs) as stream:
+            try:
+                for chunk in stream:
+                    if cancel.is_set():
+                        break
+                    parts.append(chunk['message']['content'])
+                    if chunk.get('done'):
+                        candidate['tokens'] = chunk.get('eval_count') or len(parts)
+                        done = True
+            finally:
+                if stream.sent_at is not None:
+                    candidate['sent'] = True
+                    candidate['seconds'] = time.perf_counter() - stream.sent_at
+            if not done and cancel.is_set():
+                candidate['cancelled'] = True
+                candidate['tokens'] = len(parts)  # one streamed chunk per generated token
+                return candidate
+            if not done:
+                candidate['error'] = 'Error generating SQL query: the stream ended before the reply was complete'
+                return candidate
+
+            candidate['sql_query'] = parse_sql_reply(''.join(parts))
+            if candidate['sql_query'].startswith("Sorry") or candidate['sql_query'].startswith("Please"):
+                candidate['error'] = 'refused'
+                return candidate
+            candidate['clean_query'] = clean_sql_query(candidate['sql_query'], prompt, candidate['corrections'])
+            candidate['error'] = validate_sql(candidate['clean_query'])
+            # Still holding the gateway slot: the first valid candidate cancels the others before the slot is
+            # handed on, so one queued behind it never sends its request
+            if candidate['error'] is None:
+                cancel.set()
+            return candidate
+    except Exception as e:
+        candidate['error'] = f"Error generating SQL query: {str(e)}"
+        return candidate
+
+def record_hedge(candidates, winner):
+    with sql_hedge_stats_lock:
+        sql_hedge_stats['questions'] += 1
+        sql_hedge_stats['candidates'] += len(candidates)
+        if winner is None:
+            sql_hedge_stats['no_valid_candidate'] += 1
+        for candidate in candidates:
+            kind = 'used' if candidate is winner else 'wasted'
+            sql_hedge_stats[f'{kind}_tokens'] += candidate['tokens']
+            sql_hedge_stats[f'{kind}_seconds'] += candidate['seconds']
+            if candidate is not winner:
+                sql_hedge_stats['wasted_requests' if candidate['sent'] else 'not_sent'] += 1
+    for candidate in candidates:
+        if candidate is winner:
+            outcome = 'won'
+        elif not candidate['sent']:
+            outcome = 'not_sent'
+        elif candidate['cancelled']:
+            outcome = 'cancelled'
+        elif candidate['error']:
+            outcome = 'invalid'
+        else:
+            outcome = 'lost'  # valid, but finished after the winner
+        SQL_HEDGE_CANDIDATES.inc(outcome=outcome)
+
+def record_hedge_when_done(futures, winner):
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def candidate_done(_):
+        with lock:
+            remaining[0] -= 1
+            if remaining[0]:
+                return
+        record_hedge([future.result() for future in futures], winner)
+
+    for future in futures:
+        future.add_done_callback(candidate_done)
+
+# Fans out SQL_HEDGE_FANOUT candidates and returns (sql_query, clean_query) of the first one whose EXPLAIN
+# passes; `corrections`, when a list, receives its literal fixes. Without a valid candidate every one has finished
+# and the lowest-index reply (candidate 0, the greedy one) is returned with clean_query None, so the usual
+# cleaning, execution and error page apply.
+def generate_sql_hedged(prompt, fanout=None, corrections=None):
+    fanout = fanout or SQL_HEDGE_FANOUT
+    cancel = threading.Event()
+    pool = get_hedge_pool()
+    futures = [pool.submit(generate_sql_candidate, prompt, index, cancel) for index in range(fanout)]
+    pending = set(futures)
+    finished = []
+    winner = None
+    while pending and winner is None:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in sorted(done, key=lambda future: future.result()['index']):
+            finished.append(future.result())
+            if winner is None and finished[-1]['error'] is None and finished[-1]['clean_query']:
+                winner = finished[-1]
+
+    # Stop the losers without waiting for them: they close their streams (or skip sending) in the background
+    # and the question is accounted once the last one is done
+    cancel.set()
+    record_hedge_when_done(futures, winner)
+
+    if winner is not None:
+        if corrections is not None:
+            corrections.extend(winner['corrections'])
+        return winner['sql_query'], winner['clean_query']
+    fallback = min(finished, key=lambda candidate: candidate['index'])
+    return fallback['sql_query'] or fallback['error'], None
+
+def hedge_stats():
+    with sql_hedge_stats_lock:
+        stats = dict(sql_hedge_stats)
+    total = stats['used_tokens'] + stats['wasted_tokens']
+    stats['wasted_token_ratio'] = round(stats['wasted_tokens'] / total, 4) if total else 0.0
+    total = stats['used_seconds'] + stats['wasted_seconds']
+    stats['wasted_seconds_ratio'] = round(stats['wasted_seconds'] / total, 4) if total else 0.0
+    stats['fanout'] = round(stats['candidates'] / stats['questions'], 2) if stats['questions'] else 0.0
+    return stats
+
+# Feeds per-stage timings into the insightgenie_stage_seconds histogram served on /metrics
+def record_stage_timings(timings):
+    for stage, seconds in timings.items():
+        observe_stage(stage, seconds)
+
+# Full prompt -> SQL -> result pipeline. When `timings` is a dict it receives the seconds spent in each stage.
+def answer_prompt(prompt, timings=None):
+    timings = {} if timings is None else timings
+
+    # Step 1: Get SQL query (with Markdown formatting). Hedged candidates come back already cleaned and validated.
+    start = time.perf_counter()
+    clean_query = None
+    corrections = []
+    if SQL_HEDGE_FANOUT > 1:
+        sql_query, clean_query = generate_sql_hedged(prompt, corrections=corrections)
+    else:
+        sql_query = generate_sql_query(prompt)
+    timings['generation'] = time.perf_counter() - start
+
+    # Check if the assistant refused or asked for schema
+    if sql_query.startswith("Sorry") or sql_query.startswith("Please"):
+        record_stage_timings(timings)
+        return sql_query, f"<p style='color:red;'>{sql_query}</p>"
+
+    # Step 2: Clean the SQL query for database execution
+    start = time.perf_counter()
+    if clean_query is None:
+        clean_query = clean_sql_query(sql_query, prompt, corrections)
+    timings['clean_sql_query'] = time.perf_counter() - start
+
+    # Step 3: Run the cleaned SQL query on DB
+    start = time.perf_counter()
+    result = retrieve_data_from_db(clean_query)
+    timings['retrieve_data_from_db'] = time.perf_counter() - start
+
+    # Step 4: Show data in table
+    start = time.perf_counter()
+    result_html = render_corrections(corrections) + render_result(result)
+    timings['to_html'] = time.perf_counter() - start
+
+    record_stage_timings(timings)
+    return sql_query, result_html
+
 # Main Flask route
 @app.route('/', methods=['GET', 'POST'])
 def home():
     result_html = ''
     sql_query = ''
     if request.method == 'POST':
-        prompt = request.form['prompt']
-
-        # Step 1: Get SQL query (with Markdown formatting)
-        sql_query = generate_sql_query(prompt)
-
-        # Check if the assistant refused or asked for schema
-        if sql_query.startswith("Sorry") or sql_query.startswith("Please"):
-            result_html = f"<p style='color:red;'>{sql_query}</p>"
-        else:
-            # Step 2: Clean the SQL query for database execution
-            clean_query = clean_sql_query(sql_query)
-
-            # Step 3: Run the cleaned SQL query on DB
-            result = retrieve_data_from_db(clean_query)
-
-            # Step 4: Show data in table
-            if isinstance(result, str) and result.startswith('Error'):
-                result_html = f"<p style='color:red;'>{result}</p>"
-            elif isinstance(result, pd.DataFrame):
-                if result.empty:
-                    result_html = '<p>No data returned.</p>'
-                else:
-                    result_html = result.to_html(classes='table table-striped', index=False)
-            else:
-                result_html = '<p>Unexpected error.</p>'
+        sql_query, result_html = answer_prompt(request.form['prompt'])
 
     return render_template_string('''
     <!DOCTYPE html>
@@ -186,5 +548,45 @@ def home():
     </html>
     ''', sql_query=sql_query, result_html=result_html)
 
+# pandas, the DB driver and the SQL model are loaded lazily; this pays for all of them in the background at
+# startup so the first question does not, while the server is already accepting requests
+def warm_up():
+    try:
+        import pandas
+        if SQL_DB_BACKEND == 'mysql':
+            import mysql.connector
+        schema_cache.ensure_loaded()
+        gateway.warm('sql')
+    except Exception as e:
+        app.logger.warning(f"Warm-up failed, the first request will load what it needs: {e}")
+
+warm_up_thread = None
+warm_up_lock = threading.Lock()
+
+# Starts warm_up() in the background once per process; later calls return the same thread
+def start_warm_up():
+    global warm_up_thread
+    with warm_up_lock:
+        if warm_up_thread is None:
+            warm_up_thread = threading.Thread(target=warm_up, name='sql-warm-up', daemon=True)
+            warm_up_thread.start()
+        return warm_up_thread
+
+# Under a WSGI server (or `flask run`) there is no __main__ block: the first request starts the warm-up, which
+# the first request would otherwise pay for alone
+@app.before_request
+def ensure_warm_up_started():
+    if warm_up_thread is None:
+        start_warm_up()
+
+# Prometheus scrape endpoint: stage latency histograms, LLM call latency/tokens and gateway pool gauges
+@app.route('/metrics')
+def metrics():
+    return Response(render(), content_type=CONTENT_TYPE)
+
 if __name__ == '__main__':
+    # The debug reloader runs this block twice: in the file watcher and in the serving child (WERKZEUG_RUN_MAIN);
+    # only the child serves requests, so only the child warms up
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_warm_up()
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,198 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import sqlite3
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from index_advisor import create_index_sql, load_recommendations
+from instrumentation import percentile
+from stub_ollama_server import load_recordings, recordings_source, replay_responder, start_stub_server
+
+STAGES = ('generation', 'clean_sql_query', 'retrieve_data_from_db', 'to_html')
+
+# Same secondary indexes db.py creates in MySQL
+SQLITE_INDEXES = {
+    'idx_date': 'Date',
+    'idx_city': 'City',
+    'idx_region': 'Region',
+    'idx_product': 'Product',
+}
+
+
+def summarize(seconds):
+    return {
+        'count': len(seconds),
+        'mean_ms': round(sum(seconds) / len(seconds) * 1000, 3) if seconds else 0.0,
+        'p50_ms': round(percentile(seconds, 50) * 1000, 3),
+        'p95_ms': round(percentile(seconds, 95) * 1000, 3),
+        'p99_ms': round(percentile(seconds, 99) * 1000, 3),
+        'max_ms': round(max(seconds) * 1000, 3) if seconds else 0.0,
+    }
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+# Embedded copy of the honda database: the spreadsheet db.py loads into MySQL, written to SQLite
+def build_sqlite_db(path, xlsx_path='honda_sales_data.xlsx', rebuild=False):
+    if os.path.exists(path) and not rebuild:
+        return path
+    import pandas as pd
+
+    data = pd.read_excel(xlsx_path)
+    data['Date'] = pd.to_datetime(data['Date']).dt.strftime('%Y-%m-%d')
+    data['Sale_ID'] = data['Sale_ID'].astype(str)
+    if os.path.exists(path):
+        os.remove(path)
+    with sqlite3.connect(path) as conn:
+        data.to_sql('Honda_Sales', conn, index=False)
+        for name, column in SQLITE_INDEXES.items():
+            conn.execute(f'CREATE INDEX IF NOT EXISTS {name} ON Honda_Sales ({column})')
+    return path
+
+
+# index_advisor.py proposals, as db.py applies them to MySQL; returns the index names
+def apply_recommended_indexes(path, recommendations_path):
+    recommendations = load_recommendations(recommendations_path)
+    with sqlite3.connect(path) as conn:
+        for recommendation in recommendations:
+            conn.execute(create_index_sql(recommendation, if_not_exists=True))
+    return [recommendation['name'] for recommendation in recommendations]
+
+
+# One client request through app.answer_prompt; failed generations or queries count as errors
+def run_question(sql_app, question):
+    timings = {}
+    start = time.perf_counter()
+    _, result_html = sql_app.answer_prompt(question, timings)
+    timings['total'] = time.perf_counter() - start
+    return timings, "color:red" in result_html
+
+
+def run_load(sql_app, questions, clients, rounds):
+    jobs = questions * rounds
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        results = list(pool.map(lambda question: run_question(sql_app, question), jobs))
+    wall = time.perf_counter() - start
+
+    samples = {stage: [] for stage in STAGES + ('total',)}
+    for timings, _ in results:
+        for stage, seconds in timings.items():
+            samples[stage].append(seconds)
+
+    return {
+        'clients': clients,
+        'requests': len(jobs),
+        'errors': sum(1 for _, failed in results if failed),
+        'failed_questions': sorted({question for question, (_, failed) in zip(jobs, results) if failed}),
+        'wall_s': round(wall, 3),
+        'throughput_rps': round(len(jobs) / wall, 2) if wall else 0.0,
+        'stages': {stage: summarize(samples[stage]) for stage in STAGES},
+        'end_to_end': summarize(samples['total']),
+    }
+
+
+def measure_memory(sql_app, questions):
+    """ Peak Python heap over one sequential pass over the corpus (tracemalloc; includes the in-process stub). """
+    tracemalloc.start()
+    try:
+        for question in questions:
+            run_question(sql_app, question)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(peak / (1024 * 1024), 2)
+
+
+# Captures what the live model answers for each question so later runs can replay it through the stub
+def record(questions, path):
+    import app as sql_app
+    from llm_gateway import USE_CASES
+
+    recordings = {}
+    for question in questions:
+        recordings[question] = sql_app.generate_sql_query(question)
+        print(f"recorded: {question}", file=sys.stderr)
+    source = (f"recorded from {sql_app.gateway.host} ({USE_CASES['sql']['model']}) "
+              f"on {datetime.now(timezone.utc).date().isoformat()}")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'source': source, 'replies': recordings}, f, indent=2, ensure_ascii=False)
+        f.write('\n')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='End-to-end NL->SQL benchmark: replayed model replies, real cleaning, query execution and rendering.')
+    parser.add_argument('--questions', default='honda_questions.json')
+    parser.add_argument('--recordings', default='bench_recordings.json',
+                        help='Replies replayed by the stub Ollama server; the bundled file is synthetic (hand-written), --record replaces it')
+    parser.add_argument('--record', action='store_true', help='Refresh --recordings from the live Ollama at OLLAMA_HOST, then exit')
+    parser.add_argument('--db', choices=('sqlite', 'mysql'), default='sqlite', help='sqlite builds an embedded copy of Honda_Sales; mysql uses MYSQL_* settings')
+    parser.add_argument('--sqlite-path', default='honda_sales.sqlite', help="Same default as app.py's SQLITE_PATH")
+    parser.add_argument('--rebuild-db', action='store_true')
+    parser.add_argument('--indexes', help="Apply index_advisor.py's recommendations (e.g. recommended_indexes.json) to the SQLite copy")
+    parser.add_argument('--clients', default='1,4,8', help='Comma-separated concurrent client counts')
+    parser.add_argument('--rounds', type=int, default=3, help='Passes over the corpus per client count')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Simulated model prompt-eval time per request')
+    parser.add_argument('--token-delay-ms', type=float, default=0.0, help='Simulated model time per generated token')
+    parser.add_argument('--hedge-fanout', type=int, default=1, help='SQL_HEDGE_FANOUT: concurrent candidates per question, first valid one wins')
+    parser.add_argument('--output', help='Also write the JSON report to this file')
+    args = parser.parse_args()
+
+    with open(args.questions, 'r', encoding='utf-8') as f:
+        questions = json.load(f)
+
+    if args.record:
+        record(questions, args.recordings)
+        sys.exit(0)
+
+    # The gateway and DB settings are read when app is imported, so configure them first
+    server = start_stub_server(
+        responder=replay_responder(load_recordings(args.recordings)),
+        latency=args.latency_ms / 1000,
+        token_delay=args.token_delay_ms / 1000,
+    )
+    os.environ['OLLAMA_HOST'] = server.url
+    os.environ['SQL_DB_BACKEND'] = args.db
+    os.environ['SQL_HEDGE_FANOUT'] = str(args.hedge_fanout)
+    if args.db == 'sqlite':
+        os.environ['SQLITE_PATH'] = build_sqlite_db(args.sqlite_path, rebuild=args.rebuild_db)
+    recommended_indexes = apply_recommended_indexes(args.sqlite_path, args.indexes) if args.indexes and args.db == 'sqlite' else []
+
+    import app as sql_app
+
+    # Warm-up pass so imports, connections and pandas code paths are not billed to the first measurement
+    for question in questions:
+        run_question(sql_app, question)
+
+    report = {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'db': args.db,
+        'replies': recordings_source(args.recordings),
+        'recommended_indexes': recommended_indexes,
+        'questions': len(questions),
+        'rounds': args.rounds,
+        'stub': {'latency_ms': args.latency_ms, 'token_delay_ms': args.token_delay_ms},
+        'runs': [run_load(sql_app, questions, int(clients), args.rounds) for clients in args.clients.split(',')],
+        'memory': {'tracemalloc_peak_mb': measure_memory(sql_app, questions)},
+        'llm_gateway': sql_app.gateway.stats(),
+        'sql_hedge': sql_app.hedge_stats(),
+    }
+    report['memory']['max_rss_mb'] = peak_rss_mb()
+    server.shutdown()
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
@@ -0,0 +1,42 @@
+import argparse
+import json
+import time
+
+import app as sql_app
+
+
+# Compares tokens generated per request with the old free-running generation vs the bounded settings
+def run(questions, bounded, output_format):
+    before = dict(sql_app.sql_token_stats)
+    start = time.perf_counter()
+    failures = 0
+    for question in questions:
+        result = sql_app.generate_sql_query(question, bounded=bounded, output_format=output_format)
+        if result.startswith('Error'):
+            failures += 1
+    elapsed = time.perf_counter() - start
+
+    requests = sql_app.sql_token_stats['requests'] - before['requests']
+    tokens = sql_app.sql_token_stats['eval_tokens'] - before['eval_tokens']
+    return {
+        'mode': ('bounded' if bounded else 'unbounded') + f'/{output_format}',
+        'requests': requests,
+        'failures': failures,
+        'avg_tokens': round(tokens / requests, 1) if requests else 0.0,
+        'avg_latency_ms': round(elapsed / len(questions) * 1000, 1) if questions else 0.0,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measure tokens generated per NL->SQL request before and after bounding.')
+    parser.add_argument('--questions', default='honda_questions.json')
+    parser.add_argument('--json-mode', action='store_true', help='Also measure the {"sql": ...} structured output mode')
+    args = parser.parse_args()
+
+    with open(args.questions, 'r', encoding='utf-8') as f:
+        questions = json.load(f)
+
+    results = [run(questions, bounded=False, output_format='fenced'), run(questions, bounded=True, output_format='fenced')]
+    if args.json_mode:
+        results.append(run(questions, bounded=True, output_format='json'))
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,85 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+RAG_DIR = os.path.join(ROOT, "New folder")
+
+# Entry point -> directory it is run from
+TARGETS = {
+    "app": ROOT,
+    "step1back": ROOT,
+    "chatbot": RAG_DIR,
+    "rag_server": RAG_DIR,
+}
+
+# Dependencies that should only be imported once a request (or the warm-up thread) needs them
+HEAVY_MODULES = ("pandas", "mysql.connector", "ollama", "httpx", "torch", "sentence_transformers", "qdrant_client", "onnxruntime")
+
+
+def parse_importtime(stderr):
+    """ `-X importtime` lines -> [(module, self_us, cumulative_us), ...] """
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        if not fields[0].strip().isdigit():
+            continue  # header row
+        imports.append((fields[2].strip(), int(fields[0]), int(fields[1])))
+    return imports
+
+
+def measure(target, cwd, runs, top):
+    wall = []
+    imports = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+            cwd=cwd, capture_output=True, text=True,
+        )
+        wall.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            return {"error": result.stderr.strip().splitlines()[-1] if result.stderr.strip() else f"exit code {result.returncode}"}
+        imports = parse_importtime(result.stderr)
+
+    cumulative = {module: total for module, _, total in imports}
+    slowest = sorted((item for item in imports if item[0] != target), key=lambda item: -item[2])[:top]
+    return {
+        "wall_ms": round(statistics.median(wall) * 1000, 1),
+        "import_ms": round(cumulative.get(target, 0) / 1000, 1),
+        "heavy_modules_loaded": [module for module in HEAVY_MODULES if module in cumulative],
+        "slowest_imports": [{"module": module, "cumulative_ms": round(total / 1000, 1)} for module, _, total in slowest],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import-time startup benchmark for the CLI and web entry points (python -X importtime).")
+    parser.add_argument("--targets", nargs="+", default=list(TARGETS), choices=list(TARGETS))
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per target; wall time is the median")
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports listed per target")
+    parser.add_argument("--output", help="Optional path to write the JSON results")
+    args = parser.parse_args()
+
+    baseline = []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], check=True)
+        baseline.append(time.perf_counter() - start)
+
+    report = {
+        "python": sys.version.split()[0],
+        "interpreter_ms": round(statistics.median(baseline) * 1000, 1),
+        "targets": {target: measure(target, TARGETS[target], args.runs, args.top) for target in args.targets},
+    }
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
@@ -2,6 +2,8 @@ import mysql.connector
 import pandas as pd
 import uuid
 
+from index_advisor import RECOMMENDED_INDEXES, create_index_sql, load_recommendations
+
 # Step 1: Read the Excel file
 data = pd.read_excel('honda_sales_data.xlsx')
 
@@ -144,6 +146,13 @@ for _, row in data.iterrows():
 # Step 10: Commit the data insertion
 conn.commit()
 
+# Step 10b: Composite indexes proposed by index_advisor.py from the app's query log (if it has been run).
+# Built after the bulk insert so the rows are not re-sorted into every index one at a time.
+for recommendation in load_recommendations(RECOMMENDED_INDEXES):
+    print(f"Creating recommended index: {create_index_sql(recommendation)}")
+    cursor.execute(create_index_sql(recommendation))
+conn.commit()
+
 # Step 11: Fetch and display the data from the database for verification
 cursor.execute("SELECT * FROM Honda_Sales")
 columns = [col[0] for col in cursor.description]
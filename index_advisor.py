@@ -0,0 +1,392 @@
+import argparse
+import hashlib
+import json
+import math
+import os
+import re
+import sys
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+TABLE = 'Honda_Sales'
+COLUMNS = (
+    'Sale_ID', 'Date', 'City', 'Region', 'Showroom', 'Category', 'Product', 'Units_Sold', 'Unit_Price',
+    'Discount_Applied', 'Total_Sale', 'Sales_Executive', 'Customer_Name', 'Phone', 'Email', 'Payment_Mode',
+)
+
+# app.py appends every executed query here when SQL_QUERY_LOG is set (rotating the full file to <log>.1); the
+# advisor reads both and writes its proposals for db.py to apply
+SQL_QUERY_LOG = os.environ.get('SQL_QUERY_LOG') or 'sql_query_log.jsonl'
+RECOMMENDED_INDEXES = os.environ.get('RECOMMENDED_INDEXES', 'recommended_indexes.json')
+
+# Wider indexes cost more on every insert than the extra index-only scans save on this table
+MAX_INDEX_COLUMNS = 5
+# MySQL's identifier limit
+MAX_INDEX_NAME = 64
+
+_COLUMN_PATTERN = '|'.join(sorted(COLUMNS, key=len, reverse=True))
+_CLAUSE_END = r'(?=\bGROUP\s+BY\b|\bORDER\s+BY\b|\bHAVING\b|\bLIMIT\b|;|$)'
+
+
+def normalize_sql(sql):
+    """ Query shape: literals replaced by `?` and whitespace collapsed, so one question asked twice counts twice. """
+    shape = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    shape = re.sub(r'\b\d+(?:\.\d+)?\b', '?', shape)
+    return re.sub(r'\s+', ' ', shape).strip().rstrip(';').strip()
+
+
+def load_query_log(path=SQL_QUERY_LOG):
+    """ Successful queries from the log grouped by shape: {shape: {"count", "example", "seconds"}}. """
+    shapes = OrderedDict()
+    # The rotated file holds the older queries
+    for part in (path + '.1', path):
+        if part != path and not os.path.exists(part):
+            continue
+        with open(part, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                entry = json.loads(line)
+                if entry.get('status') != 'ok':
+                    continue
+                shape = normalize_sql(entry['sql'])
+                stats = shapes.setdefault(shape, {'count': 0, 'example': entry['sql'], 'seconds': 0.0})
+                stats['count'] += 1
+                stats['seconds'] += entry.get('seconds') or 0.0
+                stats['example'] = entry['sql']
+    return shapes
+
+
+def _clause(sql, keyword):
+    match = re.search(rf'\b{keyword}\b(.*?){_CLAUSE_END}', sql, re.IGNORECASE | re.DOTALL)
+    return match.group(1) if match else ''
+
+
+def _columns_in(text):
+    return re.findall(rf'\b({_COLUMN_PATTERN})\b', text)
+
+
+def _order_by(sql):
+    """ `(columns, by_expression)` of the ORDER BY clause; `by_expression` when any item is not a bare column
+    (`SUM(Total_Sale)`, an alias, a position), which no index order can provide. """
+    items = [re.sub(r'\s+(ASC|DESC)$', '', item.strip(), flags=re.IGNORECASE) for item in _clause(sql, r'ORDER\s+BY').split(',')]
+    items = [item for item in items if item]
+    columns = [item for item in items if re.fullmatch(rf'`?({_COLUMN_PATTERN})`?', item)]
+    return list(dict.fromkeys(column.strip('`') for column in columns)), len(columns) < len(items)
+
+
+def analyze_query(sql):
+    """ Which Honda_Sales columns the query filters (equality / range), groups, orders by and reads.
+
+    Regex-level, like the rest of the SQL handling in app.py: good enough for the single-table queries the
+    model generates. Predicates inside functions (`YEAR(Date) = 2024`) cannot use an index and are reported
+    as non-sargable; an OR across different columns makes the whole WHERE clause unusable for one index.
+    """
+    from_clause = re.search(r'\bFROM\s+(\w+)', sql, re.IGNORECASE)
+    if not from_clause or from_clause.group(1).lower() != TABLE.lower() or re.search(r'\bJOIN\b', sql, re.IGNORECASE):
+        return None
+
+    where = _clause(sql, 'WHERE')
+    equality, ranges, non_sargable = [], [], []
+    if where:
+        wrapped = re.findall(rf'\w+\s*\(\s*({_COLUMN_PATTERN})\b', where)
+        non_sargable.extend(dict.fromkeys(wrapped))
+        predicates = [column for column in dict.fromkeys(_columns_in(where)) if column not in non_sargable]
+        if re.search(r'\bOR\b', where, re.IGNORECASE) and len(predicates) > 1:
+            non_sargable.extend(predicates)
+            predicates = []
+        for column in predicates:
+            if re.search(rf"\b{column}\s*(=|\bIN\s*\(|\bIS\s+NULL\b)", where, re.IGNORECASE) \
+                    and not re.search(rf'\b{column}\s*(<|>|!=|<>|\bBETWEEN\b|\bLIKE\b|\bIS\s+NOT\b)', where, re.IGNORECASE):
+                equality.append(column)
+            elif re.search(rf"\b{column}\s*(<=|>=|<|>|\bBETWEEN\b|\bLIKE\s+'[^%_]|\bIS\s+NOT\s+NULL\b)", where, re.IGNORECASE):
+                ranges.append(column)
+            else:
+                non_sargable.append(column)
+
+    select = re.search(r'\bSELECT\b(.*?)\bFROM\b', sql, re.IGNORECASE | re.DOTALL)
+    order_by, order_by_expression = _order_by(sql)
+    return {
+        'equality': equality,
+        'range': ranges,
+        'non_sargable': non_sargable,
+        'group_by': list(dict.fromkeys(_columns_in(_clause(sql, r'GROUP\s+BY')))),
+        'order_by': order_by,
+        'order_by_expression': order_by_expression,
+        'select_star': bool(select and re.search(r'(^|,|\s)\*(\s|,|$)', select.group(1))),
+        'referenced': list(dict.fromkeys(_columns_in(sql))),
+        'where': where.strip(),
+    }
+
+
+def candidate_index(analysis, distinct):
+    """ Composite index for one query shape: equality columns (most selective first), then one range column
+    or the GROUP BY / ORDER BY columns, then the other referenced columns when that makes it covering.
+
+    Returns `(columns, covering)`, or `(None, None)` when no index can help.
+    """
+    key = sorted(analysis['equality'], key=lambda column: -distinct.get(column, 1))
+    if analysis['range']:
+        # Only the first range column can be used for seeking; the rest are filtered in the index
+        key += sorted(analysis['range'], key=lambda column: -distinct.get(column, 1))[:1]
+    else:
+        key += [column for column in analysis['group_by'] or analysis['order_by'] if column not in key]
+    if not key:
+        return None, None
+
+    remaining = [column for column in analysis['referenced'] if column not in key]
+    if not analysis['select_star'] and len(key) + len(remaining) <= MAX_INDEX_COLUMNS:
+        return tuple(key + remaining), True
+    return tuple(key[:MAX_INDEX_COLUMNS]), False
+
+
+def index_name(columns):
+    """ `idx_hs_<columns>`; a name over MAX_INDEX_NAME is cut short and ends in a hash of the full column list,
+    so two long indexes sharing a prefix never get the same name. """
+    name = 'idx_hs_' + '_'.join(column.lower() for column in columns)
+    if len(name) <= MAX_INDEX_NAME:
+        return name
+    digest = hashlib.sha1(','.join(columns).encode('utf-8')).hexdigest()[:8]
+    return f'{name[:MAX_INDEX_NAME - len(digest) - 1]}_{digest}'
+
+
+def create_index_sql(recommendation, if_not_exists=False):
+    columns = ', '.join(recommendation['columns'])
+    guard = 'IF NOT EXISTS ' if if_not_exists else ''
+    return f"CREATE INDEX {guard}{recommendation['name']} ON {TABLE} ({columns})"
+
+
+def load_recommendations(path=RECOMMENDED_INDEXES):
+    """ The advisor's proposals from `path`, or [] when the advisor has not been run. """
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f).get('indexes', [])
+
+
+def _fetch(conn, sql):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql)
+        columns = [column[0] for column in cursor.description] if cursor.description else []
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+def existing_indexes(conn, backend):
+    """ {index name: (columns...)} currently defined on Honda_Sales. """
+    indexes = OrderedDict()
+    if backend == 'sqlite':
+        for index in _fetch(conn, f"PRAGMA index_list('{TABLE}')"):
+            indexes[index['name']] = tuple(row['name'] for row in _fetch(conn, f"PRAGMA index_info('{index['name']}')"))
+        return indexes
+    for row in _fetch(conn, f'SHOW INDEX FROM {TABLE}'):
+        indexes.setdefault(row['Key_name'], []).append((row['Seq_in_index'], row['Column_name']))
+    return OrderedDict((name, tuple(column for _, column in sorted(parts))) for name, parts in indexes.items())
+
+
+def explain(conn, backend, sql):
+    """ The optimizer's plan for `sql`, reduced to what the cost estimate needs. """
+    sql = sql.strip().rstrip(';')
+    if backend == 'sqlite':
+        details = [row['detail'] for row in _fetch(conn, f'EXPLAIN QUERY PLAN {sql}')]
+        used = next((re.search(r'USING (?:COVERING )?INDEX (\w+)', detail) for detail in details if 'USING' in detail and 'INDEX' in detail), None)
+        return {
+            'plan': details,
+            'full_scan': any(re.match(rf'SCAN (TABLE )?{TABLE}\b', detail) and 'INDEX' not in detail for detail in details),
+            'index': used.group(1) if used else None,
+            'covering': any('COVERING INDEX' in detail for detail in details),
+            'temp_sort': any('TEMP B-TREE' in detail for detail in details),
+            'rows': None,
+        }
+
+    rows = [row for row in _fetch(conn, f'EXPLAIN {sql}') if (row.get('table') or '').lower() == TABLE.lower()]
+    row = rows[0] if rows else {}
+    extra = row.get('Extra') or ''
+    return {
+        'plan': [f"type={row.get('type')} key={row.get('key')} rows={row.get('rows')} extra={extra}" for row in rows],
+        'full_scan': row.get('type') == 'ALL',
+        'index': row.get('key'),
+        'covering': 'Using index' in extra and 'Using index condition' not in extra,
+        'temp_sort': 'Using temporary' in extra or 'Using filesort' in extra,
+        'rows': int(row['rows']) if row.get('rows') is not None else None,
+    }
+
+
+def _cost(rows, covering, temp_sort):
+    """ Rows touched: index entries plus one table lookup each unless covering, plus a temp sort pass. """
+    return rows * (1 if covering else 2) + (rows if temp_sort else 0)
+
+
+def _matching_rows(conn, analysis, table_rows, distinct, columns):
+    """ Rows the index range would return. Exact (COUNT with the query's WHERE) when the index covers every
+    predicate, otherwise the uniform-distribution estimate over the equality columns it can seek on. """
+    predicates = set(analysis['equality'] + analysis['range'])
+    if not predicates:
+        return table_rows
+    if predicates <= set(columns) and not analysis['non_sargable']:
+        return _fetch(conn, f"SELECT COUNT(*) AS n FROM {TABLE} WHERE {analysis['where']}")[0]['n']
+    rows = table_rows
+    for column in columns:
+        if column not in analysis['equality']:
+            break
+        rows /= max(distinct.get(column, 1), 1)
+    return int(math.ceil(rows))
+
+
+def _planner_uses(conn, backend, columns, sql):
+    """ What-if check: SQLite DDL is transactional, so create the index, EXPLAIN, and roll it back.
+    MySQL has no hypothetical indexes and building a real one per candidate is too intrusive, so None there. """
+    if backend != 'sqlite':
+        return None
+    name = index_name(columns)
+    conn.execute('SAVEPOINT index_advisor')
+    try:
+        conn.execute(f"CREATE INDEX {name} ON {TABLE} ({', '.join(columns)})")
+        return explain(conn, backend, sql)['index'] == name
+    finally:
+        conn.execute('ROLLBACK TO index_advisor')
+        conn.execute('RELEASE index_advisor')
+
+
+def advise(conn, backend, shapes, max_indexes=5, min_benefit=0.1):
+    """ Replays each logged query shape through EXPLAIN and proposes composite indexes.
+
+    The estimated benefit of an index is the rows-touched saving (`_cost`) summed over the logged executions
+    it would serve; candidates that are a prefix of another candidate are folded into the longer one.
+    """
+    table_rows = _fetch(conn, f'SELECT COUNT(*) AS n FROM {TABLE}')[0]['n']
+    distinct = _fetch(conn, 'SELECT ' + ', '.join(f'COUNT(DISTINCT {column}) AS {column}' for column in COLUMNS) + f' FROM {TABLE}')[0]
+    current = existing_indexes(conn, backend)
+
+    candidates = OrderedDict()
+    skipped = []
+    for shape, stats in shapes.items():
+        analysis = analyze_query(stats['example'])
+        if analysis is None:
+            skipped.append({'query': stats['example'], 'reason': f'not a single-table query on {TABLE}'})
+            continue
+        columns, covering = candidate_index(analysis, distinct)
+        if columns is None:
+            reason = 'predicates are not sargable: ' + ', '.join(analysis['non_sargable']) if analysis['non_sargable'] else 'nothing to seek, group or order on'
+            skipped.append({'query': stats['example'], 'reason': reason})
+            continue
+        if columns in current.values():
+            skipped.append({'query': stats['example'], 'reason': f'already served by an existing index on ({", ".join(columns)})'})
+            continue
+
+        try:
+            plan = explain(conn, backend, stats['example'])
+        except Exception as e:
+            skipped.append({'query': stats['example'], 'reason': f'EXPLAIN failed: {e}'})
+            continue
+
+        if plan['full_scan'] or not plan['index']:
+            baseline_rows = table_rows
+            baseline = _cost(table_rows, True, plan['temp_sort'])
+        else:
+            used = current.get(plan['index'], ())
+            baseline_rows = plan['rows'] if plan['rows'] is not None else _matching_rows(conn, analysis, table_rows, distinct, used)
+            baseline = _cost(baseline_rows, plan['covering'], plan['temp_sort'])
+
+        rows = _matching_rows(conn, analysis, table_rows, distinct, columns)
+        grouped = analysis['group_by'] or analysis['order_by']
+        prefix = len(analysis['equality'])
+        temp_sort = bool(grouped) and (bool(analysis['range']) or list(columns[prefix:prefix + len(grouped)]) != grouped)
+        # Ordering by an aggregate (or by columns other than the groups) sorts the grouped rows again
+        if analysis['order_by_expression'] or (analysis['group_by'] and analysis['order_by']
+                                               and analysis['order_by'] != analysis['group_by'][:len(analysis['order_by'])]):
+            temp_sort = True
+        if not analysis['equality'] and not analysis['range'] and not covering:
+            # An unselective non-covering index scan is worse than the table scan it replaces
+            skipped.append({'query': stats['example'], 'reason': 'only a full index scan with table lookups would help'})
+            continue
+        saving = baseline - _cost(rows, covering, temp_sort)
+        if saving <= 0 or saving < min_benefit * baseline:
+            skipped.append({'query': stats['example'], 'reason': f'estimated saving too small ({max(saving, 0)} of {baseline} rows)'})
+            continue
+
+        candidate = candidates.setdefault(columns, {'columns': columns, 'covering': covering, 'benefit_rows': 0, 'executions': 0, 'queries': []})
+        candidate['benefit_rows'] += saving * stats['count']
+        candidate['executions'] += stats['count']
+        candidate['queries'].append({
+            'query': stats['example'],
+            'executions': stats['count'],
+            'baseline_plan': plan['plan'],
+            'baseline_rows_touched': baseline,
+            'estimated_rows_touched': _cost(rows, covering, temp_sort),
+        })
+
+    # A prefix of a longer candidate is served by the longer index: fold it in
+    for columns in sorted(candidates, key=len):
+        longer = next((other for other in candidates if len(other) > len(columns) and other[:len(columns)] == columns), None)
+        if longer is not None:
+            candidates[longer]['benefit_rows'] += candidates[columns]['benefit_rows']
+            candidates[longer]['executions'] += candidates[columns]['executions']
+            candidates[longer]['queries'].extend(candidates.pop(columns)['queries'])
+
+    ranked = sorted(candidates.values(), key=lambda candidate: -candidate['benefit_rows'])
+    recommendations = []
+    for candidate in ranked:
+        if len(recommendations) >= max_indexes:
+            skipped.extend({'query': query['query'], 'reason': f"({', '.join(candidate['columns'])}) ranked below the top {max_indexes}"} for query in candidate['queries'])
+            continue
+        uses = _planner_uses(conn, backend, candidate['columns'], candidate['queries'][0]['query'])
+        if uses is False:
+            skipped.extend({'query': query['query'], 'reason': f"planner ignores ({', '.join(candidate['columns'])})"} for query in candidate['queries'])
+            continue
+        recommendation = {
+            'name': index_name(candidate['columns']),
+            'columns': list(candidate['columns']),
+            'covering': candidate['covering'],
+            'estimated_benefit_rows': int(candidate['benefit_rows']),
+            'executions_served': candidate['executions'],
+            'planner_verified': uses,
+            'queries': candidate['queries'],
+        }
+        recommendation['sql'] = create_index_sql(recommendation)
+        recommendations.append(recommendation)
+
+    return {
+        'generated_at': datetime.now(timezone.utc).isoformat(),
+        'backend': backend,
+        'table_rows': table_rows,
+        'query_shapes': len(shapes),
+        'executions': sum(stats['count'] for stats in shapes.values()),
+        'existing_indexes': {name: list(columns) for name, columns in current.items()},
+        'indexes': recommendations,
+        'skipped': skipped,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Propose composite indexes for Honda_Sales from the executed-query log.')
+    parser.add_argument('--log', default=SQL_QUERY_LOG, help='JSON-lines query log written by app.py')
+    parser.add_argument('--output', default=RECOMMENDED_INDEXES, help='Where db.py picks the recommendations up')
+    parser.add_argument('--max-indexes', type=int, default=5)
+    parser.add_argument('--min-benefit', type=float, default=0.1, help='Minimum estimated saving as a fraction of the current plan')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.log):
+        sys.exit(f'No query log at {args.log}; run the app (or bench_nl2sql.py) with SQL_QUERY_LOG={args.log} first')
+
+    # Same DB settings as the app (SQL_DB_BACKEND, MYSQL_*, SQLITE_PATH)
+    from app import SQL_DB_BACKEND, get_db_connection
+
+    conn = get_db_connection()
+    try:
+        report = advise(conn, SQL_DB_BACKEND, load_query_log(args.log), args.max_indexes, args.min_benefit)
+    finally:
+        conn.close()
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+        f.write('\n')
+
+    print(f"{report['executions']} logged executions, {report['query_shapes']} query shapes, {report['table_rows']} rows")
+    for recommendation in report['indexes']:
+        print(f"  {recommendation['sql']}  -- ~{recommendation['estimated_benefit_rows']} rows saved over "
+              f"{recommendation['executions_served']} executions{' (covering)' if recommendation['covering'] else ''}")
+    print(f"Wrote {args.output}")
@@ -0,0 +1,328 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+
+from instrumentation import registry
+
+logger = logging.getLogger(__name__)
+
+# Where Ollama lives and how long it should keep models resident between requests
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
+OLLAMA_KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+OLLAMA_MAX_IN_FLIGHT = int(os.environ.get("OLLAMA_MAX_IN_FLIGHT", "4"))
+OLLAMA_TIMEOUT = float(os.environ.get("OLLAMA_TIMEOUT", "120"))
+
+# Model and generation options per call site. `num_ctx` is sized to the prompt each one actually sends and
+# `num_predict` caps runaway generations.
+USE_CASES = {
+    # app.py / step2samp.py: NL -> SQL with the long rule-heavy system prompt
+    "sql": {"model": "llama2:7b-chat", "options": {"num_ctx": 4096, "num_predict": 256}},
+    # step1back.py: interactive SQL chat with a short system prompt
+    "sql_chat": {"model": "llama2:7b-chat", "options": {"num_ctx": 2048, "num_predict": 256}},
+    # chatbot.py / chatbotbac.py: format retrieved context into an answer
+    "rag_answer": {"model": "mistral:7b", "options": {"num_ctx": 4096, "num_predict": 512}},
+    # chatbotbac.py: reformulate the question before retrieval
+    "query_rewrite": {"model": "mistral:7b", "options": {"num_ctx": 1024, "num_predict": 96}},
+}
+
+LLM_SECONDS = registry.histogram("insightgenie_llm_request_seconds", "LLM call latency, including streaming", ("use_case", "model"))
+LLM_ERRORS = registry.counter("insightgenie_llm_errors_total", "Failed LLM calls", ("use_case",))
+LLM_TOKENS = registry.counter("insightgenie_llm_tokens_total", "Tokens reported by Ollama (prompt_eval_count / eval_count)", ("use_case", "kind"))
+
+
+def _observe(use_case, model, start, response=None):
+    LLM_SECONDS.observe(time.perf_counter() - start, use_case=use_case, model=model)
+    if response is not None:
+        LLM_TOKENS.inc(response.get("prompt_eval_count") or 0, use_case=use_case, kind="prompt")
+        LLM_TOKENS.inc(response.get("eval_count") or 0, use_case=use_case, kind="eval")
+
+
+class InFlightLimit:
+    """ One concurrency cap shared by threads and event loops, served first come first served.
+
+    Blocking callers wait on a `threading.Event`; coroutines await a future that the releasing thread resolves
+    through `call_soon_threadsafe`, so the event loop never blocks. A freed slot is handed straight to the
+    oldest waiter.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._used = 0
+        self._waiters = deque()  # threading.Event or (loop, future)
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self._used < self.limit and not self._waiters:
+                self._used += 1
+                return
+            waiter = threading.Event()
+            self._waiters.append(waiter)
+        try:
+            waiter.wait()
+        except BaseException:
+            self._abandon(waiter)
+            raise
+
+    async def acquire_async(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._used < self.limit and not self._waiters:
+                self._used += 1
+                return
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+        try:
+            await waiter[1]
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+
+    def _abandon(self, waiter):
+        """ A waiter gave up (interrupted / cancelled): drop it from the queue, or give back a slot handed to it. """
+        with self._lock:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+                return
+        if isinstance(waiter, threading.Event):
+            self.release()
+        elif waiter[1].done() and not waiter[1].cancelled():
+            self.release()
+        # A hand-over still on its way to a cancelled future is given back by `_wake`
+
+    def release(self):
+        with self._lock:
+            if not self._waiters:
+                self._used -= 1
+                return
+            waiter = self._waiters.popleft()
+        # The slot moves to the waiter without ever being free
+        if isinstance(waiter, threading.Event):
+            waiter.set()
+        else:
+            loop, future = waiter
+            loop.call_soon_threadsafe(self._wake, future)
+
+    def _wake(self, future):
+        if future.cancelled():
+            self.release()
+        else:
+            future.set_result(None)
+
+
+class LLMGateway:
+    """ One shared Ollama client per process.
+
+    Reuses a pooled keep-alive HTTP connection, pins models in memory with `keep_alive`, applies per-use-case
+    `num_ctx`/`num_predict`, and caps concurrent generations so a burst of requests queues here instead of
+    thrashing the model server. Sync and async callers draw from the same `max_in_flight` slots.
+    `ollama`/`httpx` are only imported when the first call is made.
+    """
+
+    def __init__(self, host=OLLAMA_HOST, keep_alive=OLLAMA_KEEP_ALIVE, max_in_flight=OLLAMA_MAX_IN_FLIGHT, timeout=OLLAMA_TIMEOUT):
+        self.host = host
+        self.keep_alive = keep_alive
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self._sync_client = None
+        self._async_client = None
+        self._limit = InFlightLimit(max_in_flight)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.waiting = 0
+        self.calls = {}
+        self.errors = 0
+
+    def _limits(self):
+        import httpx
+        return httpx.Limits(max_connections=self.max_in_flight * 2, max_keepalive_connections=self.max_in_flight)
+
+    @property
+    def _client(self):
+        if self._sync_client is None:
+            import ollama
+            with self._lock:
+                if self._sync_client is None:
+                    self._sync_client = ollama.Client(host=self.host, timeout=self.timeout, limits=self._limits())
+        return self._sync_client
+
+    def _request(self, use_case, model=None, options=None):
+        if use_case not in USE_CASES:
+            raise ValueError(f"Unknown LLM use case '{use_case}', expected one of {', '.join(USE_CASES)}")
+        config = USE_CASES[use_case]
+        return model or config["model"], {**config["options"], **(options or {})}
+
+    def _count(self, field, delta):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + delta)
+
+    def _record_call(self, use_case):
+        with self._lock:
+            self.calls[use_case] = self.calls.get(use_case, 0) + 1
+
+    @contextmanager
+    def _slot(self):
+        self._count("waiting", 1)
+        try:
+            self._limit.acquire()
+        finally:
+            self._count("waiting", -1)
+        self._count("in_flight", 1)
+        try:
+            yield
+        finally:
+            self._count("in_flight", -1)
+            self._limit.release()
+
+    @asynccontextmanager
+    async def _async_slot(self):
+        self._count("waiting", 1)
+        try:
+            await self._limit.acquire_async()
+        finally:
+            self._count("waiting", -1)
+        self._count("in_flight", 1)
+        try:
+            yield
+        finally:
+            self._count("in_flight", -1)
+            self._limit.release()
+
+    def _failed(self, use_case):
+        self._count("errors", 1)
+        LLM_ERRORS.inc(use_case=use_case)
+
+    def chat(self, use_case, messages, model=None, options=None, stream=False, cancel=None, **kwargs):
+        """ `ollama.chat` with the use case's model/options.
+
+        With `stream=True` returns a `ChatStream`: iterate it inside `with` (or `close()` it) so a stream that is
+        abandoned early hands its in-flight slot back at once instead of when it is garbage collected. A set
+        `cancel` event (`threading.Event`) found once the slot is free ends the stream without sending anything.
+        """
+        model, options = self._request(use_case, model, options)
+        self._record_call(use_case)
+        if stream:
+            return ChatStream(lambda chat_stream: self._stream(chat_stream, use_case, model, messages, options, cancel, **kwargs))
+
+        with self._slot():
+            start = time.perf_counter()
+            try:
+                response = self._client.chat(model=model, messages=messages, options=options, keep_alive=self.keep_alive, **kwargs)
+            except Exception:
+                self._failed(use_case)
+                raise
+            _observe(use_case, model, start, response)
+            return response
+
+    def _stream(self, chat_stream, use_case, model, messages, options, cancel, **kwargs):
+        # The slot is held until the last chunk so streamed generations count against the cap too
+        with self._slot():
+            if cancel is not None and cancel.is_set():
+                return
+            start = chat_stream.sent_at = time.perf_counter()
+            final_chunk = None
+            try:
+                for chunk in self._client.chat(model=model, messages=messages, options=options, keep_alive=self.keep_alive, stream=True, **kwargs):
+                    if chunk.get("done"):
+                        final_chunk = chunk
+                    yield chunk
+            except Exception:
+                self._failed(use_case)
+                raise
+            _observe(use_case, model, start, final_chunk)
+
+    def _async(self):
+        if self._async_client is None:
+            import ollama
+            self._async_client = ollama.AsyncClient(host=self.host, timeout=self.timeout, limits=self._limits())
+        return self._async_client
+
+    async def achat(self, use_case, messages, model=None, options=None, **kwargs):
+        """ Async `chat` for the RAG server; shares the per-use-case settings and the in-flight cap. """
+        client = self._async()
+        model, options = self._request(use_case, model, options)
+        self._record_call(use_case)
+        async with self._async_slot():
+            start = time.perf_counter()
+            try:
+                response = await client.chat(model=model, messages=messages, options=options, keep_alive=self.keep_alive, **kwargs)
+            except Exception:
+                self._failed(use_case)
+                raise
+            _observe(use_case, model, start, response)
+            return response
+
+    async def astream(self, use_case, messages, model=None, options=None, **kwargs):
+        """ Async generator over streamed chunks; holds an in-flight slot until the stream ends or is `aclose()`d. """
+        client = self._async()
+        model, options = self._request(use_case, model, options)
+        self._record_call(use_case)
+        async with self._async_slot():
+            start = time.perf_counter()
+            final_chunk = None
+            try:
+                stream = await client.chat(model=model, messages=messages, options=options, keep_alive=self.keep_alive, stream=True, **kwargs)
+                async for chunk in stream:
+                    if chunk.get("done"):
+                        final_chunk = chunk
+                    yield chunk
+            except Exception:
+                self._failed(use_case)
+                raise
+            _observe(use_case, model, start, final_chunk)
+
+    def warm(self, use_case, model=None):
+        """ Loads the model into memory without generating anything (an empty prompt only loads and pins it). """
+        model, _ = self._request(use_case, model)
+        with self._slot():
+            self._client.generate(model=model, prompt="", keep_alive=self.keep_alive)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": self.in_flight,
+                "waiting": self.waiting,
+                "max_in_flight": self.max_in_flight,
+                "calls": dict(self.calls),
+                "errors": self.errors,
+            }
+
+
+class ChatStream:
+    """ Iterator over streamed chat chunks returned by `LLMGateway.chat(..., stream=True)`.
+
+    The in-flight slot is taken on the first `next()` and held until the stream is exhausted or closed;
+    `with gateway.chat(..., stream=True) as stream:` closes it even when the caller stops early or raises.
+    `sent_at` is the `perf_counter()` time the request went to the model, None while it has not (or never will).
+    """
+
+    def __init__(self, generate):
+        self.sent_at = None
+        self._chunks = generate(self)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._chunks)
+
+    def close(self):
+        self._chunks.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Shared instance used by every entry point
+gateway = LLMGateway()
+
+registry.gauge("insightgenie_llm_in_flight", "LLM calls currently generating", fn=lambda: gateway.in_flight)
+registry.gauge("insightgenie_llm_waiting", "LLM calls queued for a free slot", fn=lambda: gateway.waiting)
+registry.gauge("insightgenie_llm_max_in_flight", "Concurrent LLM call cap (OLLAMA_MAX_IN_FLIGHT)", fn=lambda: gateway.max_in_flight)
@@ -0,0 +1,218 @@
+import logging
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+TABLE = 'Honda_Sales'
+
+# Low-cardinality columns the model writes literals for; their distinct values are kept in memory
+ENTITY_COLUMNS = ('City', 'Region', 'Product', 'Category', 'Payment_Mode')
+# Columns with more distinct values than this are not treated as an enumeration
+MAX_DISTINCT_VALUES = 200
+# The prompt lists at most this many values per column, the most frequent ones (5 columns x 25 short values stay
+# around 500 tokens of the sql call's num_ctx 4096); correct_literals() still knows every value
+MAX_PROMPT_VALUES = 25
+# A misspelt literal is only replaced by a value within this many single-character edits (and at most one
+# edit per 4 characters, so short values need an exact match). Anything further away ('Honda Civic',
+# 'North East') may be a real value the table does not hold and is left for the query to come back empty.
+MAX_EDIT_DISTANCE = 2
+# After a failed load (DB down), wait this long before introspecting again instead of retrying on every request
+RETRY_SECONDS = 30.0
+
+_ENTITY_PATTERN = '|'.join(ENTITY_COLUMNS)
+_COMPARISON = re.compile(rf"\b({_ENTITY_PATTERN})(\s*(?:=|!=|<>)\s*)'((?:[^']|'')*)'", re.IGNORECASE)
+_IN_LIST = re.compile(rf"\b({_ENTITY_PATTERN})(\s+(?:NOT\s+)?IN\s*)\(([^)]*)\)", re.IGNORECASE)
+_LITERAL = re.compile(r"'((?:[^']|'')*)'")
+
+
+def _rows(conn, sql, params=()):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def edit_distance(a, b, limit):
+    """ Levenshtein distance between `a` and `b`, or `limit + 1` as soon as it is known to exceed `limit`. """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class SchemaCache:
+    """ Honda_Sales column names/types and the distinct values of its entity columns, read once from the DB.
+
+    `schema_text()` feeds the SQL prompt and `correct_literals()` fixes entity literals in generated SQL
+    locally (wrong case, small misspellings, a city used as a region), so a wrong literal does not cost an empty
+    result and a re-ask. Both degrade to "no cache" when the DB cannot be reached.
+    """
+
+    def __init__(self, connect, backend, table=TABLE, entity_columns=ENTITY_COLUMNS):
+        self._connect = connect
+        self.backend = backend
+        self.table = table
+        self.entity_columns = tuple(entity_columns)
+        self.columns = []
+        self.values = {}
+        self.prompt_values = {}
+        self.loaded_at = None
+        self._lookup = {}
+        self._failed_at = None
+        self._lock = threading.RLock()
+
+    def _introspect(self, conn):
+        if self.backend == 'sqlite':
+            return [(row[1], (row[2] or 'TEXT').upper()) for row in _rows(conn, f"PRAGMA table_info('{self.table}')")]
+        return [(name, data_type.upper()) for name, data_type in _rows(
+            conn,
+            'SELECT COLUMN_NAME, DATA_TYPE FROM INFORMATION_SCHEMA.COLUMNS '
+            'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s ORDER BY ORDINAL_POSITION',
+            (self.table,),
+        )]
+
+    def load(self):
+        """ (Re)reads the schema and value dictionaries; call again after the table is reloaded. """
+        start = time.perf_counter()
+        conn = self._connect()
+        try:
+            columns = self._introspect(conn)
+            if not columns:
+                raise LookupError(f'Table {self.table} not found')
+            names = {name for name, _ in columns}
+            values = {}
+            prompt_values = {}
+            for column in self.entity_columns:
+                if column not in names:
+                    continue
+                distinct = [str(row[0]) for row in _rows(
+                    conn,
+                    f"SELECT {column} FROM {self.table} WHERE {column} IS NOT NULL AND {column} <> '' "
+                    f"GROUP BY {column} ORDER BY COUNT(*) DESC, {column} LIMIT {MAX_DISTINCT_VALUES + 1}",
+                )]
+                if len(distinct) <= MAX_DISTINCT_VALUES:
+                    values[column] = sorted(distinct)
+                    prompt_values[column] = sorted(distinct[:MAX_PROMPT_VALUES])
+        finally:
+            conn.close()
+
+        with self._lock:
+            self.columns = columns
+            self.values = values
+            self.prompt_values = prompt_values
+            self._lookup = {column: {value.lower(): value for value in column_values} for column, column_values in values.items()}
+            self.loaded_at = time.time()
+            self._failed_at = None
+        logger.info(f"Schema cache loaded {len(columns)} columns and {sum(map(len, values.values()))} entity values "
+                    f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+        return self
+
+    def ensure_loaded(self):
+        """ True once the cache holds the schema; loads it on first use. """
+        if self.loaded_at is not None:
+            return True
+        with self._lock:
+            if self.loaded_at is not None:
+                return True
+            if self._failed_at is not None and time.time() - self._failed_at < RETRY_SECONDS:
+                return False
+            try:
+                self.load()
+                return True
+            except Exception as e:
+                self._failed_at = time.time()
+                logger.warning(f"Schema cache unavailable, using the static schema: {e}")
+                return False
+
+    def schema_text(self, default=None):
+        """ The "Table / Columns / Known values" block of the SQL prompt, or `default` without a cache. """
+        if not self.ensure_loaded():
+            return default
+        lines = [
+            f'Table: {self.table}',
+            'Columns: ' + ', '.join(f'{name} ({data_type})' for name, data_type in self.columns),
+        ]
+        if self.prompt_values:
+            lines.append('Known values (use them exactly as written):')
+            for column, column_values in self.prompt_values.items():
+                more = len(self.values[column]) - len(column_values)
+                lines.append(f"- {column}: " + ', '.join(f"'{value}'" for value in column_values) + (f" (and {more} more)" if more else ''))
+        return '\n'.join(lines) + '\n'
+
+    def _match(self, column, literal, fuzzy=True):
+        lookup = self._lookup.get(column)
+        if not lookup:
+            return None
+        key = literal.lower().strip()
+        if key in lookup:
+            return lookup[key]
+        limit = min(MAX_EDIT_DISTANCE, len(key) // 4)
+        if not fuzzy or not limit:
+            return None
+        distances = {value: edit_distance(key, lower, limit) for lower, value in lookup.items()}
+        best = min(distances.values())
+        closest = [value for value, distance in distances.items() if distance == best]
+        # Two values equally close is a guess, not a typo fix
+        return closest[0] if best <= limit and len(closest) == 1 else None
+
+    def resolve(self, column, literal):
+        """ `(column, value)` the literal most likely means, or None when it is already right or unknown.
+
+        Exact value of the column (any case) first, then an exact value of another entity column (a city
+        written as `Region = ...`), then a value a typo or two away within the column, then elsewhere.
+        Partial or longer names are not guessed at: 'Civic' never becomes 'Activa'.
+        """
+        column = next((name for name in self.entity_columns if name.lower() == column.lower()), column)
+        if literal in self.values.get(column, ()):
+            return None
+        columns = [column] + [other for other in self.entity_columns if other != column]
+        for candidate_column, fuzzy in [(name, False) for name in columns] + [(name, True) for name in columns]:
+            value = self._match(candidate_column, literal, fuzzy)
+            if value is not None:
+                return candidate_column, value
+        return None
+
+    def correct_literals(self, sql_query):
+        """ Rewrites entity comparisons in `sql_query`; returns `(sql_query, [(before, after), ...])`. """
+        if not self.ensure_loaded():
+            return sql_query, []
+        corrections = []
+
+        def comparison(match):
+            column, operator, literal = match.group(1), match.group(2), match.group(3).replace("''", "'")
+            resolved = self.resolve(column, literal)
+            if resolved is None:
+                return match.group(0)
+            replacement = f"{resolved[0]}{operator}'{resolved[1].replace(chr(39), chr(39) * 2)}'"
+            corrections.append((match.group(0), replacement))
+            return replacement
+
+        def in_list(match):
+            column = match.group(1)
+
+            def literal(item):
+                resolved = self.resolve(column, item.group(1).replace("''", "'"))
+                # Only same-column fixes inside IN (...): the list cannot be split across columns
+                if resolved is None or resolved[0].lower() != column.lower():
+                    return item.group(0)
+                return "'" + resolved[1].replace("'", "''") + "'"
+
+            replacement = f'{column}{match.group(2)}({_LITERAL.sub(literal, match.group(3))})'
+            if replacement != match.group(0):
+                corrections.append((match.group(0), replacement))
+            return replacement
+
+        sql_query = _COMPARISON.sub(comparison, sql_query)
+        sql_query = _IN_LIST.sub(in_list, sql_query)
+        return sql_query, corrections
@@ -1,54 +1,160 @@
-from flask import Flask  # You imported Flask, but it’s unused — okay to keep or remove
+import logging
+import os
+import threading
+import time
 
-import ollama
+from llm_gateway import gateway
 
-# Function to generate response from the trained model
+logger = logging.getLogger(__name__)
+
+# Identical on every call, so Ollama can reuse the evaluated system-prompt prefix of the model's KV cache
+SYSTEM_PROMPT = (
+    "You are a helpful assistant that converts natural language prompts into SQL queries for a given database schema. "
+    "You will:\n"
+    "🔹 Understand the user's prompt and identify the intent (e.g., select, filter, aggregate, join).\n"
+    "🔹 Use the provided database schema to map the prompt to the correct table and column names.\n"
+    "🔹 Generate a syntactically correct SQL query in a simple and clear format.\n\n"
+    "⚠️ Rules:\n"
+    "- Only generate SQL queries related to the provided schema.\n"
+    "- If the prompt is unclear or unrelated to SQL generation, respond: \"Sorry, I can only help with generating SQL queries for the given database schema.\"\n"
+    "- If the schema is insufficient or missing, respond: \"Please provide the database schema to generate the SQL query.\"\n\n"
+    "The database schema is:\n"
+    "Table: Honda_Sales\n"
+    "Columns: Sale_ID (VARCHAR), Date (DATE), City (VARCHAR), Region (VARCHAR), Showroom (VARCHAR), Category (VARCHAR), "
+    "Product (VARCHAR), Units_Sold (INT), Unit_Price (DECIMAL), Discount_Applied (DECIMAL), Total_Sale (DECIMAL), "
+    "Sales_Executive (VARCHAR), Customer_Name (VARCHAR), Phone (VARCHAR), Email (VARCHAR), Payment_Mode (VARCHAR)\n\n"
+    "Generate the SQL query based on the user’s prompt."
+)
+
+# Tokens of earlier turns sent along with each question. sql_chat runs with num_ctx 2048 and num_predict 256;
+# the system prompt (~400 tokens), the chat template and the new question need the rest. 0 makes every question
+# a fresh single turn.
+CHAT_HISTORY_TOKENS = int(os.environ.get('CHAT_HISTORY_TOKENS', '1000'))
+
+# llama2's tokenizer averages ~4 characters per token on plain English but fewer on SQL, column names and emoji,
+# so the history is budgeted at 3 until a reply's prompt_eval_count shows the real ratio (see ChatSession.ask)
+CHARS_PER_TOKEN = 3.0
+
+def estimate_tokens(text, chars_per_token=CHARS_PER_TOKEN):
+    return int(len(text) / chars_per_token) + 1
+
+class ChatSession:
+    """ Multi-turn SQL chat that keeps the prompt prefix stable between turns.
+
+    Every request is the same system prompt followed by the history and the new question, so Ollama (with the
+    gateway's keep_alive holding the model) only evaluates what is new since the previous turn. When the history
+    outgrows `history_tokens`, the oldest turns are dropped down to half the budget in one go: the prefix then
+    changes once and stays cacheable for the next several turns, instead of sliding (and missing the cache)
+    on every turn.
+
+    The history is measured in characters and converted with the lowest characters-per-token ratio seen in
+    Ollama's prompt_eval_count so far. Only ever lowering it keeps the budget safe when Ollama counts just the
+    part of the prompt it did not have cached.
+    """
+
+    def __init__(self, system_prompt=SYSTEM_PROMPT, history_tokens=CHAT_HISTORY_TOKENS, use_case='sql_chat'):
+        self.system_prompt = system_prompt
+        self.history_tokens = history_tokens
+        self.use_case = use_case
+        self.history = []  # [(user message, assistant message), ...]
+        self.turns = []    # per-turn Ollama timings, see `ask`
+        self.chars_per_token = CHARS_PER_TOKEN
+
+    def _history_size(self):
+        return sum(estimate_tokens(user['content'], self.chars_per_token) + estimate_tokens(assistant['content'], self.chars_per_token)
+                   for user, assistant in self.history)
+
+    def _calibrate(self, messages, prompt_eval_count):
+        if prompt_eval_count > 0:
+            observed = sum(len(message['content']) for message in messages) / prompt_eval_count
+            self.chars_per_token = max(1.0, min(self.chars_per_token, observed))
+
+    def _trim(self):
+        if self._history_size() <= self.history_tokens:
+            return 0
+        dropped = 0
+        while self.history and self._history_size() > self.history_tokens // 2:
+            self.history.pop(0)
+            dropped += 1
+        return dropped
+
+    def messages(self, user_input):
+        messages = [{'role': 'system', 'content': self.system_prompt}]
+        for user, assistant in self.history:
+            messages.extend((user, assistant))
+        messages.append({'role': 'user', 'content': user_input})
+        return messages
+
+    def ask(self, user_input):
+        start = time.perf_counter()
+        messages = self.messages(user_input)
+        response = gateway.chat(self.use_case, messages=messages)
+        content = response['message']['content']
+        self._calibrate(messages, response.get('prompt_eval_count') or 0)
+
+        if self.history_tokens > 0:
+            self.history.append(({'role': 'user', 'content': user_input}, {'role': 'assistant', 'content': content}))
+        dropped = self._trim()
+        self.turns.append({
+            'turn': len(self.turns) + 1,
+            'history_turns': len(self.history),
+            'dropped_turns': dropped,
+            'prompt_eval_count': response.get('prompt_eval_count') or 0,
+            'prompt_eval_ms': (response.get('prompt_eval_duration') or 0) / 1e6,
+            'eval_count': response.get('eval_count') or 0,
+            'eval_ms': (response.get('eval_duration') or 0) / 1e6,
+            'wall_ms': (time.perf_counter() - start) * 1000,
+        })
+        return content
+
+    def summary(self):
+        """ Totals over the session; compare a run with CHAT_HISTORY_TOKENS=0 to see what the reuse saves. """
+        turns = len(self.turns)
+        return {
+            'turns': turns,
+            'prompt_eval_tokens': sum(turn['prompt_eval_count'] for turn in self.turns),
+            'prompt_eval_ms': round(sum(turn['prompt_eval_ms'] for turn in self.turns), 1),
+            'avg_prompt_eval_ms': round(sum(turn['prompt_eval_ms'] for turn in self.turns) / turns, 1) if turns else 0.0,
+            'avg_wall_ms': round(sum(turn['wall_ms'] for turn in self.turns) / turns, 1) if turns else 0.0,
+        }
+
+def format_turn_stats(turn):
+    return (f"[turn {turn['turn']}: prompt_eval {turn['prompt_eval_count']} tok / {turn['prompt_eval_ms']:.0f} ms, "
+            f"eval {turn['eval_count']} tok / {turn['eval_ms']:.0f} ms, history {turn['history_turns']} turns"
+            + (f", dropped {turn['dropped_turns']}" if turn['dropped_turns'] else "") + "]")
+
+# Function to generate response from the trained model (a single turn without history)
 def chat_with_model(user_input):
     try:
-        # Define system prompt
-        system_prompt = (
-            "You are a helpful assistant that converts natural language prompts into SQL queries for a given database schema. "
-            "You will:\n"
-            "🔹 Understand the user's prompt and identify the intent (e.g., select, filter, aggregate, join).\n"
-            "🔹 Use the provided database schema to map the prompt to the correct table and column names.\n"
-            "🔹 Generate a syntactically correct SQL query in a simple and clear format.\n\n"
-            "⚠️ Rules:\n"
-            "- Only generate SQL queries related to the provided schema.\n"
-            "- If the prompt is unclear or unrelated to SQL generation, respond: \"Sorry, I can only help with generating SQL queries for the given database schema.\"\n"
-            "- If the schema is insufficient or missing, respond: \"Please provide the database schema to generate the SQL query.\"\n\n"
-            "The database schema is:\n"
-            "Table: Honda_Sales\n"
-            "Columns: Sale_ID (VARCHAR), Date (DATE), City (VARCHAR), Region (VARCHAR), Showroom (VARCHAR), Category (VARCHAR), "
-            "Product (VARCHAR), Units_Sold (INT), Unit_Price (DECIMAL), Discount_Applied (DECIMAL), Total_Sale (DECIMAL), "
-            "Sales_Executive (VARCHAR), Customer_Name (VARCHAR), Phone (VARCHAR), Email (VARCHAR), Payment_Mode (VARCHAR)\n\n"
-            "Generate the SQL query based on the user’s prompt."
-        )
-
-        # Send the message to the Ollama model
-        response = ollama.chat(
-            model='llama2:7b-chat',
-            messages=[
-                {'role': 'system', 'content': system_prompt},
-                {'role': 'user', 'content': user_input}
-            ]
-        )
-
-        # Get the generated response
-        return response['message']['content']
-
+        return ChatSession(history_tokens=0).ask(user_input)
     except Exception as e:
         return f"An error occurred: {str(e)}"
 
+# Loads the model while the user is typing the first question
+def warm_up():
+    try:
+        gateway.warm('sql_chat')
+    except Exception as e:
+        logger.warning(f"Warm-up failed, the first question will load the model: {e}")
+
 # Main chat loop
 def main():
+    threading.Thread(target=warm_up, daemon=True).start()
+    session = ChatSession()
     print("Welcome my friend! Type 'quit' to exit.")
     while True:
         user_input = input("> ").strip()
         if user_input.lower() == "quit":
+            print(f"Session: {session.summary()}")
             print("Goodbye!")
             break
-        response = chat_with_model(user_input)
+        try:
+            response = session.ask(user_input)
+        except Exception as e:
+            print(f"Assistant: An error occurred: {str(e)}")
+            continue
         print(f"Assistant: {response}")
+        print(format_turn_stats(session.turns[-1]))
 
 if __name__ == "__main__":
     main()
@@ -1,7 +1,7 @@
 from flask import Flask, request, render_template_string
 import mysql.connector
 import pandas as pd
-import ollama
+from llm_gateway import gateway
 import re  # For regex-based query correction
 
 app = Flask(__name__)
@@ -33,8 +33,8 @@ def generate_sql_query(user_input):
             "Generate the SQL query based on the user’s prompt."
         )
 
-        response = ollama.chat(
-            model='llama2:7b-chat',
+        response = gateway.chat(
+            'sql',
             messages=[
                 {'role': 'system', 'content': system_prompt},
                 {'role': 'user', 'content': user_input}
@@ -0,0 +1,216 @@
+import argparse
+import json
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def default_responder(path, body):
+    """ Deterministic canned reply: SQL-looking text for llama2 prompts, an echo of the question otherwise. """
+    model = body.get("model", "")
+    messages = body.get("messages") or [{"role": "user", "content": body.get("prompt", "")}]
+    question = messages[-1].get("content", "") if messages else ""
+    if model.startswith("llama2"):
+        return "```sql\nSELECT * FROM Honda_Sales LIMIT 5;\n```"
+    return f"Stub answer for: {question.strip()[:200]}"
+
+
+def load_recordings(path):
+    """ Reads a replies file: {"source": "...", "replies": {question: model reply}} (see bench_nl2sql.py --record).
+
+    `source` says where the replies came from ("synthetic" for hand-written ones); a bare {question: reply}
+    object is read as replies of unknown source.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data.get("replies"), dict):
+        return data["replies"]
+    return data
+
+
+def recordings_source(path):
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return data.get("source", "unknown") if isinstance(data.get("replies"), dict) else "unknown"
+
+
+def replay_responder(recordings, fallback=default_responder):
+    """ Replays the stored reply for the last user message, so benchmarks see model-shaped output offline. """
+    def respond(path, body):
+        messages = body.get("messages") or [{"role": "user", "content": body.get("prompt", "")}]
+        question = messages[-1].get("content", "").strip() if messages else ""
+        if question in recordings:
+            return recordings[question]
+        return fallback(path, body)
+    return respond
+
+
+class StubOllamaHandler(BaseHTTPRequestHandler):
+    """ Implements the slice of the Ollama HTTP API the repo uses: /api/chat, /api/generate, /api/tags, /api/ps. """
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes; without TCP_NODELAY each reply waits on a delayed ACK (~40 ms)
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, payload, status=200):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path in ("/api/tags", "/api/ps"):
+            self._send_json({"models": [{"name": name, "model": name} for name in sorted(self.server.loaded_models)]})
+        elif self.path == "/":
+            self.send_response(200)
+            self.send_header("Content-Length", "17")
+            self.end_headers()
+            self.wfile.write(b"Ollama is running")
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        self.server.record(self.path, body)
+
+        if self.path not in ("/api/chat", "/api/generate"):
+            self._send_json({"error": "not found"}, status=404)
+            return
+
+        model = body.get("model", "")
+        self.server.loaded_models.add(model)
+        is_chat = self.path == "/api/chat"
+        self.server.track_active(1)
+        try:
+            self._reply(body, model, is_chat)
+        finally:
+            self.server.track_active(-1)
+
+    def _reply(self, body, model, is_chat):
+        # An empty generate prompt is Ollama's "load the model" request
+        if not is_chat and not body.get("prompt"):
+            self._send_json({"model": model, "created_at": _now(), "response": "", "done": True, "done_reason": "load"})
+            return
+
+        text = self.server.responder(self.path, body)
+        tokens = text.split(" ") if text else [""]
+        options = body.get("options") or {}
+        if options.get("num_predict"):
+            tokens = tokens[:max(1, int(options["num_predict"]))]
+        prompt_chars = sum(len(m.get("content", "")) for m in body.get("messages") or []) + len(body.get("prompt", ""))
+
+        time.sleep(self.server.latency)
+        stats = {
+            "total_duration": int((self.server.latency + len(tokens) * self.server.token_delay) * 1e9),
+            "load_duration": 0,
+            "prompt_eval_count": max(1, prompt_chars // 4),
+            "prompt_eval_duration": int(self.server.latency * 1e9),
+            "eval_count": len(tokens),
+            "eval_duration": int(max(len(tokens) * self.server.token_delay, 1e-6) * 1e9),
+        }
+
+        if body.get("stream", True):
+            try:
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for i, token in enumerate(tokens):
+                    time.sleep(self.server.token_delay)
+                    piece = token if i == 0 else " " + token
+                    self._write_chunk(_message(model, piece, is_chat, done=False))
+                self._write_chunk({**_message(model, "", is_chat, done=True), "done_reason": "stop", **stats})
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                # The client closed the stream early (a cancelled generation), as Ollama sees it
+                self.close_connection = True
+        else:
+            time.sleep(len(tokens) * self.server.token_delay)
+            try:
+                self._send_json({**_message(model, " ".join(tokens), is_chat, done=True), "done_reason": "stop", **stats})
+            except (BrokenPipeError, ConnectionResetError):
+                self.close_connection = True  # the client timed out
+
+    def _write_chunk(self, payload):
+        data = (json.dumps(payload) + "\n").encode("utf-8")
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _message(model, content, is_chat, done):
+    if is_chat:
+        return {"model": model, "created_at": _now(), "message": {"role": "assistant", "content": content}, "done": done}
+    return {"model": model, "created_at": _now(), "response": content, "done": done}
+
+
+class StubOllamaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, responder=None, latency=0.0, token_delay=0.0, verbose=False):
+        super().__init__(address, StubOllamaHandler)
+        self.responder = responder or default_responder
+        self.latency = latency
+        self.token_delay = token_delay
+        self.verbose = verbose
+        self.loaded_models = set()
+        self.requests = []
+        self.active = 0
+        self.peak_active = 0  # most /api/chat + /api/generate requests handled at the same time
+        self._lock = threading.Lock()
+
+    def record(self, path, body):
+        with self._lock:
+            self.requests.append({"path": path, "body": body})
+
+    def track_active(self, delta):
+        with self._lock:
+            self.active += delta
+            self.peak_active = max(self.peak_active, self.active)
+
+    def handle_error(self, request, client_address):
+        # Clients hang up on purpose (cancelled hedges, /ask/stream disconnects, timeouts): not worth a traceback
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def start_stub_server(port=0, responder=None, latency=0.0, token_delay=0.0):
+    """ Starts the stub on a background thread and returns it; point OLLAMA_HOST (or LLMGateway(host=...)) at `server.url`. """
+    server = StubOllamaServer(("127.0.0.1", port), responder=responder, latency=latency, token_delay=token_delay)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline stand-in for the Ollama HTTP API.")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Simulated prompt-eval time per request")
+    parser.add_argument("--token-delay-ms", type=float, default=0.0, help="Simulated time per generated token")
+    parser.add_argument("--replay", help="JSON file of {question: reply} to replay instead of the canned answers")
+    args = parser.parse_args()
+
+    responder = replay_responder(load_recordings(args.replay)) if args.replay else None
+    server = StubOllamaServer(("127.0.0.1", args.port), responder=responder, latency=args.latency_ms / 1000, token_delay=args.token_delay_ms / 1000, verbose=True)
+    print(f"🧪 Stub Ollama listening on {server.url} (export OLLAMA_HOST={server.url})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
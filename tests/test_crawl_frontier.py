@@ -0,0 +1,187 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import crawl_frontier
+from crawl_frontier import MAX_ATTEMPTS, CrawlFrontier, extract_links, fetch
+
+ROBOTS = "User-agent: *\nDisallow: /private\nCrawl-delay: 2\n"
+PAGES = {
+    "/": '<a href="/about">About</a> <a href="/private/staff">Staff</a> <a href="/logo.png">logo</a>'
+         ' <a href="https://elsewhere.example/">Partner</a> <a href="/courses#fees">Fees</a>',
+    "/about": '<a href="/">Home</a>',
+    "/courses": "<p>Courses</p>",
+    "/news": "<p>News</p>",
+    "/busy": "<p>Busy</p>",
+}
+
+
+class SiteHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.hits.append(self.path)
+        if self.path == "/robots.txt":
+            self._send(200, ROBOTS, "text/plain")
+        elif self.path == "/sitemap.xml":
+            self._send(200, self.server.sitemap, "application/xml")
+        elif self.path == "/busy" and self.server.busy:
+            self.server.busy -= 1
+            self._send(429, "slow down", "text/plain")
+        elif self.path in PAGES:
+            self._send(200, PAGES[self.path], "text/html")
+        else:
+            self._send(404, "not found", "text/plain")
+
+    def _send(self, status, body, content_type):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+@pytest.fixture
+def site():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SiteHandler)
+    server.hits = []
+    server.busy = 0
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    server.host = f"127.0.0.1:{server.server_address[1]}"
+    server.sitemap = (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+        f'<url><loc>{server.url}/courses</loc><lastmod>2001-01-01</lastmod></url>'
+        f'<url><loc>{server.url}/news</loc><lastmod>2999-01-01</lastmod><priority>0.9</priority></url>'
+        '</urlset>'
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class FakeClock:
+    """ Monotonic clock the frontier sleeps on without the test waiting for real. """
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+def make_frontier(site, clock, **options):
+    return CrawlFrontier({site.host}, clock=clock, sleep=clock.sleep, **options)
+
+
+def crawl(frontier):
+    """ What scraping.py does, with a plain GET instead of Playwright. """
+    order = []
+    while (next_item := frontier.next_url()) is not None:
+        url, depth = next_item
+        status, body = fetch(url)
+        frontier.record(url, depth, status, extract_links(body.decode("utf-8")))
+        order.append(url)
+    return order
+
+
+def test_robots_rules_and_crawl_delay_are_applied(site):
+    clock = FakeClock()
+    frontier = make_frontier(site, clock)
+
+    assert frontier.add(f"{site.url}/")
+    assert not frontier.add(f"{site.url}/private/staff")
+    assert frontier.host_delays[site.host] == 2.0
+
+    crawl(frontier)
+    assert not any(path.startswith("/private") for path in site.hits)
+    assert clock.slept and all(seconds <= 2.0 for seconds in clock.slept)
+
+
+def test_sitemap_entries_are_queued_fresh_first(site):
+    clock = FakeClock()
+    frontier = make_frontier(site, clock)
+
+    assert frontier.add_sitemap(f"{site.url}/sitemap.xml") == 2
+    assert frontier.next_url() == (f"{site.url}/news", 0)
+    assert frontier.next_url() == (f"{site.url}/courses", 0)
+
+
+def test_off_site_and_asset_links_are_not_followed(site):
+    clock = FakeClock()
+    frontier = make_frontier(site, clock)
+    frontier.add(f"{site.url}/")
+
+    order = crawl(frontier)
+
+    assert order == [f"{site.url}/", f"{site.url}/about", f"{site.url}/courses"]
+    assert "/logo.png" not in site.hits
+
+
+def test_throttled_page_is_retried_after_backing_off(site):
+    clock = FakeClock()
+    frontier = make_frontier(site, clock, respect_robots=False, host_delay=1.0)
+    site.busy = 1
+    frontier.add(f"{site.url}/busy")
+
+    order = crawl(frontier)
+
+    assert order == [f"{site.url}/busy", f"{site.url}/busy"]
+    assert frontier.visited[f"{site.url}/busy"]["status"] == 200
+    # The retry waited for the doubled delay, which then relaxes again after the success
+    assert clock.slept == [2.0]
+    assert frontier.host_delays[site.host] == pytest.approx(1.8)
+
+
+def test_page_that_keeps_failing_is_given_up(site):
+    clock = FakeClock()
+    frontier = make_frontier(site, clock, respect_robots=False)
+    site.busy = MAX_ATTEMPTS + 1
+    frontier.add(f"{site.url}/busy")
+
+    order = crawl(frontier)
+
+    assert len(order) == MAX_ATTEMPTS
+    assert frontier.visited[f"{site.url}/busy"]["status"] == 429
+
+
+def test_checkpoint_resumes_with_new_limits(site, tmp_path):
+    checkpoint = str(tmp_path / "crawl_checkpoint.json")
+    clock = FakeClock()
+    frontier = make_frontier(site, clock, max_pages=1, checkpoint_path=checkpoint)
+    frontier.add(f"{site.url}/")
+    crawl(frontier)
+    frontier.save()
+    assert list(frontier.visited) == [f"{site.url}/"]
+
+    resumed = CrawlFrontier.load(checkpoint, max_pages=10, clock=clock, sleep=clock.sleep)
+
+    assert resumed.max_pages == 10
+    order = crawl(resumed)
+    assert order == [f"{site.url}/about", f"{site.url}/courses"]
+    assert f"{site.url}/" not in order
+
+
+def test_retry_counts_survive_a_checkpoint(site, tmp_path, monkeypatch):
+    monkeypatch.setattr(crawl_frontier, "MAX_ATTEMPTS", 2)
+    checkpoint = str(tmp_path / "crawl_checkpoint.json")
+    clock = FakeClock()
+    frontier = make_frontier(site, clock, respect_robots=False, checkpoint_path=checkpoint)
+    frontier.add(f"{site.url}/busy")
+    frontier.record(*frontier.next_url(), None)
+    frontier.save()
+
+    resumed = CrawlFrontier.load(checkpoint, respect_robots=False, clock=clock, sleep=clock.sleep)
+    resumed.record(*resumed.next_url(), None)
+
+    assert resumed.visited[f"{site.url}/busy"]["status"] is None
+    assert len(resumed) == 0
@@ -0,0 +1,15 @@
+from index_advisor import MAX_INDEX_NAME, index_name
+
+
+def test_short_names_are_left_readable():
+    assert index_name(('City', 'Date')) == 'idx_hs_city_date'
+
+
+def test_truncated_names_sharing_a_prefix_stay_distinct():
+    prefix = ('Sales_Executive', 'Customer_Name', 'Payment_Mode', 'Discount_Applied')
+    first = index_name(prefix + ('Total_Sale',))
+    second = index_name(prefix + ('Units_Sold',))
+
+    assert len(first) == len(second) == MAX_INDEX_NAME
+    assert first != second
+    assert index_name(prefix + ('Total_Sale',)) == first
@@ -0,0 +1,98 @@
+import asyncio
+import threading
+
+import pytest
+
+from llm_gateway import InFlightLimit, LLMGateway
+from stub_ollama_server import start_stub_server
+
+MESSAGES = [{"role": "user", "content": "How many scooters were sold in Chennai?"}]
+
+
+@pytest.fixture
+def stub():
+    server = start_stub_server(latency=0.1)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_chat_sends_use_case_options_and_keep_alive(stub):
+    gateway = LLMGateway(host=stub.url, keep_alive="5m")
+
+    response = gateway.chat("sql", MESSAGES)
+
+    assert response["message"]["content"].startswith("```sql")
+    body = stub.requests[-1]["body"]
+    assert body["model"] == "llama2:7b-chat"
+    assert body["options"]["num_predict"] == 256
+    assert body["keep_alive"] == "5m"
+    assert gateway.stats()["calls"] == {"sql": 1}
+
+
+def test_unknown_use_case_is_rejected(stub):
+    with pytest.raises(ValueError):
+        LLMGateway(host=stub.url).chat("summarise", MESSAGES)
+
+
+def test_sync_and_async_callers_share_one_in_flight_cap(stub):
+    gateway = LLMGateway(host=stub.url, max_in_flight=2)
+    replies = []
+
+    def sync_call():
+        replies.append(gateway.chat("rag_answer", MESSAGES))
+
+    async def async_calls():
+        return await asyncio.gather(*(gateway.achat("rag_answer", MESSAGES) for _ in range(3)))
+
+    threads = [threading.Thread(target=sync_call) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    replies.extend(asyncio.run(async_calls()))
+    for thread in threads:
+        thread.join()
+
+    assert len(replies) == 6
+    assert stub.peak_active <= 2
+    assert gateway.stats()["in_flight"] == 0
+
+
+def test_stream_left_early_hands_its_slot_back(stub):
+    gateway = LLMGateway(host=stub.url, max_in_flight=1)
+
+    with gateway.chat("rag_answer", MESSAGES, stream=True) as stream:
+        next(stream)
+        assert gateway.stats()["in_flight"] == 1
+    assert gateway.stats()["in_flight"] == 0
+
+    # The only slot is free again
+    assert gateway.chat("rag_answer", MESSAGES)["done"]
+
+
+def test_cancelled_async_waiter_does_not_keep_a_slot():
+    limit = InFlightLimit(1)
+
+    async def scenario():
+        limit.acquire()
+        waiter = asyncio.create_task(limit.acquire_async())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        limit.release()
+        await asyncio.wait_for(limit.acquire_async(), timeout=1)
+
+    asyncio.run(scenario())
+    assert limit._used == 1
+
+
+def test_cancelled_stream_sends_nothing(stub):
+    gateway = LLMGateway(host=stub.url, max_in_flight=1)
+    cancel = threading.Event()
+    cancel.set()
+
+    with gateway.chat("sql", MESSAGES, stream=True, cancel=cancel) as stream:
+        assert list(stream) == []
+    assert stream.sent_at is None
+    assert stub.requests == []
+    assert gateway.stats()["in_flight"] == 0
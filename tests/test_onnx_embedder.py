@@ -0,0 +1,98 @@
+import re
+
+import numpy as np
+import pytest
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("tokenizers")
+sentence_transformers = pytest.importorskip("sentence_transformers")
+transformers = pytest.importorskip("transformers")
+
+from sentence_transformers import models  # noqa: E402
+
+from onnx_embedder import OnnxCrossEncoder, OnnxEmbedder, export_cross_encoder, export_model  # noqa: E402
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+RERANK_MODEL_NAME = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+TEXTS = [
+    "How many Honda Activa scooters were sold in Chennai?",
+    "Honda Cars India reported record sales in October.",
+    "short",
+    "The City Hybrid e:HEV combines a 1.5 litre petrol engine with two electric motors for 26.5 km/l.",
+]
+PAIRS = [(TEXTS[0], TEXTS[1]), (TEXTS[0], TEXTS[3]), ("short", TEXTS[2])]
+
+
+@pytest.fixture(scope="module")
+def tiny_models(tmp_path_factory):
+    """ A randomly initialised 2-layer BERT saved as a SentenceTransformer and as a CrossEncoder: the whole
+    export path runs offline, in a second, without downloading a model. """
+    root = tmp_path_factory.mktemp("tiny")
+    words = sorted({word for text in TEXTS for word in re.findall(r"\w+|[^\w\s]", text.lower())})
+    vocab_file = root / "vocab.txt"
+    vocab_file.write_text("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + words) + "\n", encoding="utf-8")
+    tokenizer = transformers.BertTokenizerFast(vocab_file=str(vocab_file))
+    config = dict(vocab_size=tokenizer.vocab_size, hidden_size=32, num_hidden_layers=2, num_attention_heads=2,
+                  intermediate_size=37, max_position_embeddings=64)
+
+    bert_dir = str(root / "bert")
+    transformers.BertModel(transformers.BertConfig(**config)).save_pretrained(bert_dir)
+    tokenizer.save_pretrained(bert_dir)
+    transformer = models.Transformer(bert_dir, max_seq_length=64)
+    embedder_dir = str(root / "embedder")
+    sentence_transformers.SentenceTransformer(modules=[transformer, models.Pooling(32, pooling_mode="mean"), models.Normalize()]).save(embedder_dir)
+
+    reranker_dir = str(root / "reranker")
+    transformers.BertForSequenceClassification(transformers.BertConfig(num_labels=1, **config)).save_pretrained(reranker_dir)
+    tokenizer.save_pretrained(reranker_dir)
+    return root, embedder_dir, reranker_dir
+
+
+def test_exported_embedder_matches_sentence_transformers(tiny_models):
+    root, embedder_dir, _ = tiny_models
+    reference = sentence_transformers.SentenceTransformer(embedder_dir, device="cpu")
+    embedder = OnnxEmbedder(export_model(embedder_dir, str(root / "embedder-onnx")), quantized=False)
+
+    expected = reference.encode(TEXTS)
+    vectors = embedder.encode(TEXTS, batch_size=3)
+
+    assert vectors.shape == expected.shape
+    assert np.sum(vectors * expected, axis=1).min() > 0.9999
+    # One string -> one vector, like SentenceTransformer
+    assert embedder.encode(TEXTS[0]).shape == reference.encode(TEXTS[0]).shape
+
+
+def test_exported_cross_encoder_matches_sentence_transformers(tiny_models):
+    root, _, reranker_dir = tiny_models
+    reference = sentence_transformers.CrossEncoder(reranker_dir, device="cpu")
+    reranker = OnnxCrossEncoder(export_cross_encoder(reranker_dir, str(root / "reranker-onnx")), quantized=False)
+
+    assert np.allclose(reranker.predict(PAIRS, batch_size=2), reference.predict(PAIRS), atol=1e-5)
+
+
+def test_encode_honours_normalize_and_rejects_unknown_arguments(tiny_models):
+    root, embedder_dir, _ = tiny_models
+    embedder = OnnxEmbedder(export_model(embedder_dir, str(root / "embedder-args")))
+
+    norms = np.linalg.norm(embedder.encode(TEXTS, normalize_embeddings=True), axis=1)
+    assert np.allclose(norms, 1.0, atol=1e-5)
+    with pytest.raises(TypeError):
+        embedder.encode(TEXTS, output_value="token_embeddings")
+    with pytest.raises(ValueError):
+        embedder.encode(TEXTS, convert_to_tensor=True)
+
+
+@pytest.mark.integration
+def test_real_models_keep_parity_after_int8_quantization(tmp_path):
+    """ Opt-in (`pytest -m integration`): downloads the two production models from the Hugging Face Hub. """
+    embedder_dir = export_model(MODEL_NAME, str(tmp_path / "all-MiniLM-L6-v2"))
+    expected = sentence_transformers.SentenceTransformer(MODEL_NAME, device="cpu").encode(TEXTS, normalize_embeddings=True)
+    for quantized, min_cosine in ((False, 0.999), (True, 0.95)):
+        vectors = OnnxEmbedder(embedder_dir, quantized=quantized).encode(TEXTS, normalize_embeddings=True)
+        assert np.sum(vectors * expected, axis=1).min() >= min_cosine
+
+    reranker_dir = export_cross_encoder(RERANK_MODEL_NAME, str(tmp_path / "ms-marco-MiniLM-L-6-v2"))
+    expected = sentence_transformers.CrossEncoder(RERANK_MODEL_NAME, device="cpu").predict(PAIRS)
+    for quantized in (False, True):
+        scores = OnnxCrossEncoder(reranker_dir, quantized=quantized).predict(PAIRS)
+        assert list(np.argsort(-scores)) == list(np.argsort(-expected))
@@ -0,0 +1,30 @@
+import ast
+import os
+
+import pytest
+
+tomllib = pytest.importorskip("tomllib")  # Python 3.11+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Entry points: run as scripts, not installed as modules
+SCRIPTS = ("app.py", "db.py", "step1back.py", "step2samp.py", "bench_nl2sql.py", "bench_sql_generation.py", "bench_startup.py")
+
+
+def imported_modules(path):
+    with open(path, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            yield from (alias.name.split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            yield node.module.split(".")[0]
+
+
+def test_every_top_level_module_the_scripts_import_is_packaged():
+    with open(os.path.join(ROOT, "pyproject.toml"), "rb") as f:
+        packaged = set(tomllib.load(f)["tool"]["setuptools"]["py-modules"])
+    local = {name[:-3] for name in os.listdir(ROOT) if name.endswith(".py") and name not in SCRIPTS}
+
+    for script in SCRIPTS:
+        missing = (set(imported_modules(os.path.join(ROOT, script))) & local) - packaged
+        assert not missing, f"{script} imports {sorted(missing)}, which pyproject.toml does not package"
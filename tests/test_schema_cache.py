@@ -0,0 +1,72 @@
+import sqlite3
+
+import pytest
+
+import schema_cache
+from schema_cache import SchemaCache
+
+ROWS = [
+    ('Kolkata', 'East', 'Honda Activa', 'Scooter', 'Cash'),
+    ('Chennai', 'South', 'Honda Shine', 'Motorcycle', 'UPI'),
+    ('Delhi', 'North', 'Honda City', 'Car', 'Credit Card'),
+    ('Pune', 'West', 'Honda Amaze', 'Car', 'Cash'),
+]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    path = str(tmp_path / 'honda.sqlite')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE Honda_Sales (Sale_ID TEXT, City TEXT, Region TEXT, Product TEXT, Category TEXT, Payment_Mode TEXT)')
+    conn.executemany('INSERT INTO Honda_Sales VALUES (?, ?, ?, ?, ?, ?)', [(str(i),) + row for i, row in enumerate(ROWS)])
+    conn.commit()
+    conn.close()
+    return SchemaCache(lambda: sqlite3.connect(path), 'sqlite')
+
+
+@pytest.mark.parametrize('sql', [
+    "SELECT * FROM Honda_Sales WHERE Product = 'Honda Civic'",
+    "SELECT * FROM Honda_Sales WHERE Region = 'North East'",
+    "SELECT * FROM Honda_Sales WHERE Payment_Mode = 'Cash on delivery'",
+    "SELECT * FROM Honda_Sales WHERE Product = 'Activa'",
+    "SELECT * FROM Honda_Sales WHERE City IN ('Pune', 'Mumbai')",
+])
+def test_values_the_table_does_not_hold_are_left_alone(cache, sql):
+    assert cache.correct_literals(sql) == (sql, [])
+
+
+@pytest.mark.parametrize('sql, expected', [
+    ("SELECT * FROM Honda_Sales WHERE City = 'Kolkatta'", "SELECT * FROM Honda_Sales WHERE City = 'Kolkata'"),
+    ("SELECT * FROM Honda_Sales WHERE City = 'chennai'", "SELECT * FROM Honda_Sales WHERE City = 'Chennai'"),
+    ("SELECT * FROM Honda_Sales WHERE Region = 'Delhi'", "SELECT * FROM Honda_Sales WHERE City = 'Delhi'"),
+    ("SELECT * FROM Honda_Sales WHERE Product IN ('honda city', 'Honda Amaz')",
+     "SELECT * FROM Honda_Sales WHERE Product IN ('Honda City', 'Honda Amaze')"),
+])
+def test_case_typos_and_the_wrong_column_are_corrected(cache, sql, expected):
+    corrected, corrections = cache.correct_literals(sql)
+
+    assert corrected == expected
+    assert len(corrections) == 1
+
+
+def test_prompt_lists_only_the_most_frequent_values(cache, monkeypatch):
+    monkeypatch.setattr(schema_cache, 'MAX_PROMPT_VALUES', 1)
+
+    text = cache.schema_text()
+
+    # 'Cash' and 'Car' appear twice, everything else once
+    assert "- Payment_Mode: 'Cash' (and 2 more)" in text
+    assert "- Category: 'Car' (and 2 more)" in text
+    assert "'UPI'" not in text
+    # Values left out of the prompt are still corrected
+    assert cache.correct_literals("SELECT * FROM Honda_Sales WHERE Payment_Mode = 'upi'")[0].endswith("'UPI'")
+
+
+def test_corrections_are_shown_with_the_answer():
+    pytest.importorskip('flask')
+    from app import render_corrections
+
+    html = render_corrections([("City = 'Kolkatta'", "City = 'Kolkata'")])
+
+    assert "City = &#x27;Kolkatta&#x27;" in html and "City = &#x27;Kolkata&#x27;" in html
+    assert render_corrections([]) == ''
@@ -0,0 +1,81 @@
+import time
+
+import pytest
+
+pytest.importorskip('flask')
+# Imported up front so the client import is not part of the timed hedge
+pytest.importorskip('ollama')
+
+import app
+from llm_gateway import LLMGateway
+from stub_ollama_server import start_stub_server
+
+PROMPT = 'How many scooters were sold in Chennai?'
+
+
+@pytest.fixture
+def stub():
+    server = start_stub_server(latency=0.5)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def hedge_app(monkeypatch):
+    # No DB here: every candidate's SQL passes the dry run as written
+    monkeypatch.setattr(app, 'validate_sql', lambda sql_query: None)
+    monkeypatch.setattr(app.schema_cache, 'correct_literals', lambda sql_query: (sql_query, []))
+
+    def use_gateway(url, max_in_flight):
+        monkeypatch.setattr(app, 'gateway', LLMGateway(host=url, max_in_flight=max_in_flight))
+    return use_gateway
+
+
+def wait_for_record(questions, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while app.hedge_stats()['questions'] < questions:
+        assert time.monotonic() < deadline, 'the hedged question was never accounted'
+        time.sleep(0.01)
+    return app.hedge_stats()
+
+
+def test_winner_returns_without_waiting_for_queued_losers(stub, hedge_app):
+    hedge_app(stub.url, max_in_flight=1)
+    before = app.hedge_stats()
+
+    start = time.perf_counter()
+    sql_query, clean_query = app.generate_sql_hedged(PROMPT, fanout=3)
+    elapsed = time.perf_counter() - start
+
+    assert clean_query == 'SELECT * FROM Honda_Sales LIMIT 5;'
+    assert elapsed < 0.9
+    after = wait_for_record(before['questions'] + 1)
+    # The two candidates still queued for the only slot saw the cancel and never sent their request
+    assert len(stub.requests) == 1
+    assert after['not_sent'] - before['not_sent'] == 2
+    assert after['wasted_requests'] == before['wasted_requests']
+    assert after['candidates'] - before['candidates'] == 3
+
+
+def test_losers_that_reached_the_model_count_as_wasted(stub, hedge_app):
+    hedge_app(stub.url, max_in_flight=3)
+    before = app.hedge_stats()
+
+    app.generate_sql_hedged(PROMPT, fanout=3)
+
+    after = wait_for_record(before['questions'] + 1)
+    assert len(stub.requests) == 3
+    assert after['wasted_requests'] - before['wasted_requests'] == 2
+    assert after['wasted_seconds'] - before['wasted_seconds'] > 0.5
+    assert 'insightgenie_sql_hedge_wasted_ratio 0.0\n' not in app.render()
+
+
+def test_fanout_reports_the_candidates_actually_fired(stub, hedge_app, monkeypatch):
+    hedge_app(stub.url, max_in_flight=4)
+    monkeypatch.setattr(app, 'sql_hedge_stats', dict.fromkeys(app.sql_hedge_stats, 0))
+
+    app.generate_sql_hedged(PROMPT, fanout=2)
+    app.generate_sql_hedged(PROMPT, fanout=4)
+
+    assert wait_for_record(2)['fanout'] == 3.0
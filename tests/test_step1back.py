@@ -0,0 +1,40 @@
+import step1back
+from step1back import ChatSession
+
+
+class DenseTokenizerGateway:
+    """ Answers like Ollama with a tokenizer that needs a token for every 2 characters of the prompt. """
+
+    def __init__(self):
+        self.prompt_tokens = []
+
+    def chat(self, use_case, messages):
+        tokens = sum(len(message['content']) for message in messages) // 2
+        self.prompt_tokens.append(tokens)
+        return {'message': {'content': 'SELECT City, SUM(Total_Sale) FROM Honda_Sales GROUP BY City; ' * 4},
+                'prompt_eval_count': tokens, 'eval_count': 60}
+
+
+def test_history_budget_follows_the_reported_prompt_size(monkeypatch):
+    gateway = DenseTokenizerGateway()
+    monkeypatch.setattr(step1back, 'gateway', gateway)
+    session = ChatSession(history_tokens=600)
+    system_tokens = len(session.system_prompt) // 2
+
+    for turn in range(12):
+        session.ask(f'Question {turn}: which city sold the most scooters in the South region last quarter?')
+
+    assert session.chars_per_token <= 2.0
+    # Every prompt after the first stays within the system prompt + history budget + one question
+    assert max(gateway.prompt_tokens) <= system_tokens + 600 + 60
+    assert any(turn['dropped_turns'] for turn in session.turns)
+
+
+def test_partial_prompt_counts_do_not_loosen_the_budget():
+    session = ChatSession()
+    messages = session.messages('How many scooters were sold in Chennai?')
+
+    # Ollama only counting the uncached tail of the prompt must not make tokens look cheaper
+    session._calibrate(messages, 10)
+
+    assert session.chars_per_token == step1back.CHARS_PER_TOKEN
@@ -0,0 +1,30 @@
+import json
+import socket
+import struct
+import time
+
+from stub_ollama_server import start_stub_server
+
+
+def test_client_hanging_up_mid_reply_prints_no_traceback(capfd):
+    server = start_stub_server(latency=0.2)
+    try:
+        for stream in (True, False):
+            body = json.dumps({"model": "llama2:7b-chat", "stream": stream,
+                               "messages": [{"role": "user", "content": "How many scooters?"}]}).encode("utf-8")
+            client = socket.create_connection(server.server_address[:2])
+            client.sendall(b"POST /api/chat HTTP/1.1\r\nHost: stub\r\nContent-Type: application/json\r\n"
+                           + f"Content-Length: {len(body)}\r\n\r\n".encode("ascii") + body)
+            # Reset (not FIN) the connection before the reply is written, like a cancelled hedge or a timeout
+            client.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+            client.close()
+        deadline = time.monotonic() + 2
+        while server.active and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.05)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert len(server.requests) == 2
+    assert "Traceback" not in capfd.readouterr().err
@@ -0,0 +1,54 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from vector_backend import NumpyVectorStore
+
+COLLECTION = "kongunadu"
+
+
+def points(*entries):
+    return [SimpleNamespace(id=point_id, vector=vector, payload={"content": content}) for point_id, vector, content in entries]
+
+
+@pytest.fixture
+def writer(tmp_path):
+    store = NumpyVectorStore(str(tmp_path))
+    store.create_collection(COLLECTION, SimpleNamespace(size=2))
+    store.upsert(COLLECTION, points((1, [1.0, 0.0], "old east"), (2, [0.0, 1.0], "old north")))
+    return store
+
+
+def test_reader_reopens_a_collection_saved_by_another_process(writer, tmp_path):
+    reader = NumpyVectorStore(str(tmp_path), check_seconds=0)
+    assert reader.search(COLLECTION, [1.0, 0.0], limit=1)[0].payload["content"] == "old east"
+
+    # store.py re-ingesting: new points, then the old ones deleted
+    writer.upsert(COLLECTION, points((3, [1.0, 0.1], "new east")))
+    writer.delete(COLLECTION, [1, 2])
+
+    hits = reader.search(COLLECTION, [1.0, 0.0], limit=5)
+    assert [hit.payload["content"] for hit in hits] == ["new east"]
+
+
+def test_reader_within_check_interval_keeps_its_copy(writer, tmp_path):
+    reader = NumpyVectorStore(str(tmp_path), check_seconds=60)
+    reader.search(COLLECTION, [1.0, 0.0])
+
+    writer.delete(COLLECTION, [1])
+
+    assert len(reader.search(COLLECTION, [1.0, 0.0], limit=5)) == 2
+
+
+def test_saves_switch_versions_through_meta_json(writer, tmp_path):
+    for round_ in range(3):
+        writer.upsert(COLLECTION, points((10 + round_, [0.5, 0.5], f"round {round_}")))
+
+    files = sorted(os.listdir(tmp_path / COLLECTION))
+    # meta.json plus the current and the previous vectors/payloads pair; nothing half-written
+    assert files.count("meta.json") == 1
+    assert len([name for name in files if name.startswith("vectors-")]) == 2
+    assert len([name for name in files if name.startswith("payloads-")]) == 2
+    assert not any(name.endswith(".tmp") for name in files)
+    assert NumpyVectorStore(str(tmp_path)).get_collection(COLLECTION).points_count == 5